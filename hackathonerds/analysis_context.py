@@ -0,0 +1,115 @@
+"""
+Per-session analysis context shared by /safety-check, /extract-profile and /match.
+
+A vent is analysed three times on its way to a match (risk check → profile
+extraction → matching). Each step now looks up a context keyed by the hash of
+the normalized transcript and reuses whatever an earlier step already computed:
+
+    context = {
+        "context_id": "<sha256 of normalized text, 32 hex>",
+        "text": "<normalized transcript>",
+        "embedding": np.ndarray | None,     # all-MiniLM-L6-v2 (or synthetic)
+        "safety": {"risk_level": ..., "tier": ...} | None,
+        "profile": {...extracted seeker profile...} | None,
+    }
+
+Clients get the context_id back and can send it instead of the full text.
+Contexts live in a bounded in-memory LRU with a TTL (ANALYSIS_CONTEXT_MAX,
+ANALYSIS_CONTEXT_TTL_S); a miss just means the work is recomputed.
+"""
+
+import os
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger("bridge.context")
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("ANALYSIS_CONTEXT_MAX", "10000"))
+DEFAULT_TTL_S = float(os.getenv("ANALYSIS_CONTEXT_TTL_S", "3600"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for hashing: NFC, collapsed whitespace, trimmed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def context_id_for(text: str) -> str:
+    """Stable context ID for a transcript (hash of its normalized form)."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()[:32]
+
+
+class AnalysisContextStore:
+    """Bounded, thread-safe LRU of analysis contexts with a TTL."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_s=DEFAULT_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()  # context_id → (expires_at, context)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, context_id: str):
+        """Context for an ID, or None if unknown/expired."""
+        if not context_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(context_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[context_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(context_id)
+            self.hits += 1
+            return entry[1]
+
+    def get_or_create(self, text: str):
+        """Context for a transcript, creating an empty one on first sight."""
+        context_id = context_id_for(text)
+        context = self.get(context_id)
+        if context is not None:
+            return context
+        context = {
+            "context_id": context_id,
+            "text": normalize_text(text),
+            "embedding": None,
+            "safety": None,
+            "profile": None,
+        }
+        with self._lock:
+            # Another request may have created it in the meantime; keep the first
+            existing = self._entries.get(context_id)
+            if existing is not None and existing[0] >= time.monotonic():
+                return existing[1]
+            self._entries[context_id] = (time.monotonic() + self.ttl_s, context)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return context
+
+    def resolve(self, context_id: str = None, text: str = None):
+        """
+        Context from an explicit ID or from text (ID wins when both are given).
+        Returns None when the ID is unknown and no text was sent.
+        """
+        context = self.get(context_id)
+        if context is None and text:
+            context = self.get_or_create(text)
+        return context
+
+
+def ensure_embedding(context, embed_fn):
+    """Compute the context's embedding once; later calls return the cached vector."""
+    if context["embedding"] is None:
+        context["embedding"] = embed_fn(context["text"])
+    return context["embedding"]
@@ -6,28 +6,74 @@ Run:
     uvicorn api:app --host 0.0.0.0 --port 8000 --reload
 
 Endpoints:
-    POST /transcribe        — Audio file → transcript (Tim's faster-whisper)
+    POST /transcribe        — Audio file → transcript (Tim's faster-whisper; cached by content hash)
+    POST /transcribe/jobs   — Queue a transcription → job_id (GET /transcribe/jobs/{id}[/wait] for progress)
     POST /extract-profile   — Transcript → SeekerProfile / HelperProfile (GPT-4o)
     POST /match             — SeekerProfile + helpers → ranked matches (Dha's algo)
-    POST /discover          — Theme → ranked helpers (Netflix lanes)
-    POST /safety-check      — Transcript → risk level (GPT-4o classifier)
+    POST /discover          — Theme → ranked helpers (Netflix lanes; online_within_hours → "online now" lane)
+    POST /feedback          — Conversation outcome for a match_id (batched into the feedback store)
+    POST /helpers           — extract_helper profile → stored helper, live in the pool (HELPER_STORE_PATH)
+    POST /safety-check      — Transcript → risk level (local head, escalates to GPT-4o)
     POST /scaffold          — Chat context → helper suggestion (GPT-4o)
+    POST /extract-profile/stream — seeker_chat reply streamed as SSE deltas
+    POST /scaffold/stream        — Helper suggestion streamed as SSE deltas
+    GET  /metrics           — Prometheus text format (latency, fallbacks, LLM, matching)
+
+    GET  /admin/profile/cpu     — Sampling CPU profile → collapsed stacks (X-Admin-Token)
+    GET  /admin/profile/memory  — tracemalloc growth + helper/feedback inventories (X-Admin-Token)
+    POST /admin/model/rollback  — Re-activate the previous matcher model version (X-Admin-Token)
+    GET  /admin/trainer         — Background retraining status/history (X-Admin-Token)
+    POST /admin/trainer/run     — Trigger a retraining run now (X-Admin-Token)
+    GET  /admin/shadow          — Shadow scorer status and CPU budget (X-Admin-Token)
+    GET  /admin/prefilter       — Per-filter selectivity of the /match prefilter (X-Admin-Token)
+
+/match and /discover answer in MessagePack when sent `Accept: application/msgpack`
+(see serialization.py).
+
+With MATCH_LOG_DIR set, /match requests are logged for offline scorer
+comparison against /feedback outcomes (see replay.py).
+
+With SHADOW_SCORER set, a sample of /match requests is also scored by a
+candidate scorer off the critical path under a CPU budget (see shadow.py).
+
+Sampled requests carry an X-Trace-Id response header; POST /match?debug_trace=1
+also returns the span tree inline (see tracing.py).
+
+With HELPER_STORE_PATH set, helpers live in a durable store and the pool is
+loaded from its latest verified snapshot at startup and every worker polls it
+for helpers written since (see helper_store.py).
+
+With MATCH_PREFILTER set, /match drops helpers failing hard constraints
+(available soon, energy, reliability floor, theme presence) before scoring
+(see prefilter.py). Who is available this hour comes from an hour-of-week
+bitmap index over the pool (see availability_index.py).
+
+With MATCH_SHARDS=N, /match scatters each seeker to N worker processes that
+each own a slice of the pool and merges their top-k (see sharding.py).
+
+Load testing: OPENAI_BASE_URL points the GPT calls at openai_stub.py, and
+HELPER_POOL_SIZE / HELPER_POOL_SOURCE=synthetic seed a larger pool
+(see loadtest.py).
 """
 
 import os
+import asyncio
+import hmac
 import json
 import tempfile
+import threading
 import logging
 import time
+import uuid
 from typing import List, Optional
-import numpy as np
 
 from dotenv import load_dotenv
 load_dotenv()  # Load .env file so OPENROUTER_API_KEY is available
 
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 
 logging.basicConfig(
     level=logging.INFO,
@@ -42,22 +88,74 @@ from local_test_matcher import (
     generate_emotion_embedding,
     compute_dha_match_score,
     generate_helper,
-    THEMES,
     COPING_STYLES,
     CONVERSATION_PREFERENCES,
+    ENERGY_LEVELS,
     SENTENCE_TRANSFORMERS_AVAILABLE,
+    EMBEDDING_MODE,
+    EMBEDDING_BACKEND,
+    feedback_store,
+    learned_matcher,
 )
 
-from stt import transcribe_file
+from stt import config_fingerprint, transcribe_file
+from transcript_cache import TranscriptCache, content_key, url_key
+from transcribe_jobs import JobRunner, JobStore
+from prompts import (
+    SEEKER_CHAT_SYSTEM_PROMPT,
+    SCAFFOLD_INSTRUCTION,
+    SAFETY_SYSTEM_PROMPT,
+    EXTRACT_SEEKER_SYSTEM_PROMPT,
+    EXTRACT_HELPER_SYSTEM_PROMPT,
+    budget_for,
+    clip_text,
+    count_message_tokens,
+    count_tokens,
+    fit_history,
+    record_usage,
+    split_text,
+)
+from safety_classifier import SafetyClassifier
+from analysis_context import AnalysisContextStore, ensure_embedding
+from embedding_quant import quantize_pool
+from embedding_backends import MAX_SEQ_LENGTH
+from metrics import (
+    CONTENT_TYPE_LATEST,
+    FALLBACKS,
+    HELPER_POOL_SIZE,
+    MATCH_CANDIDATES,
+    MATCH_STAGE,
+    REQUEST_LATENCY,
+    REQUESTS,
+    SAFETY_DECISIONS,
+    STREAM_TTFB,
+    FEEDBACK_RECEIVED,
+    render_latest,
+)
+from tracing import TRACE_HEADER, current_trace, should_sample, span, start_trace
+from serialization import encode_response
+from model_registry import ModelIntegrityError, ModelWatcher
+from trainer import BackgroundTrainer
+from feedback_buffer import BufferFull, FeedbackBuffer, MatchLedger
+from match_log import MATCH_LOG_DIR, MatchLog
+from shadow import SHADOW_SCORER, ShadowScorer
+from profiling import ProfilerBusy, deep_sizeof, embedding_bytes, memory_diff, profiling_session, sample_cpu
+from helper_store import HELPER_STORE_PATH, HelperStore, HelperWatcher, helper_from_profile, split_helper
+from synthetic import DAYS
+from sharding import MATCH_SHARDS, ShardedMatcher, ShardsUnavailable
+from prefilter import MATCH_PREFILTER, PREFILTER_STATS, HelperPrefilter
+from availability_index import AvailabilityIndex
 
 # ── OpenAI client (for extract-profile, safety-check, scaffold) ─────────────
 try:
     from openai import OpenAI
     api_key = os.getenv("OPENAI_API_KEY")
     if api_key:
-        openai_client = OpenAI(api_key=api_key)
+        # OPENAI_BASE_URL points the client at any compatible server (e.g. openai_stub.py for load tests)
+        openai_base_url = os.getenv("OPENAI_BASE_URL") or None
+        openai_client = OpenAI(api_key=api_key, base_url=openai_base_url)
         GPT_MODEL = "gpt-4o"
-        logger.info("OpenAI client initialized (model=%s)", GPT_MODEL)
+        logger.info("OpenAI client initialized (model=%s, base_url=%s)", GPT_MODEL, openai_base_url or "default")
     else:
         openai_client = None
         GPT_MODEL = None
@@ -79,23 +177,142 @@ app.add_middleware(
 )
 
 
-# ── Request logging middleware (shows frontend ↔ backend connection) ─────────
+# ── Request metrics + tracing middleware (per-route latency, sampled spans) ──
 @app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start = time.time()
-    logger.info("⬅️  %s %s from %s", request.method, request.url.path, request.client.host)
-    response = await call_next(request)
-    elapsed = (time.time() - start) * 1000
-    logger.info("➡️  %s %s → %s (%.0fms)", request.method, request.url.path, response.status_code, elapsed)
-    # Skip ngrok browser warning page for API calls
-    response.headers["ngrok-skip-browser-warning"] = "true"
-    return response
-
-# ── In-memory helper pool (seeded on startup) ────────────────────────────────
-from local_test_matcher import generate_helper
-helper_pool: list = [generate_helper() for _ in range(30)]
-logger.info("Helper pool seeded: %d helpers — IDs: %s",
-            len(helper_pool), [h['user_id'] for h in helper_pool])
+async def observe_requests(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    sampled, trace_id, parent_span_id = should_sample(
+        request.headers.get("traceparent"), force=request.query_params.get("debug_trace") == "1",
+    )
+    with start_trace(f"{request.method} {request.url.path}", sampled, trace_id, parent_span_id) as trace:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            # Skip ngrok browser warning page for API calls
+            response.headers["ngrok-skip-browser-warning"] = "true"
+            if trace is not None:
+                response.headers[TRACE_HEADER] = trace.trace_id
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            # Label by route template (bounded cardinality); unmatched paths share one label
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(route, request.method).observe(elapsed)
+            REQUESTS.labels(route, request.method, status).inc()
+            logger.debug("%s %s → %s (%.0fms)", request.method, request.url.path, status, elapsed * 1000)
+
+# ── Local safety tier (clear-cut cases never reach GPT-4o) ──────────────────
+safety_classifier = SafetyClassifier()
+SAFETY_LABEL_LOG = os.getenv("SAFETY_LABEL_LOG")  # opt-in: collect GPT labels for safety_classifier.py
+# Long transcripts are classified chunk by chunk (max risk wins) instead of clipped: at most this many calls
+SAFETY_MAX_CHUNKS = int(os.getenv("SAFETY_MAX_CHUNKS", "6"))
+# The local head sees only the embedder's first MAX_SEQ_LENGTH word pieces (~3/4 as many GPT-4o tokens)
+SAFETY_LOCAL_MAX_TOKENS = MAX_SEQ_LENGTH * 3 // 4
+RISK_LEVELS = ("low", "medium", "high")
+
+# ── Transcript cache (audio hash / URL validator + STT config → transcript) ──
+transcript_cache = TranscriptCache()
+
+# ── Per-session analysis contexts (transcript hash → embedding/safety/profile) ──
+analysis_contexts = AnalysisContextStore()
+
+# ── In-memory helper pool (persistent store, else seeded on startup) ─────────
+# HELPER_STORE_PATH loads the durable store's snapshot (helper_store.py). Without it
+# the pool is generated; HELPER_POOL_SOURCE=synthetic seeds a large pool quickly
+# (synthetic.py) for load tests.
+HELPER_POOL_COUNT = int(os.getenv("HELPER_POOL_SIZE", "30"))
+HELPER_POOL_SOURCE = os.getenv("HELPER_POOL_SOURCE", "faker")
+HELPER_POOL_SEED = int(os.getenv("HELPER_POOL_SEED", "0"))
+helper_store = HelperStore(HELPER_STORE_PATH) if HELPER_STORE_PATH else None
+helper_positions = None  # user_id → index in helper_pool, built on the first helper update
+# Profile version of helper_pool for match_log: the helper store seq it reflects (0 for generated pools)
+helper_pool_version = helper_store.seq if helper_store is not None else 0
+helper_pool: list = helper_store.load_pool() if helper_store is not None else []
+if helper_pool:
+    HELPER_POOL_SOURCE = "store"
+else:
+    if helper_store is not None:
+        logger.warning("Helper store %s is empty (seed it with helper_store.py); using a generated %s pool",
+                       HELPER_STORE_PATH, HELPER_POOL_SOURCE)
+    if HELPER_POOL_SOURCE == "synthetic":
+        from synthetic import helper_pool as synthetic_helper_pool
+        embedding_dim = len(generate_emotion_embedding("", use_openai=False))
+        helper_pool = synthetic_helper_pool(HELPER_POOL_COUNT, seed=HELPER_POOL_SEED, dim=embedding_dim)
+    else:
+        from local_test_matcher import generate_helper
+        helper_pool = [generate_helper() for _ in range(HELPER_POOL_COUNT)]
+logger.info("Helper pool seeded: %d %s helpers — first IDs: %s",
+            len(helper_pool), HELPER_POOL_SOURCE, [h['user_id'] for h in helper_pool[:30]])
+
+# Optional: keep helper embeddings as int8/float16/PQ codes (EMBEDDING_QUANTIZATION=int8|float16|pq)
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION")
+if EMBEDDING_QUANTIZATION:
+    quantize_pool(helper_pool, mode=EMBEDDING_QUANTIZATION)
+HELPER_POOL_SIZE.set(len(helper_pool))
+
+# Opt-in: split the pool across MATCH_SHARDS worker processes for /match (sharding.py)
+sharded_matcher = ShardedMatcher(helper_pool, MATCH_SHARDS) if MATCH_SHARDS > 0 else None
+
+# "Available now" hour-of-week bitmaps over pool positions (availability_index.py)
+availability_index = AvailabilityIndex(helper_pool)
+
+# Opt-in: hard-constraint filters ahead of scoring (prefilter.py); shards run their own
+prefilter = (HelperPrefilter(helper_pool, index=availability_index)
+             if MATCH_PREFILTER and sharded_matcher is None else None)
+
+
+def _helper_positions():
+    """user_id → index in helper_pool, built on first use (callers hold _helper_pool_lock)."""
+    global helper_positions
+    if helper_positions is None:
+        helper_positions = {h["user_id"]: i for i, h in enumerate(helper_pool)}
+    return helper_positions
+
+
+def _apply_helpers(helpers, seq):
+    """Upsert store-format helpers into the live pool and its indexes; the pool then reflects store seq."""
+    global helper_pool_version
+    with _helper_pool_lock:  # the watcher thread and POST /helpers both apply
+        positions = _helper_positions()
+        for helper in helpers:
+            position = positions.get(helper["user_id"])
+            if position is None:
+                position = positions[helper["user_id"]] = len(helper_pool)
+                helper_pool.append(helper)
+            else:
+                helper_pool[position] = helper
+            availability_index.set(position, helper["availability_windows"])
+            if prefilter is not None:
+                prefilter.upsert(position, helper)
+            if sharded_matcher is not None:
+                sharded_matcher.upsert(helper, position)
+        helper_pool_version = max(helper_pool_version, seq)
+        HELPER_POOL_SIZE.set(len(helper_pool))
+
+
+# Helpers any worker writes reach this one within HELPER_POLL_INTERVAL_S (helper_store.py)
+_helper_pool_lock = threading.Lock()
+helper_watcher = (HelperWatcher(helper_store, _apply_helpers, helper_pool_version).start()
+                  if helper_store is not None else None)
+
+# ── Learned matcher hot-swap (polls the model registry's ACTIVE pointer) ─────
+model_watcher = ModelWatcher(learned_matcher).start()
+
+# ── Feedback ingestion (match ledger + write-behind buffer to feedback_store) ─
+match_ledger = MatchLedger()
+feedback_buffer = FeedbackBuffer(feedback_store).start()
+
+# Opt-in: log /match requests + pool snapshots for offline replay (replay.py)
+match_log = MatchLog(MATCH_LOG_DIR) if MATCH_LOG_DIR else None
+
+# Opt-in: score a sample of /match traffic with a candidate scorer in the background (shadow.py)
+shadow_scorer = ShadowScorer(SHADOW_SCORER) if SHADOW_SCORER else None
+
+# Opt-in on ONE worker: retrain from new feedback in a child process, publish if RMSE holds
+background_trainer = None
+if os.getenv("TRAINER_ENABLED") == "1":
+    background_trainer = BackgroundTrainer(feedback_store, learned_matcher, learned_matcher.registry).start()
 
 
 # ── Request / Response Models ────────────────────────────────────────────────
@@ -112,6 +329,7 @@ class ThemeItem(BaseModel):
 
 class SeekerProfileRequest(BaseModel):
     transcript: Optional[str] = None
+    context_id: Optional[str] = None  # reuse a transcript already sent to /safety-check
     mode: str = "extract_seeker"  # extract_seeker | extract_helper | seeker_chat
     messages: Optional[List[dict]] = None  # for seeker_chat mode
     narrative: Optional[str] = None  # for extract_helper mode
@@ -127,21 +345,34 @@ class SeekerProfileResponse(BaseModel):
     urgency: float
 
 class MatchRequest(BaseModel):
-    seeker_profile: dict
+    seeker_profile: dict = {}
     helper_ids: Optional[List[str]] = None
+    context_id: Optional[str] = None  # reuse embedding + extracted profile from earlier steps
 
 class MatchResponse(BaseModel):
     matches: List[dict]
+    trace: Optional[dict] = None  # span tree, only with ?debug_trace=1
+    coverage: Optional[dict] = None  # shards answered / helpers scored, only with MATCH_SHARDS
+
+class FeedbackRequest(BaseModel):
+    match_id: str
+    rating: float = Field(..., ge=0, le=5)  # seeker's rating, 0-5
+    conversation_length: float = Field(..., ge=0, le=1)  # normalized 0-1
+    follow_up: float = Field(..., ge=0, le=1)  # likelihood / yes=1.0, no=0.0
 
 class DiscoverRequest(BaseModel):
     theme_name: str
     top_k: int = 10
+    online_within_hours: Optional[float] = Field(None, gt=0, le=168)  # "online now" lane: 1 = this hour
 
 class SafetyRequest(BaseModel):
-    transcript: str
+    transcript: Optional[str] = None
+    context_id: Optional[str] = None
 
 class SafetyResponse(BaseModel):
     risk_level: str  # low | medium | high
+    tier: Optional[str] = None  # local | llm | fallback
+    context_id: Optional[str] = None
 
 class ScaffoldRequest(BaseModel):
     mode: str
@@ -151,9 +382,51 @@ class ScaffoldRequest(BaseModel):
 class ScaffoldResponse(BaseModel):
     suggestion: str
 
+class HelperCreateRequest(BaseModel):
+    profile: dict  # /extract-profile extract_helper result (themes, coping_style, bio, theme_scores, ...)
+    user_id: Optional[str] = None  # omit to create a new helper
+    availability_windows: Optional[dict] = None  # {"Mon": [0/1 × 24], ...}; default: always available
+    energy_level: Optional[str] = None  # one of ENERGY_LEVELS; default: "moderate"
+
+    @field_validator("availability_windows")
+    @classmethod
+    def _full_week(cls, windows):
+        if windows is None:
+            return None
+        if set(windows) != set(DAYS):
+            raise ValueError(f"availability_windows needs exactly the days {DAYS}")
+        for day, hours in windows.items():
+            if not isinstance(hours, list) or len(hours) != 24 or any(type(h) is not int or h not in (0, 1) for h in hours):
+                raise ValueError(f"availability_windows[{day!r}] must be 24 values of 0 or 1")
+        return windows
+
+    @field_validator("energy_level")
+    @classmethod
+    def _known_energy(cls, level):
+        if level is not None and level not in ENERGY_LEVELS:
+            raise ValueError(f"energy_level must be one of {ENERGY_LEVELS}")
+        return level
+
 
 # ── Endpoints ────────────────────────────────────────────────────────────────
 
+def _transcribe_entry(audio_path, stats=None, on_segment=None, on_draft=None):
+    """Cache entry for one transcription + whether it succeeded (only successes are cached)."""
+    stats = {} if stats is None else stats
+    transcript = transcribe_file(audio_path, stats, on_draft=on_draft, on_segment=on_segment)
+    return {"transcript": transcript, "stats": stats, "created_at": time.time()}, "wall_s" in stats
+
+
+def _transcribe_upload(content, suffix):
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(content)
+        tmp_path = tmp.name
+    try:
+        return _transcribe_entry(tmp_path)
+    finally:
+        os.unlink(tmp_path)
+
+
 @app.post("/transcribe", response_model=TranscribeResponse)
 async def transcribe(file: UploadFile = File(None), body: TranscribeRequest = None):
     """Transcribe audio file → text using faster-whisper."""
@@ -161,21 +434,90 @@ async def transcribe(file: UploadFile = File(None), body: TranscribeRequest = No
     if file:
         # Uploaded file
         suffix = ".m4a" if file.filename and file.filename.endswith(".m4a") else ".wav"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-        transcript = transcribe_file(tmp_path)
-        os.unlink(tmp_path)
+        content = await file.read()
+        key = content_key(content, config_fingerprint())
+        compute = lambda: _transcribe_upload(content, suffix)
     elif body and body.audio_url:
-        transcript = transcribe_file(body.audio_url)
+        key = await asyncio.to_thread(url_key, body.audio_url, config_fingerprint())
+        compute = lambda: _transcribe_entry(body.audio_url)
     else:
         logger.error("/transcribe missing file or audio_url")
         raise HTTPException(400, "Provide audio file or audio_url")
-    logger.info("/transcribe completed (chars=%s)", len(transcript))
+    # off the event loop, so concurrent uploads can share a batched decode pass
+    entry, source = await asyncio.to_thread(transcript_cache.get_or_compute, key, compute)
+    transcript, stats = entry["transcript"], entry["stats"]
+    logger.info("/transcribe completed (chars=%s, cache=%s, audio=%.1fs, speed=%.1fx, model=%s)",
+                len(transcript), source, stats.get("audio_s", 0.0), stats.get("speed", 0.0), stats.get("final_model"))
     return TranscribeResponse(transcript=transcript)
 
 
+def _run_transcribe_job(job, stats, on_segment, on_draft):
+    """JobRunner callback: same cache + pipeline as /transcribe, with progress callbacks."""
+    if job["audio_path"]:
+        key, source = job["cache_key"], job["audio_path"]
+    else:
+        key, source = url_key(job["audio_url"], config_fingerprint()), job["audio_url"]
+    return transcript_cache.get_or_compute(key, lambda: _transcribe_entry(source, stats, on_segment, on_draft))
+
+
+transcribe_jobs = JobStore()
+transcribe_runner = JobRunner(transcribe_jobs, _run_transcribe_job).resume()
+JOB_WAIT_MAX_S = 60
+
+
+def _public_job(job):
+    return {k: v for k, v in job.items() if k not in ("audio_path", "cache_key")}
+
+
+@app.post("/transcribe/jobs", status_code=202)
+async def create_transcribe_job(file: UploadFile = File(None), body: TranscribeRequest = None):
+    """Queue a transcription and return its job_id immediately (poll /transcribe/jobs/{id})."""
+    transcribe_jobs.prune()
+    if file:
+        suffix = ".m4a" if file.filename and file.filename.endswith(".m4a") else ".wav"
+        content = await file.read()
+        job = transcribe_jobs.create(audio_url=None, audio_path=None,
+                                     cache_key=content_key(content, config_fingerprint()))
+        audio_path = transcribe_jobs.audio_path(job["job_id"], suffix)
+        with open(audio_path, "wb") as f:
+            f.write(content)
+        transcribe_jobs.update(job["job_id"], audio_path=audio_path)
+    elif body and body.audio_url:
+        job = transcribe_jobs.create(audio_url=body.audio_url, audio_path=None, cache_key=None)
+    else:
+        raise HTTPException(400, "Provide audio file or audio_url")
+    transcribe_runner.submit(job["job_id"])
+    logger.info("/transcribe/jobs queued %s (queue=%d)", job["job_id"], transcribe_runner.queue_depth())
+    return {
+        "job_id": job["job_id"],
+        "status": "queued",
+        "queue_depth": transcribe_runner.queue_depth(),
+        "poll": f"/transcribe/jobs/{job['job_id']}",
+    }
+
+
+@app.get("/transcribe/jobs/{job_id}")
+async def get_transcribe_job(job_id: str):
+    """Job status, progress (segments decoded so far) and, once done, the transcript."""
+    job = transcribe_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown job_id")
+    return _public_job(job)
+
+
+@app.get("/transcribe/jobs/{job_id}/wait")
+async def wait_transcribe_job(job_id: str, since: int = -1, timeout: float = Query(25.0, ge=0)):
+    """Long-poll: returns once the job's version is past `since`, it finishes, or `timeout` passes."""
+    deadline = time.monotonic() + min(timeout, JOB_WAIT_MAX_S)
+    while True:
+        job = transcribe_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(404, "Unknown job_id")
+        if job["version"] > since or job["status"] in ("done", "failed") or time.monotonic() >= deadline:
+            return _public_job(job)
+        await asyncio.sleep(0.2)
+
+
 @app.post("/extract-profile")
 async def extract_profile(req: SeekerProfileRequest):
     """Use GPT-4o to extract a structured profile from vent/narrative text."""
@@ -187,14 +529,8 @@ async def extract_profile(req: SeekerProfileRequest):
             logger.info("/extract-profile seeker_chat using mock reply")
             return _seeker_chat_fallback(req.messages or [])
         try:
-            system_msg = (
-                "You are a warm, empathetic mental-health onboarding assistant called Bridge. "
-                "Your goal is to gently understand the user's situation in 3-4 exchanges, "
-                "then say you'll find them someone who understands. Keep replies short (2-3 sentences)."
-            )
-            msgs = [{"role": "system", "content": system_msg}] + (req.messages or [])
-            resp = openai_client.chat.completions.create(
-                model=GPT_MODEL, messages=msgs, temperature=0.7,
+            resp = _chat_completion(
+                "seeker_chat", _seeker_chat_messages(req.messages or []), temperature=0.7,
             )
             logger.info("/extract-profile seeker_chat completed")
             return {"reply": resp.choices[0].message.content.strip()}
@@ -219,46 +555,9 @@ async def extract_profile(req: SeekerProfileRequest):
             if req.selected_themes:
                 user_content += f"\n\nSelected themes: {', '.join(req.selected_themes)}"
 
-            system_prompt = f"""You are an expert psychometric profiler for a peer-support matching platform.
-Analyze the helper's per-theme narratives and score them on MIRRORED METRICS that match how seekers are scored.
-This enables accurate helper↔seeker cosine-similarity matching.
-
-Return ONLY valid JSON with this structure:
-{{
-  "themes": [{{"name": "<one of {THEMES}>", "intensity": 0.0-1.0}}],
-  "coping_style": "<one of {list(COPING_STYLES)}>",
-  "communication_style": "<one of {list(CONVERSATION_PREFERENCES)}>",
-  "bio": "1-2 sentence bio summarizing their experience",
-  "theme_scores": {{
-    "<theme_name>": {{
-      "emotional_depth": 0.0-1.0,
-      "resilience_demonstrated": 0.0-1.0,
-      "approach_style": "introvert|extrovert|balanced",
-      "coping_method": "<one of {list(COPING_STYLES)}>",
-      "communication_tone": "<one of {list(CONVERSATION_PREFERENCES)}>",
-      "empathy_signal": 0.0-1.0,
-      "actionability": 0.0-1.0,
-      "self_awareness": 0.0-1.0
-    }}
-  }}
-}}
-
-Scoring guide:
-- emotional_depth: How deeply did they engage with the emotional reality? (0=surface, 1=profound)
-- resilience_demonstrated: How much growth/recovery is evident? (0=still struggling, 1=fully processed)
-- approach_style: Introvert=internal reflection, Extrovert=social coping, Balanced=both
-- coping_method: What strategy did they primarily use?
-- communication_tone: How do they naturally communicate about difficult topics?
-- empathy_signal: How well do they demonstrate understanding of others in similar situations?
-- actionability: How practical/actionable is their experience? (0=abstract, 1=concrete steps)
-- self_awareness: How self-aware are they about the experience? (0=unexamined, 1=deeply reflected)"""
-
-            resp = openai_client.chat.completions.create(
-                model=GPT_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content},
-                ],
+            resp = _chat_completion(
+                "extract_helper",
+                _transcript_messages("extract_helper", EXTRACT_HELPER_SYSTEM_PROMPT, user_content),
                 temperature=0.3,
             )
             text = resp.choices[0].message.content.strip()
@@ -276,25 +575,21 @@ Scoring guide:
             return _extract_helper_fallback(req.selected_themes, req.theme_narratives)
 
     # ── extract_seeker mode (default) ──
+    context = _resolve_context(req.context_id, req.transcript)
+    if context is not None and context["profile"] is not None:
+        logger.info("/extract-profile extract_seeker reused cached profile (context=%s)", context["context_id"])
+        return {**context["profile"], "context_id": context["context_id"]}
+    context_id = context["context_id"] if context is not None else None
+    transcript = context["text"] if context is not None else ""
+
     if not openai_client:
         logger.info("/extract-profile extract_seeker using mock profile")
-        return _extract_seeker_fallback()
+        return {**_extract_seeker_fallback(), "context_id": context_id}
 
     try:
-        system_prompt = f"""Extract a structured profile from this vent/narrative. Return ONLY valid JSON with:
-- themes: list of {{"name": "<one of {THEMES}>", "intensity": 0.0-1.0}}
-- coping_style_preference: {{"problem_focused": 0-1, "emotion_focused": 0-1, "social_support": 0-1, "avoidant": 0-1, "meaning_making": 0-1}}
-- conversation_preference: {{"direct_advice": 0-1, "reflective_listening": 0-1, "collaborative_problem_solving": 0-1, "validation_focused": 0-1}}
-- energy_level: one of ["depleted", "low", "moderate", "high"]
-- distress_level: one of ["Low", "Medium", "High"]
-- urgency: 0-1 float"""
-
-        resp = openai_client.chat.completions.create(
-            model=GPT_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": req.transcript or ""},
-            ],
+        resp = _chat_completion(
+            "extract_seeker",
+            _transcript_messages("extract_seeker", EXTRACT_SEEKER_SYSTEM_PROMPT, transcript),
             temperature=0.3,
         )
         text = resp.choices[0].message.content.strip()
@@ -305,43 +600,81 @@ Scoring guide:
             parsed = json.loads(text)
         except Exception:
             logger.error("/extract-profile extract_seeker JSON parse failed", exc_info=True)
-            return _extract_seeker_fallback()
+            return {**_extract_seeker_fallback(), "context_id": context_id}
+        if context is not None:
+            context["profile"] = parsed
         logger.info("/extract-profile extract_seeker completed")
-        return parsed
+        return {**parsed, "context_id": context_id}
     except Exception:
         logger.error("/extract-profile extract_seeker API failed, using fallback", exc_info=True)
-        return _extract_seeker_fallback()
+        return {**_extract_seeker_fallback(), "context_id": context_id}
 
 
-@app.post("/match", response_model=MatchResponse)
-async def match(req: MatchRequest):
+@app.post("/match", response_model=MatchResponse, response_model_exclude_none=True)
+async def match(req: MatchRequest, request: Request, debug_trace: bool = Query(False, description="Return the span tree inline")):
     """Match seeker profile to helpers using Dha's algorithm."""
     seeker = req.seeker_profile
-    logger.info("/match requested (helper_ids=%s)", bool(req.helper_ids))
+    logger.info("/match requested (helper_ids=%s, context=%s)", bool(req.helper_ids), bool(req.context_id))
+
+    # Fill in whatever earlier steps already computed for this transcript
+    context = _resolve_context(req.context_id, seeker.get("vent_text"))
+    if context is not None:
+        seeker = {**(context["profile"] or {}), **seeker}
+        seeker.setdefault("vent_text", context["text"])
 
     # Generate embedding from vent text if not already present
     if "emotion_embedding" not in seeker or seeker["emotion_embedding"] is None:
-        vent = seeker.get("vent_text", "")
-        seeker["emotion_embedding"] = generate_emotion_embedding(vent, use_openai=False)
+        cached = context is not None and context["embedding"] is not None
+        with MATCH_STAGE.labels("embedding").time(), span("generate_emotion_embedding", cached=cached):
+            if context is not None:
+                seeker["emotion_embedding"] = ensure_embedding(context, _embed)
+            else:
+                seeker["emotion_embedding"] = _embed(seeker.get("vent_text", ""))
 
     # Use full helper pool or filter by IDs
-    pool = helper_pool
+    pool, positions = helper_pool, None  # positions: the part of helper_pool scored, when not all of it
     if req.helper_ids:
-        pool = [h for h in helper_pool if h["user_id"] in req.helper_ids]
-
-    results = match_seeker_to_helpers(seeker, pool, top_k=5, use_learned=True)
+        wanted = set(req.helper_ids)
+        positions = [i for i, h in enumerate(helper_pool) if h["user_id"] in wanted]
+        pool = [helper_pool[i] for i in positions]
+    elif prefilter is not None:
+        with MATCH_STAGE.labels("prefilter").time(), span("prefilter", filters=prefilter.spec):
+            positions, report = prefilter.select(seeker)
+            pool = [helper_pool[i] for i in positions.tolist()]
+        PREFILTER_STATS.record(report)
+
+    timings = {}
+    coverage = None
+    with span("match_seeker_to_helpers", pool=len(pool)):
+        if sharded_matcher is not None and not req.helper_ids:
+            try:
+                results, coverage = await asyncio.to_thread(sharded_matcher.match, seeker, 5, 0.5, True, timings)
+            except ShardsUnavailable as e:
+                logger.error("/match failed: %s", e)
+                raise HTTPException(503, f"Matching unavailable: {e}")
+        else:
+            results = match_seeker_to_helpers(seeker, pool, top_k=5, use_learned=True, timings=timings)
+    for stage, seconds in timings.items():
+        MATCH_STAGE.labels(stage).observe(seconds)
+    MATCH_CANDIDATES.observe(coverage["helpers_scored"] if coverage is not None else len(pool))
 
     matches = []
-    for i, (score, helper_id, breakdown, helper) in enumerate(results):
+    seeker_id = seeker.get("user_id") or (context["context_id"] if context is not None else "anonymous")
+    ledger_rows = []
+    for score, helper_id, breakdown, helper in results:
+        match_id = f"match_{uuid.uuid4().hex[:16]}"
+        ledger_rows.append((match_id, seeker_id, helper_id, breakdown))
         themes = helper.get("themes_experience", {})
         top_theme = max(themes, key=themes.get) if themes else "General Support"
+        with span("_generate_explanation", aggregate=True):
+            explanation = _generate_explanation(breakdown, helper)
         matches.append({
-            "match_id": f"match_{i+1:03d}",
+            "match_id": match_id,
             "helper_id": helper_id,
             "score": score,
             "breakdown": breakdown,
             "top_theme": top_theme,
-            "explanation": _generate_explanation(breakdown, helper),
+            "explanation": explanation,
             "helper": {
                 "user_id": helper.get("user_id", ""),
                 "display_name": helper.get("display_name", "Anonymous Helper"),
@@ -356,64 +689,167 @@ async def match(req: MatchRequest):
                 "experience_narrative": helper.get("experience_narrative"),
             },
         })
+    match_ledger.record_many(ledger_rows)  # shared with the other workers, before any /feedback can arrive
+    if match_log is not None:
+        match_log.log(seeker, helper_pool, [(m["match_id"], m["helper_id"], m["score"]) for m in matches],
+                      learned_matcher.model_version, helper_pool_version, positions)
+    if shadow_scorer is not None:
+        shadow_scorer.maybe_submit(seeker, pool, [(m["helper_id"], m["score"]) for m in matches],
+                                   sum(timings.values()) * 1000, learned_matcher.model_version)
 
     logger.info("/match completed (matches=%s)", len(matches))
-    return MatchResponse(matches=_sanitize(matches))
-
-
-def _sanitize(obj):
-    """Recursively convert numpy types to native Python types for JSON serialization."""
-    if isinstance(obj, dict):
-        return {k: _sanitize(v) for k, v in obj.items()}
-    if isinstance(obj, (list, tuple)):
-        return [_sanitize(v) for v in obj]
-    if isinstance(obj, (np.floating, np.float32, np.float64)):
-        return float(obj)
-    if isinstance(obj, (np.integer, np.int32, np.int64)):
-        return int(obj)
-    if isinstance(obj, np.ndarray):
-        return obj.tolist()
-    return obj
+    payload = {"matches": matches}
+    if coverage is not None:
+        payload["coverage"] = coverage
+    trace = current_trace()
+    if debug_trace and trace:
+        payload["trace"] = trace.tree()
+    # Trusted internal data: encode NumPy values directly, no sanitize/re-validation pass
+    with span("serialize"):
+        return encode_response(request, payload)
+
+
+@app.post("/feedback", status_code=202)
+async def feedback(req: FeedbackRequest):
+    """Record a conversation outcome for a match; queued and written to the feedback store in batches."""
+    record, problem = match_ledger.claim(req.match_id)
+    if problem == "unknown":
+        FEEDBACK_RECEIVED.labels("unknown_match").inc()
+        raise HTTPException(404, "Unknown or expired match_id")
+    if problem == "duplicate":
+        FEEDBACK_RECEIVED.labels("duplicate").inc()
+        raise HTTPException(409, "Feedback already recorded for this match")
+    try:
+        feedback_buffer.put({
+            "match_id": req.match_id,
+            "seeker_id": record["seeker_id"],
+            "helper_id": record["helper_id"],
+            "features": record["features"],
+            "outcome": {
+                "user_rating": req.rating,
+                "conversation_length": req.conversation_length,
+                "follow_up_likelihood": req.follow_up,
+                "source": "api",
+            },
+        })
+    except BufferFull:
+        match_ledger.release(req.match_id)
+        FEEDBACK_RECEIVED.labels("rejected").inc()
+        raise HTTPException(503, "Feedback buffer full, retry later")
+    FEEDBACK_RECEIVED.labels("queued").inc()
+    logger.info("/feedback queued (match=%s, helper=%s, rating=%s)", req.match_id, record["helper_id"], req.rating)
+    return {"status": "queued", "match_id": req.match_id}
 
 
 @app.post("/discover")
-async def discover(req: DiscoverRequest):
+async def discover(req: DiscoverRequest, request: Request):
     """Netflix-style discovery: browse helpers by theme."""
-    logger.info("/discover requested (theme=%s, top_k=%s)", req.theme_name, req.top_k)
-    results = discover_by_theme(req.theme_name, helper_pool, top_k=req.top_k)
-    return {"helpers": [{"helper_id": hid, "score": sc} for sc, hid in results]}
+    logger.info("/discover requested (theme=%s, top_k=%s, online_within_hours=%s)",
+                req.theme_name, req.top_k, req.online_within_hours)
+    pool = helper_pool
+    if req.online_within_hours is not None:
+        pool = [helper_pool[i] for i in availability_index.positions(req.online_within_hours).tolist()]
+    results = discover_by_theme(req.theme_name, pool, top_k=req.top_k)
+    payload = {"helpers": [{"helper_id": hid, "score": sc} for sc, hid in results]}
+    if req.online_within_hours is not None:
+        payload["online"] = len(pool)
+    return encode_response(request, payload)
 
 
 @app.post("/safety-check", response_model=SafetyResponse)
 async def safety_check(req: SafetyRequest):
-    """GPT-4o risk classifier — screens vent before matching."""
-    logger.info("/safety-check requested (openai=%s)", openai_client is not None)
+    """Tiered risk classifier — local head for clear-cut cases, GPT-4o for the rest."""
+    logger.info("/safety-check requested (openai=%s, local=%s)", openai_client is not None, safety_classifier.is_ready)
+    context = _resolve_context(req.context_id, req.transcript)
+    if context is None:
+        raise HTTPException(400, "Provide transcript or a known context_id")
+    context_id = context["context_id"]
+    if context["safety"] is not None:
+        logger.info("/safety-check reused cached verdict (context=%s)", context_id)
+        SAFETY_DECISIONS.labels("cached", context["safety"]["risk_level"]).inc()
+        return SafetyResponse(**context["safety"], context_id=context_id)
+
+    decision = {"risk_level": None, "p_risk": None, "p_high": None, "tier": "escalate"}
+    local_truncated = False  # the local head only saw the start of the text
+    if safety_classifier.is_ready and EMBEDDING_MODE == "sentence_transformers":
+        decision = safety_classifier.classify(ensure_embedding(context, _embed))
+        local_truncated = count_tokens(context["text"]) > SAFETY_LOCAL_MAX_TOKENS
+        if decision["risk_level"] == "low" and local_truncated:
+            decision["risk_level"] = None  # escalate: the embedding only covers the start
+        if decision["risk_level"]:
+            logger.info("/safety-check completed locally (risk_level=%s, p_risk=%s, p_high=%s)",
+                        decision["risk_level"], decision["p_risk"], decision["p_high"])
+            context["safety"] = {"risk_level": decision["risk_level"], "tier": "local"}
+            SAFETY_DECISIONS.labels("local", decision["risk_level"]).inc()
+            return SafetyResponse(**context["safety"], context_id=context_id)
+
     if not openai_client:
-        logger.info("/safety-check using mock risk level")
-        return SafetyResponse(risk_level="low")
+        logger.info("/safety-check using local best guess (p_risk=%s)", decision["p_risk"])
+        return _safety_fallback(decision, context_id, local_truncated)
 
+    chunks, truncated = _safety_chunks(context["text"])
     try:
-        resp = openai_client.chat.completions.create(
-            model=GPT_MODEL,
-            messages=[
-                {"role": "system", "content": (
-                    "You are a mental health risk classifier. Assess the following text for self-harm, "
-                    "suicidal ideation, or crisis indicators. Respond with ONLY one word: low, medium, or high."
-                )},
-                {"role": "user", "content": req.transcript},
-            ],
-            temperature=0.0,
-            max_tokens=5,
-        )
-        level = resp.choices[0].message.content.strip().lower()
-        if level not in ("low", "medium", "high"):
-            logger.error("/safety-check invalid model output: %s", level)
-            level = "low"
-        logger.info("/safety-check completed (risk_level=%s)", level)
-        return SafetyResponse(risk_level=level)
+        responses = await asyncio.gather(*(
+            asyncio.to_thread(_chat_completion, "safety_check", messages, temperature=0.0, max_tokens=5)
+            for messages in chunks
+        ))
+        levels = [resp.choices[0].message.content.strip().lower() for resp in responses]
+        invalid = [level for level in levels if level not in RISK_LEVELS]
+        if invalid:
+            logger.error("/safety-check invalid model output: %s", invalid[0])
+            return _safety_fallback(decision, context_id, local_truncated or truncated)
+        level = max(levels, key=RISK_LEVELS.index)  # the riskiest part of the text decides
+        if truncated and level == "low":
+            level = "medium"  # part of the text was never classified
+        _log_safety_label(context["text"], level, decision)
+        logger.info("/safety-check completed (risk_level=%s, chunks=%d, truncated=%s, escalated p_risk=%s)",
+                    level, len(chunks), truncated, decision["p_risk"])
+        context["safety"] = {"risk_level": level, "tier": "llm"}
+        SAFETY_DECISIONS.labels("llm", level).inc()
+        return SafetyResponse(**context["safety"], context_id=context_id)
     except Exception:
-        logger.error("/safety-check API failed, defaulting to low", exc_info=True)
-        return SafetyResponse(risk_level="low")
+        logger.error("/safety-check API failed, using local best guess", exc_info=True)
+        return _safety_fallback(decision, context_id, local_truncated or truncated)
+
+
+def _safety_chunks(text: str) -> tuple:
+    """
+    (one classifier prompt per chunk, truncated): the whole transcript, split to the
+    safety_check budget rather than clipped; past SAFETY_MAX_CHUNKS only the first
+    and last chunks are sent and truncated is True.
+    """
+    room = budget_for("safety_check") - count_message_tokens([{"content": SAFETY_SYSTEM_PROMPT}, {"content": ""}])
+    chunks = split_text(text, max(room, 64))
+    truncated = len(chunks) > SAFETY_MAX_CHUNKS
+    if truncated:
+        head = (SAFETY_MAX_CHUNKS + 1) // 2
+        chunks = chunks[:head] + chunks[len(chunks) - (SAFETY_MAX_CHUNKS - head):]
+    return [[{"role": "system", "content": SAFETY_SYSTEM_PROMPT}, {"role": "user", "content": chunk}]
+            for chunk in chunks], truncated
+
+
+def _safety_fallback(decision: dict, context_id: str, truncated: bool = False) -> SafetyResponse:
+    """
+    Local best guess when GPT-4o is unavailable (defaults to "low" without a head);
+    never "low" when the text was longer than what the head or GPT-4o could read.
+    """
+    level = SafetyClassifier.best_guess(decision)
+    if truncated and level == "low":
+        level = "medium"
+    FALLBACKS.labels("safety_default_low" if decision["p_risk"] is None else "safety_best_guess").inc()
+    SAFETY_DECISIONS.labels("fallback", level).inc()
+    return SafetyResponse(risk_level=level, tier="fallback", context_id=context_id)
+
+
+def _log_safety_label(transcript: str, level: str, decision: dict):
+    """Append a GPT-labeled example for offline training/eval of the local tier (opt-in)."""
+    if not SAFETY_LABEL_LOG:
+        return
+    try:
+        with open(SAFETY_LABEL_LOG, "a") as f:
+            f.write(json.dumps({"text": transcript, "gpt_label": level, "p_risk": decision["p_risk"]}) + "\n")
+    except OSError:
+        logger.error("Could not append to SAFETY_LABEL_LOG=%s", SAFETY_LABEL_LOG, exc_info=True)
 
 
 @app.post("/scaffold", response_model=ScaffoldResponse)
@@ -425,16 +861,9 @@ async def scaffold(req: ScaffoldRequest):
         return ScaffoldResponse(suggestion=_scaffold_fallback(req.mode))
 
     try:
-        messages = [{"role": "system", "content": req.system_prompt}]
-        messages.extend(req.messages[-6:])  # Last 6 messages for context
-        messages.append({
-            "role": "user",
-            "content": "Based on the conversation so far, suggest ONE short, warm response the helper could say. Start with 'Try: '",
-        })
-
-        resp = openai_client.chat.completions.create(
-            model=GPT_MODEL,
-            messages=messages,
+        resp = _chat_completion(
+            "scaffold",
+            _scaffold_messages(req),
             temperature=0.7,
             max_tokens=100,
         )
@@ -445,6 +874,150 @@ async def scaffold(req: ScaffoldRequest):
         return ScaffoldResponse(suggestion=_scaffold_fallback(req.mode))
 
 
+# ── Streaming variants (SSE) ─────────────────────────────────────────────────
+
+@app.post("/extract-profile/stream")
+async def extract_profile_stream(req: SeekerProfileRequest):
+    """Stream the seeker_chat reply as Server-Sent Events (one event per delta)."""
+    logger.info("/extract-profile/stream requested (mode=%s, openai=%s)", req.mode, openai_client is not None)
+    if req.mode != "seeker_chat":
+        raise HTTPException(400, "Streaming is only supported for mode=seeker_chat")
+    messages = req.messages or []
+    if not openai_client:
+        logger.info("/extract-profile/stream using scripted reply")
+        return _sse_response(_stream_text("/extract-profile/stream", "reply", _seeker_chat_fallback(messages)["reply"]))
+    return _sse_response(_stream_completion(
+        "/extract-profile/stream", "seeker_chat", "reply", lambda: _seeker_chat_fallback(messages)["reply"],
+        messages=_seeker_chat_messages(messages), temperature=0.7,
+    ))
+
+
+@app.post("/scaffold/stream")
+async def scaffold_stream(req: ScaffoldRequest):
+    """Stream the in-chat helper suggestion as Server-Sent Events."""
+    logger.info("/scaffold/stream requested (mode=%s, openai=%s)", req.mode, openai_client is not None)
+    if not openai_client:
+        logger.info("/scaffold/stream using fallback suggestion")
+        return _sse_response(_stream_text("/scaffold/stream", "suggestion", _scaffold_fallback(req.mode)))
+    return _sse_response(_stream_completion(
+        "/scaffold/stream", "scaffold", "suggestion", lambda: _scaffold_fallback(req.mode),
+        messages=_scaffold_messages(req), temperature=0.7, max_tokens=100,
+    ))
+
+
+def _sse_response(events) -> StreamingResponse:
+    """Wrap an event generator in an SSE response that proxies won't buffer."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse_event(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _stream_text(route: str, field: str, text: str, source: str = "fallback"):
+    """Stream a canned reply word-by-word in the same event format as live completions."""
+    start = time.perf_counter()
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        if i == 0:
+            STREAM_TTFB.labels(route, source).observe(time.perf_counter() - start)
+            logger.info("%s first byte (source=%s, ttfb=%.0fms)", route, source, (time.perf_counter() - start) * 1000)
+        yield _sse_event({"delta": word if i == 0 else " " + word})
+    yield _sse_event({"done": True, field: text, "source": source})
+    logger.info("%s completed (source=%s, total=%.0fms)", route, source, (time.perf_counter() - start) * 1000)
+
+
+def _stream_completion(route: str, endpoint: str, field: str, fallback, messages: list, **create_kwargs):
+    """
+    Forward GPT-4o completion deltas as SSE events as soon as they arrive.
+
+    A plain (sync) generator so Starlette iterates it in its threadpool instead of
+    blocking the event loop on the OpenAI socket. If the upstream call fails before
+    the first delta, the scripted fallback (built lazily by calling `fallback()`) is
+    streamed instead; if it fails midway, the partial text is closed out with a
+    terminal event.
+    """
+    start = time.perf_counter()
+    ttfb = None
+    parts = []
+    usage = None
+    try:
+        stream = openai_client.chat.completions.create(
+            model=GPT_MODEL, messages=messages, stream=True,
+            stream_options={"include_usage": True}, **create_kwargs,
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if ttfb is None:
+                ttfb = (time.perf_counter() - start) * 1000
+                STREAM_TTFB.labels(route, "openai").observe(ttfb / 1000)
+                logger.info("%s first byte (source=openai, ttfb=%.0fms)", route, ttfb)
+            parts.append(delta)
+            yield _sse_event({"delta": delta})
+    except Exception:
+        if not parts:
+            logger.error("%s API failed before first token, streaming fallback", route, exc_info=True)
+            yield from _stream_text(route, field, fallback())
+            return
+        logger.error("%s API failed mid-stream after %d deltas", route, len(parts), exc_info=True)
+
+    record_usage(endpoint, GPT_MODEL, usage, time.perf_counter() - start,
+                 prompt_estimate=count_message_tokens(messages))
+    if not parts:
+        logger.error("%s API returned an empty stream, streaming fallback", route)
+        yield from _stream_text(route, field, fallback())
+        return
+    yield _sse_event({"done": True, field: "".join(parts).strip(), "source": "openai"})
+    logger.info("%s completed (source=openai, ttfb=%.0fms, total=%.0fms)",
+                route, ttfb, (time.perf_counter() - start) * 1000)
+
+
+# ── Prompt builders (shared by blocking + streaming endpoints) ───────────────
+
+def _chat_completion(endpoint: str, messages: list, **create_kwargs):
+    """Blocking GPT-4o call with per-request token/cost accounting."""
+    start = time.perf_counter()
+    resp = openai_client.chat.completions.create(model=GPT_MODEL, messages=messages, **create_kwargs)
+    record_usage(endpoint, GPT_MODEL, getattr(resp, "usage", None), time.perf_counter() - start,
+                 prompt_estimate=count_message_tokens(messages))
+    return resp
+
+
+def _transcript_messages(endpoint: str, system_prompt: str, text: str) -> list:
+    """System prompt + a single user text, clipped (head+tail) to the endpoint budget."""
+    room = budget_for(endpoint) - count_message_tokens([{"content": system_prompt}, {"content": ""}])
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": clip_text(text, max(room, 64))},
+    ]
+
+
+def _seeker_chat_messages(messages: list) -> list:
+    """System prompt + conversation history (fitted to the seeker_chat budget)."""
+    room = budget_for("seeker_chat") - count_tokens(SEEKER_CHAT_SYSTEM_PROMPT)
+    return [{"role": "system", "content": SEEKER_CHAT_SYSTEM_PROMPT}] + fit_history(messages, room)
+
+
+def _scaffold_messages(req: ScaffoldRequest) -> list:
+    """Client system prompt + recent chat context (fitted to budget) + the suggestion instruction."""
+    system_prompt = clip_text(req.system_prompt, budget_for("scaffold") // 4, keep_tail=False)
+    room = budget_for("scaffold") - count_tokens(system_prompt) - count_tokens(SCAFFOLD_INSTRUCTION)
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(fit_history(req.messages, room))
+    messages.append({"role": "user", "content": SCAFFOLD_INSTRUCTION})
+    return messages
+
+
 # ── Fallback Functions (when AI is unavailable) ──────────────────────────────
 
 # Scripted onboarding questions — drives conversation without AI
@@ -457,6 +1030,7 @@ _SEEKER_CHAT_SCRIPT = [
 
 def _seeker_chat_fallback(messages: list) -> dict:
     """Return the next scripted question based on conversation progress."""
+    FALLBACKS.labels("seeker_chat").inc()
     user_count = sum(1 for m in messages if m.get("role") == "user")
     idx = min(user_count, len(_SEEKER_CHAT_SCRIPT) - 1)
     return {"reply": _SEEKER_CHAT_SCRIPT[idx]}
@@ -464,6 +1038,7 @@ def _seeker_chat_fallback(messages: list) -> dict:
 
 def _extract_helper_fallback(selected_themes: list = None, theme_narratives: dict = None) -> dict:
     """Build a reasonable helper profile with mirrored theme_scores from selected themes."""
+    FALLBACKS.labels("extract_helper").inc()
     themes = []
     if selected_themes:
         themes = [{"name": t, "intensity": 0.7} for t in selected_themes]
@@ -500,6 +1075,7 @@ def _extract_helper_fallback(selected_themes: list = None, theme_narratives: dic
 
 def _extract_seeker_fallback() -> dict:
     """Return a balanced default seeker profile."""
+    FALLBACKS.labels("extract_seeker").inc()
     return {
         "themes": [{"name": "Family Problems", "intensity": 0.7}],
         "coping_style_preference": {s: 0.5 for s in COPING_STYLES},
@@ -512,6 +1088,7 @@ def _extract_seeker_fallback() -> dict:
 
 def _scaffold_fallback(mode: str) -> str:
     """Return a pre-written helper suggestion for the given conversation mode."""
+    FALLBACKS.labels("scaffold").inc()
     fallbacks = {
         "vent": 'Try: "I\'m here. Take all the time you need."',
         "reflect": 'Try: "It sounds like you\'re feeling really unseen. Is that right?"',
@@ -523,6 +1100,19 @@ def _scaffold_fallback(mode: str) -> str:
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
+def _embed(text: str):
+    """Local (free) emotion embedding used by /match and the safety tier."""
+    return generate_emotion_embedding(text, use_openai=False)
+
+
+def _resolve_context(context_id: Optional[str], text: Optional[str]):
+    """Analysis context by ID or transcript; 404 if only an unknown/expired ID was sent."""
+    context = analysis_contexts.resolve(context_id, text)
+    if context is None and context_id:
+        raise HTTPException(404, "Unknown or expired context_id — resend the transcript")
+    return context
+
+
 def _generate_explanation(breakdown: dict, helper: dict) -> str:
     """Generate a human-readable match explanation."""
     parts = []
@@ -546,9 +1136,130 @@ async def health():
         "helpers_loaded": len(helper_pool),
         "openai_available": openai_client is not None,
         "embedding_mode": "sentence_transformers" if SENTENCE_TRANSFORMERS_AVAILABLE else "synthetic",
+        "embedding_backend": EMBEDDING_BACKEND,
+        "analysis_contexts": len(analysis_contexts),
+        "embedding_quantization": EMBEDDING_QUANTIZATION or "float32",
+        "model_version": learned_matcher.model_version,
+        "match_shards": sharded_matcher.status() if sharded_matcher is not None else None,
+        "helpers_available_now": availability_index.count(1),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+# ── Admin: on-demand profiling (disabled unless ADMIN_TOKEN is set) ──────────
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def _require_admin(request: Request):
+    token = request.headers.get("X-Admin-Token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(403, "Admin token required")
+
+
+@app.get("/admin/profile/cpu")
+async def profile_cpu(request: Request, seconds: float = 10.0, interval_ms: float = 5.0, include_idle: bool = False):
+    """Sample all threads for N seconds; returns flamegraph-compatible collapsed stacks."""
+    _require_admin(request)
+    try:
+        with profiling_session():
+            logger.info("/admin/profile/cpu started (seconds=%s, interval_ms=%s)", seconds, interval_ms)
+            collapsed, stats = await asyncio.to_thread(
+                sample_cpu, seconds, max(interval_ms, 1.0) / 1000, include_idle,
+            )
+    except ProfilerBusy:
+        raise HTTPException(409, "A profiling session is already running")
+    logger.info("/admin/profile/cpu completed (samples=%s, stacks=%s)", stats["samples"], stats["unique_stacks"])
+    return PlainTextResponse(collapsed, headers={
+        "X-Profile-Samples": str(stats["samples"]),
+        "Content-Disposition": 'attachment; filename="bridge-cpu.collapsed"',
+    })
+
+
+@app.get("/admin/profile/memory")
+async def profile_memory(request: Request, seconds: float = 10.0, top: int = 25):
+    """tracemalloc growth over N seconds plus sizes of the known in-memory stores."""
+    _require_admin(request)
+    try:
+        with profiling_session():
+            logger.info("/admin/profile/memory started (seconds=%s)", seconds)
+            report = await asyncio.to_thread(memory_diff, seconds, top)
+            report["inventory"] = await asyncio.to_thread(_memory_inventory)
+    except ProfilerBusy:
+        raise HTTPException(409, "A profiling session is already running")
+    return report
+
+
+def _memory_inventory() -> dict:
+    """Sizes of the structures most likely to grow in a long-lived worker."""
+    return {
+        "helpers": len(helper_pool),
+        "helper_embedding_bytes": embedding_bytes(helper_pool),
+        "helper_pool_bytes": deep_sizeof(helper_pool),
+        "feedback_records": len(feedback_store.data),
+        "feedback_store_bytes": deep_sizeof(feedback_store.data),
+        "analysis_contexts": len(analysis_contexts),
+        "match_ledger": len(match_ledger),
+        "feedback_buffered": len(feedback_buffer),
     }
 
 
+@app.post("/admin/model/rollback")
+async def model_rollback(request: Request):
+    """Re-activate the previous registry version; other workers follow on their next poll."""
+    _require_admin(request)
+    try:
+        version = learned_matcher.rollback()
+    except ModelIntegrityError as e:
+        raise HTTPException(409, str(e))
+    logger.info("/admin/model/rollback → %s", version)
+    return {"model_version": learned_matcher.model_version}
+
+
+@app.get("/admin/trainer")
+async def trainer_status(request: Request):
+    """Background trainer state and the last run reports (window size, RMSE, wall-clock)."""
+    _require_admin(request)
+    if background_trainer is None:
+        raise HTTPException(404, "Background trainer not enabled (TRAINER_ENABLED=1)")
+    return background_trainer.status()
+
+
+@app.post("/admin/trainer/run")
+async def trainer_run(request: Request, cold: bool = False):
+    """Run a training cycle now (409 if one is already running)."""
+    _require_admin(request)
+    if background_trainer is None:
+        raise HTTPException(404, "Background trainer not enabled (TRAINER_ENABLED=1)")
+    report = await asyncio.to_thread(background_trainer.run_once, cold)
+    if report is None:
+        raise HTTPException(409, "A training run is already in progress")
+    return report
+
+
+@app.get("/admin/shadow")
+async def shadow_status(request: Request):
+    """Shadow scorer configuration, CPU budget and run counts."""
+    _require_admin(request)
+    if shadow_scorer is None:
+        raise HTTPException(404, "Shadow scoring not enabled (SHADOW_SCORER)")
+    return shadow_scorer.status()
+
+
+@app.get("/admin/prefilter")
+async def prefilter_status(request: Request):
+    """Hard-constraint prefilter configuration and per-filter selectivity since startup."""
+    _require_admin(request)
+    if not MATCH_PREFILTER:
+        raise HTTPException(404, "Prefilter not enabled (MATCH_PREFILTER)")
+    return {"filters": MATCH_PREFILTER, **PREFILTER_STATS.status()}
+
+
 @app.get("/helpers")
 async def list_helpers():
     """List all helpers in the pool (debug endpoint)."""
@@ -566,3 +1277,23 @@ async def list_helpers():
             for h in helper_pool
         ],
     }
+
+
+@app.post("/helpers", status_code=201)
+async def create_helper(req: HelperCreateRequest):
+    """Add or update a helper from their extracted profile; persisted in the helper store."""
+    if helper_store is None:
+        raise HTTPException(503, "Helper store not configured (HELPER_STORE_PATH)")
+    user_id = req.user_id or f"hlp_{uuid.uuid4().hex[:12]}"
+    helper = helper_from_profile(req.profile, user_id, _embed, req.availability_windows, req.energy_level)
+    # Serve exactly what the store persists (and what a restart would load)
+    profile, embedding = split_helper(helper)
+    helper = {**profile, "emotion_embedding": embedding}
+    with _helper_pool_lock:
+        created = user_id not in _helper_positions()
+    await asyncio.to_thread(helper_store.upsert, helper)
+
+    # Visible to this worker now (same path the other workers' watchers apply it through)
+    await asyncio.to_thread(helper_watcher.poll)
+    logger.info("/helpers %s %s (pool=%d)", "created" if created else "updated", user_id, len(helper_pool))
+    return {"user_id": user_id, "created": created, "helpers": len(helper_pool)}
@@ -0,0 +1,178 @@
+"""
+"Available now" index: one helper bitmap per hour of the week.
+
+availability_overlap_score compares whole 7 × 24 weeks per helper, which is the
+wrong shape for real-time questions like "who can talk in the next two
+hours?". This index inverts availability_windows into 168 buckets (Mon 00:00
+= 0 … Sun 23:00 = 167), each a bitmap over pool positions (bit p = helper at
+helper_pool[p]). A query ORs the buckets it covers: for 1M helpers that is
+~16k uint64 words per hour, tens of microseconds, independent of how the
+profiles are stored.
+
+    index = AvailabilityIndex(helper_pool)
+    index.count(hours=1)               # helpers available this hour
+    index.positions(hours=3)           # pool positions free at some point in the next 3h
+    index.set(position, windows)       # availability changed / helper appended
+
+Helpers without availability_windows count as always available (the matcher
+treats missing windows as neutral). Hours are local server time unless a
+`now` datetime is passed.
+
+api.py keeps one index over the pool: the prefilter's "available" filter reads
+it (prefilter.py) and /discover's "online now" lane (online_within_hours)
+browses only the helpers it returns.
+
+Query latency on a synthetic pool:
+    python availability_index.py --helpers 1000000
+"""
+
+import os
+if __name__ == "__main__":
+    os.environ.setdefault("SKIP_SENTENCE_TRANSFORMERS", "1")  # synthetic helpers; no model needed
+
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from helper_store import snapshot_groups
+from synthetic import DAYS
+
+logger = logging.getLogger("bridge.availability")
+
+HOURS_PER_WEEK = 7 * 24
+PACKED_BYTES = HOURS_PER_WEEK // 8  # helper_store's availability column: np.packbits of the 168 hours
+BUILD_CHUNK = 1 << 16  # helpers transposed per step (a multiple of 64)
+ALWAYS = np.full(PACKED_BYTES, 0xFF, dtype=np.uint8)
+
+
+def hour_bucket(now=None):
+    """Index of the current (weekday, hour) in the 168-hour week, Mon 00:00 = 0."""
+    now = now or datetime.now()
+    return now.weekday() * 24 + now.hour
+
+
+def window_buckets(hours, now=None):
+    """Buckets covering [now, now + hours), wrapping Sunday night into Monday."""
+    span = min(HOURS_PER_WEEK, max(1, int(np.ceil(hours))))
+    return (hour_bucket(now) + np.arange(span)) % HOURS_PER_WEEK
+
+
+def pack_windows(windows):
+    """availability_windows {day: [0/1] * 24} → 21 packed bytes (missing → always available)."""
+    if not windows:
+        return ALWAYS
+    return np.packbits(np.asarray([v for day in DAYS for v in windows.get(day, [0] * 24)], dtype=np.uint8))
+
+
+def packed_availability(helpers):
+    """n × 21 packed availability bytes; snapshot HelperViews are read straight from their column."""
+    packed = np.empty((len(helpers), PACKED_BYTES), dtype=np.uint8)
+    done = np.zeros(len(helpers), dtype=bool)
+    for snapshot, (positions, rows) in snapshot_groups(helpers, ("availability_windows",)).items():
+        packed[positions] = snapshot.columns["availability"][rows]
+        done[positions] = True
+    for position in np.flatnonzero(~done).tolist():
+        packed[position] = pack_windows(helpers[position].get("availability_windows"))
+    return packed
+
+
+class AvailabilityIndex:
+    """168 hour-of-week bitmaps over helper pool positions."""
+
+    def __init__(self, helpers=(), packed=None):
+        """Index a helper list, or `packed` n × 21 availability bytes (packed_availability's output)."""
+        self._lock = threading.Lock()
+        if packed is None:
+            packed = packed_availability(helpers)
+        self.size = len(packed)
+        self.bits = np.zeros((HOURS_PER_WEEK, max(1, -(-self.size // 64))), dtype=np.uint64)
+        if self.size:
+            self._load(packed)
+
+    def _load(self, packed):
+        """Transpose helper-major packed bytes into the hour-major bitmaps, a chunk at a time."""
+        as_bytes = self.bits.view(np.uint8)
+        for start in range(0, len(packed), BUILD_CHUNK):
+            hours = np.unpackbits(packed[start:start + BUILD_CHUNK], axis=1)  # chunk × 168
+            columns = np.packbits(hours.T, axis=1, bitorder="little")  # 168 × chunk/8
+            as_bytes[:, start // 8:start // 8 + columns.shape[1]] = columns
+
+    def __len__(self):
+        return self.size
+
+    def set(self, position, windows):
+        """Update one helper's hours (position == len() appends)."""
+        hours = np.unpackbits(pack_windows(windows)).astype(np.uint64)
+        word, bit = divmod(position, 64)
+        with self._lock:
+            if word >= self.bits.shape[1]:
+                grown = np.zeros((HOURS_PER_WEEK, max(2 * self.bits.shape[1], word + 1)), dtype=np.uint64)
+                grown[:, :self.bits.shape[1]] = self.bits
+                self.bits = grown
+            column = self.bits[:, word]
+            self.bits[:, word] = (column & ~np.uint64(1 << bit)) | (hours << np.uint64(bit))
+            self.size = max(self.size, position + 1)
+
+    def bitmap(self, hours=1, now=None):
+        """OR of the buckets in [now, now + hours): uint64 words, bit p = helper p."""
+        buckets = window_buckets(hours, now)
+        with self._lock:
+            return np.bitwise_or.reduce(self.bits[buckets], axis=0), self.size
+
+    def mask(self, hours=1, now=None):
+        """Boolean mask over pool positions: available at some point in the window."""
+        words, size = self.bitmap(hours, now)
+        return np.unpackbits(words.view(np.uint8), bitorder="little", count=size).view(bool)
+
+    def positions(self, hours=1, now=None):
+        return np.flatnonzero(self.mask(hours, now))
+
+    def count(self, hours=1, now=None):
+        words, _ = self.bitmap(hours, now)
+        return int(np.count_nonzero(np.unpackbits(words.view(np.uint8))))  # bits past size are never set
+
+    def status(self, now=None):
+        return {"helpers": self.size, "available_now": self.count(1, now), "bucket": hour_bucket(now)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from synthetic import PopulationGenerator
+
+    parser = argparse.ArgumentParser(description="Build an availability index over a synthetic pool and time queries.")
+    parser.add_argument("--helpers", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    population = PopulationGenerator(args.seed, dim=8).helpers(args.helpers)
+    packed = np.packbits(population["availability"].reshape(args.helpers, HOURS_PER_WEEK), axis=1)
+    start = time.perf_counter()
+    index = AvailabilityIndex(packed=packed)
+    print(f"\nIndexed {args.helpers} helpers in {time.perf_counter() - start:.2f}s "
+          f"({index.bits.nbytes / 1e6:.1f} MB of bitmaps)")
+
+    # Spot-check against the raw columns
+    bucket = hour_bucket()
+    expected = int(np.unpackbits(packed, axis=1)[:, bucket].sum())
+    print(f"{'✓' if index.count(1) == expected else '❌'} available now: {index.count(1)} (scan: {expected})")
+
+    print(f"\n{'query':<24} {'p50 µs':>9} {'p95 µs':>9} {'result':>10}")
+    for label, fn in [
+        ("count(now)", lambda: index.count(1)),
+        ("count(next 3h)", lambda: index.count(3)),
+        ("mask(next 3h)", lambda: index.mask(3)),
+        ("positions(now)", lambda: index.positions(1)),
+        ("set(position)", lambda: index.set(7, {day: [1] * 24 for day in DAYS})),
+    ]:
+        times = []
+        for _ in range(args.queries):
+            t = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - t)
+        shown = len(result) if isinstance(result, np.ndarray) else ("-" if result is None else result)
+        print(f"{label:<24} {np.percentile(times, 50) * 1e6:>9.0f} {np.percentile(times, 95) * 1e6:>9.0f} {shown:>10}")
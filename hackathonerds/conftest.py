@@ -0,0 +1,24 @@
+"""
+pytest setup: run from this directory (`python -m pytest -q`).
+
+Modules here import each other flat, and local_test_matcher loads the
+sentence-transformer model at import unless told not to; the behavior tests
+use the deterministic fallback embedder instead. Files api.py creates at
+import (match ledger, job records, transcript cache, model registry) go to a
+temporary directory. test_api_key.py and test_sentence_transformer.py are
+manual scripts (they call real services / download a model at import), so
+they are not collected.
+"""
+
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("SKIP_SENTENCE_TRANSFORMERS", "1")
+_STATE_DIR = tempfile.mkdtemp(prefix="bridge-tests-")
+for _name, _default in (("MATCH_LEDGER_PATH", "match_ledger.db"), ("TRANSCRIBE_JOBS_DIR", "transcribe_jobs"),
+                        ("TRANSCRIPT_CACHE_DIR", "transcript_cache"), ("MODEL_REGISTRY_DIR", "model_registry")):
+    os.environ.setdefault(_name, os.path.join(_STATE_DIR, _default))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+collect_ignore = ["test_api_key.py", "test_sentence_transformer.py"]
@@ -0,0 +1,274 @@
+"""
+Pluggable backends for the all-MiniLM-L6-v2 sentence embedding model.
+
+    EMBEDDING_BACKEND=torch       SentenceTransformer on PyTorch (default, original path)
+    EMBEDDING_BACKEND=onnx        ONNX Runtime, fp32 export of the same model
+    EMBEDDING_BACKEND=onnx-int8   ONNX Runtime, dynamic int8-quantized weights
+
+The ONNX backends import neither torch nor transformers at serve time (tokenizer
+via the `tokenizers` package, inference via onnxruntime), so they avoid the
+PyTorch RSS/import cost and the OpenMP clash with LightGBM.
+
+All backends expose SentenceTransformer's encode() shape: a string → (384,),
+a list → (n, 384), L2-normalized (mean pooling + Normalize, as in the ST model).
+Equivalence tolerance vs torch: cosine ≥ 0.999 (onnx), ≥ 0.99 (onnx-int8).
+
+    python embedding_backends.py export [--int8]     # one-off: write ONNX_MODEL_DIR
+    python embedding_backends.py bench               # throughput / p99 / RSS / tolerance
+"""
+
+import time
+_MODULE_START = time.perf_counter()  # bench: load time includes the backend's imports
+
+import os
+import sys
+import json
+
+import numpy as np
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx/all-MiniLM-L6-v2")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = onnxruntime default
+MAX_SEQ_LENGTH = 256  # same truncation as the ST model config
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+TOLERANCE = {"onnx": 0.999, "onnx-int8": 0.99}  # min cosine vs torch
+
+# CRITICAL: sentence_transformers must be imported before LightGBM (OpenMP clash),
+# so the torch backend imports it here, at module import time.
+if EMBEDDING_BACKEND == "torch":
+    try:
+        from sentence_transformers import SentenceTransformer
+        BACKEND_AVAILABLE = True
+    except ImportError:
+        BACKEND_AVAILABLE = False
+else:
+    try:
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        BACKEND_AVAILABLE = os.path.exists(os.path.join(ONNX_MODEL_DIR, "tokenizer.json"))
+    except ImportError:
+        BACKEND_AVAILABLE = False
+
+
+class EmbeddingBackend:
+    """encode(str | list[str]) → L2-normalized float32 embedding(s)."""
+
+    name = "base"
+    dim = EMBEDDING_DIM
+
+    def encode(self, texts, convert_to_numpy=True, batch_size=32):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        out = np.concatenate([
+            self._encode_batch(batch[i:i + batch_size]) for i in range(0, len(batch), batch_size)
+        ]) if batch else np.zeros((0, self.dim), dtype=np.float32)
+        return out[0] if single else out
+
+    def _encode_batch(self, texts):
+        raise NotImplementedError
+
+
+class TorchBackend(EmbeddingBackend):
+    name = "torch"
+
+    def __init__(self):
+        self.model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")  # Force CPU to avoid issues
+
+    def _encode_batch(self, texts):
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """all-MiniLM-L6-v2 exported to ONNX; mean pooling + L2 normalize in NumPy."""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, quantized=False):
+        self.name = "onnx-int8" if quantized else "onnx"
+        model_file = os.path.join(model_dir, "model.int8.onnx" if quantized else "model.onnx")
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(f"{model_file} missing — run `python embedding_backends.py export"
+                                    f"{' --int8' if quantized else ''}`")
+        options = ort.SessionOptions()
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feeds)[0]                  # (n, seq, 384)
+        mask = attention[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+def load_backend(name=EMBEDDING_BACKEND):
+    """Instantiate the configured backend (raises if its dependencies/files are missing)."""
+    if name == "torch":
+        return TorchBackend()
+    if name in ("onnx", "onnx-int8"):
+        return OnnxBackend(quantized=name == "onnx-int8")
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {name!r}; expected one of {BACKENDS}")
+
+
+# ── Export (needs torch + transformers, run once offline) ────────────────────
+
+def export_onnx(out_dir=ONNX_MODEL_DIR, int8=False):
+    """Export all-MiniLM-L6-v2 (transformer only; pooling stays in NumPy) + tokenizer."""
+    import inspect
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    # Eager attention: SDPA drops an all-ones mask at trace time, which would bake
+    # "no padding" into the graph and break padded batches
+    model = AutoModel.from_pretrained(MODEL_NAME, attn_implementation="eager").eval()
+    tokenizer.save_pretrained(out_dir)
+
+    # Padded two-row sample so the traced graph keeps the attention-mask path
+    sample = tokenizer(["export sample", "a longer export sample sentence"], padding=True, return_tensors="pt")
+    model_path = os.path.join(out_dir, "model.onnx")
+    axes = {0: "batch", 1: "sequence"}
+    export_kwargs = dict(
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes,
+                      "last_hidden_state": axes},
+        opset_version=17,
+    )
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # torch >= 2.5 may default to the dynamo exporter (needs onnxscript); use the TorchScript one
+        export_kwargs["dynamo"] = False
+
+    class _Encoder(torch.nn.Module):
+        """Positional-args wrapper so the export doesn't depend on forward()'s kwarg order."""
+
+        def __init__(self, bert):
+            super().__init__()
+            self.bert = bert
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.bert(input_ids=input_ids, attention_mask=attention_mask,
+                             token_type_ids=token_type_ids).last_hidden_state
+
+    inputs = (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"])
+    with torch.no_grad():
+        torch.onnx.export(_Encoder(model).eval(), inputs, model_path, **export_kwargs)
+    print(f"✓ Exported {model_path}")
+
+    if int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized_path = os.path.join(out_dir, "model.int8.onnx")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"✓ Quantized {quantized_path}")
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+BENCH_TEXTS = [
+    "I'm so stressed about my exams, can't sleep, feel like I'm failing",
+    "My family doesn't understand me, constant arguments at home",
+    "I feel so alone, like no one really gets what I'm going through",
+    "I'm exhausted all the time, can't keep up, everything feels too much",
+    "My friends don't seem to care, feeling left out and isolated",
+    "I don't know what I'm doing with my life, feel lost and directionless",
+    "I feel like such a failure, everyone else has it together but me",
+    "I've dealt with burnout / emotional exhaustion and learned to cope",
+]
+
+
+def _max_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KB on Linux
+
+
+def _bench_one(name, n_texts, out_path):
+    """Run in a fresh process so import time and RSS belong to this backend only."""
+    backend = load_backend(name)
+    load_s = time.perf_counter() - _MODULE_START
+
+    texts = [BENCH_TEXTS[i % len(BENCH_TEXTS)] + f" ({i})" for i in range(n_texts)]
+    backend.encode(texts[:8])  # warm-up
+
+    start = time.perf_counter()
+    embeddings = backend.encode(texts, batch_size=32)
+    throughput = n_texts / (time.perf_counter() - start)
+
+    latencies = []
+    for text in texts[:200]:
+        t0 = time.perf_counter()
+        backend.encode(text)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    np.save(out_path, embeddings)
+    print(json.dumps({
+        "backend": name,
+        "load_s": round(load_s, 2),
+        "texts_per_s": round(throughput, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "max_rss_mb": round(_max_rss_mb(), 1),
+    }))
+
+
+def bench(n_texts=1000, backends=BACKENDS):
+    import subprocess
+    import tempfile
+
+    rows, vectors = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in backends:
+            out_path = os.path.join(tmp, f"{name}.npy")
+            proc = subprocess.run(
+                [sys.executable, __file__, "_bench_one", name, str(n_texts), out_path],
+                capture_output=True, text=True, env={**os.environ, "EMBEDDING_BACKEND": name},
+            )
+            if proc.returncode != 0:
+                print(f"⚠️  {name}: skipped ({proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'})")
+                continue
+            rows.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            vectors[name] = np.load(out_path)
+
+    print(f"\n{'backend':>10} {'load s':>7} {'texts/s':>9} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'RSS MB':>7} {'min cos':>8} {'tol':>6}")
+    for row in rows:
+        name = row["backend"]
+        min_cos, ok = "-", ""
+        if name != "torch" and "torch" in vectors:
+            cos = (vectors[name] * vectors["torch"]).sum(axis=1)  # both L2-normalized
+            min_cos = f"{cos.min():.5f}"
+            ok = "✓" if cos.min() >= TOLERANCE[name] else "✗"
+        print(f"{name:>10} {row['load_s']:>7.2f} {row['texts_per_s']:>9.1f} {row['p50_ms']:>7.2f} "
+              f"{row['p99_ms']:>7.2f} {row['max_rss_mb']:>7.1f} {min_cos:>8} {ok:>6}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    if len(sys.argv) > 1 and sys.argv[1] == "_bench_one":
+        _bench_one(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Export / benchmark sentence embedding backends.")
+    parser.add_argument("command", choices=["export", "bench"])
+    parser.add_argument("--int8", action="store_true", help="export: also write a dynamic int8 model")
+    parser.add_argument("--texts", type=int, default=1000, help="bench: number of texts to encode")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(int8=args.int8)
+    else:
+        bench(n_texts=args.texts)
@@ -0,0 +1,279 @@
+"""
+Quantized storage for helper emotion embeddings.
+
+Helper embeddings are float32 (384-d MiniLM, 1536-d OpenAI). At pool scale that
+is 1.5–6 KB per helper, most of it redundant for cosine ranking. A
+QuantizedEmbeddingStore keeps the whole pool in one contiguous code matrix:
+
+    float16   2 bytes/dim      cosine on upcast codes
+    int8      1 byte/dim       symmetric per-vector scale; the scale cancels in
+                               cosine, so scoring is q·codes / (|q|·|codes|)
+    pq        M bytes/vector   product quantization (M subspaces × 256 centroids,
+                               default M = dim/4), asymmetric distance via a
+                               per-query lookup table. Lossy — meant for the
+                               1536-d case where int8 is still 1.5 GB per 1M.
+
+Each helper dict then holds a QuantizedEmbedding handle (store + row) under
+"emotion_embedding"; emotion_embedding_similarity() scores it directly on the
+codes without materializing a float32 copy.
+
+    python embedding_quant.py --n 20000 --dim 384      # rank agreement + memory report
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("bridge.quant")
+
+QUANT_MODES = ("float16", "int8", "pq")
+
+
+def _normalize_rows(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _kmeans(x, k, iters=15, seed=0):
+    """Plain Lloyd's k-means (enough for PQ codebooks; no sklearn dependency)."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        # ‖x−c‖² = ‖x‖² − 2x·c + ‖c‖²; ‖x‖² is constant per row so it can be dropped
+        dists = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * x @ centroids.T
+        assign = dists.argmin(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class QuantizedEmbedding:
+    """Handle for one helper's quantized vector inside a QuantizedEmbeddingStore."""
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __len__(self):
+        return self.store.dim
+
+    def cosine(self, query):
+        return self.store.cosine_row(query, self.row)
+
+    def dequantize(self):
+        return self.store.dequantize_row(self.row)
+
+
+class QuantizedEmbeddingStore:
+    """Contiguous quantized matrix for a pool of embeddings."""
+
+    def __init__(self, mode="int8", pq_subspaces=None):
+        if mode not in QUANT_MODES:
+            raise ValueError(f"Unknown quantization mode {mode!r}; expected one of {QUANT_MODES}")
+        self.mode = mode
+        self.pq_subspaces = pq_subspaces
+        self.dim = None
+        self.codes = None        # (n, dim) float16/int8, or (n, M) uint8 for PQ
+        self.code_norms = None   # (n,) float32 — norm of the decoded vector
+        self.scales = None       # (n,) float32 — int8 only (for dequantize)
+        self.codebooks = None    # (M, 256, dim/M) float32 — PQ only
+
+    def __len__(self):
+        return 0 if self.codes is None else len(self.codes)
+
+    # ── Build ──
+
+    def fit(self, vectors):
+        """Quantize an (n, dim) float matrix; returns one handle per row."""
+        x = np.asarray(vectors, dtype=np.float32)
+        self.dim = x.shape[1]
+        if self.mode == "float16":
+            self.codes = x.astype(np.float16)
+            self.code_norms = np.linalg.norm(self.codes.astype(np.float32), axis=1)
+        elif self.mode == "int8":
+            max_abs = np.abs(x).max(axis=1)
+            max_abs[max_abs == 0] = 1.0
+            self.scales = (max_abs / 127.0).astype(np.float32)
+            self.codes = np.clip(np.rint(x / self.scales[:, None]), -127, 127).astype(np.int8)
+            self.code_norms = np.linalg.norm(self.codes.astype(np.float32), axis=1)
+        else:
+            self._fit_pq(x)
+        self.code_norms = self.code_norms.astype(np.float32)
+        self.code_norms[self.code_norms == 0] = 1.0
+        return [QuantizedEmbedding(self, i) for i in range(len(x))]
+
+    def _fit_pq(self, x):
+        m = self.pq_subspaces or max(1, x.shape[1] // 4)
+        while x.shape[1] % m:
+            m -= 1
+        sub = x.shape[1] // m
+        # Codebooks are trained on unit vectors so they model direction, not length
+        unit = _normalize_rows(x)
+        sample = unit[np.random.default_rng(0).choice(len(unit), size=min(len(unit), 20000), replace=False)]
+        self.codebooks = np.stack([
+            _kmeans(sample[:, j * sub:(j + 1) * sub], 256, seed=j) for j in range(m)
+        ]).astype(np.float32)
+        codes = np.empty((len(unit), m), dtype=np.uint8)
+        for j in range(m):
+            block = unit[:, j * sub:(j + 1) * sub]
+            book = self.codebooks[j]
+            codes[:, j] = ((book ** 2).sum(axis=1)[None, :] - 2.0 * block @ book.T).argmin(axis=1)
+        self.codes = codes
+        self.pq_subspaces = m
+        # Norm of each reconstructed vector, in chunks to bound the (n, M, sub) temporary
+        self.code_norms = np.empty(len(unit), dtype=np.float32)
+        for start in range(0, len(unit), 65536):
+            recon = self.codebooks[np.arange(m)[None, :], codes[start:start + 65536]]
+            self.code_norms[start:start + 65536] = np.linalg.norm(recon.reshape(len(recon), -1), axis=1)
+
+    # ── Scoring ──
+
+    def cosine_row(self, query, row):
+        """Cosine similarity between a float query and one stored row."""
+        q = np.asarray(query, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0:
+            return 0.0
+        if self.mode == "pq":
+            m = self.pq_subspaces
+            centroids = self.codebooks[np.arange(m), self.codes[row]]       # (M, sub)
+            dot = float((q.reshape(m, -1) * centroids).sum())
+        else:
+            dot = float(q @ self.codes[row].astype(np.float32))
+        return dot / (float(q_norm) * float(self.code_norms[row]))
+
+    def similarities(self, query):
+        """Cosine similarity of a query against every stored row, as an (n,) array."""
+        q = np.asarray(query, dtype=np.float32)
+        q_norm = np.linalg.norm(q) or 1.0
+        if self.mode == "pq":
+            m = self.pq_subspaces
+            lut = np.einsum("ms,mks->mk", q.reshape(m, -1), self.codebooks)   # (M, 256)
+            dots = lut[np.arange(m)[None, :], self.codes].sum(axis=1)
+        else:
+            dots = self.codes.astype(np.float32) @ q
+        return dots / (q_norm * self.code_norms)
+
+    def dequantize_row(self, row):
+        if self.mode == "float16":
+            return self.codes[row].astype(np.float32)
+        if self.mode == "int8":
+            return self.codes[row].astype(np.float32) * self.scales[row]
+        m = self.pq_subspaces
+        return self.codebooks[np.arange(m), self.codes[row]].reshape(-1)
+
+    # ── Accounting ──
+
+    def nbytes(self):
+        """Bytes held by codes + per-vector metadata + shared codebooks."""
+        total = self.codes.nbytes + self.code_norms.nbytes
+        if self.scales is not None:
+            total += self.scales.nbytes
+        if self.codebooks is not None:
+            total += self.codebooks.nbytes
+        return total
+
+    def bytes_per_vector(self):
+        """Marginal bytes per additional vector (shared codebooks excluded)."""
+        per = self.codes.shape[1] * self.codes.itemsize + 4  # + code norm
+        if self.scales is not None:
+            per += 4
+        return per
+
+
+def quantize_pool(helpers, mode="int8", pq_subspaces=None):
+    """
+    Replace each helper's float "emotion_embedding" with a QuantizedEmbedding handle
+    into one shared store. Helpers with a different embedding size than the majority
+    (e.g. 8-d synthetic vs 384-d model output) are left untouched.
+    """
+    if not helpers:
+        return None
+    dims = [len(h["emotion_embedding"]) for h in helpers]
+    dim = max(set(dims), key=dims.count)
+    members = [h for h, d in zip(helpers, dims) if d == dim and not isinstance(h["emotion_embedding"], QuantizedEmbedding)]
+    if not members:
+        return None
+    store = QuantizedEmbeddingStore(mode=mode, pq_subspaces=pq_subspaces)
+    handles = store.fit(np.stack([np.asarray(h["emotion_embedding"], dtype=np.float32) for h in members]))
+    for helper, handle in zip(members, handles):
+        helper["emotion_embedding"] = handle
+    logger.info("Quantized %d helper embeddings (mode=%s, dim=%d, %.1f KB → %.1f KB)",
+                len(members), mode, dim, len(members) * dim * 4 / 1024, store.nbytes() / 1024)
+    return store
+
+
+# ── Rank-agreement / memory report ───────────────────────────────────────────
+
+def _spearman(a, b):
+    ra = np.empty(len(a)); ra[np.argsort(a)] = np.arange(len(a))
+    rb = np.empty(len(b)); rb[np.argsort(b)] = np.arange(len(b))
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def _clustered_vectors(n, dim, clusters=50, spread=0.35, seed=0):
+    """Unit vectors around a few centroids — closer to real narrative embeddings than iid noise."""
+    rng = np.random.default_rng(seed)
+    centers = _normalize_rows(rng.standard_normal((clusters, dim)))
+    x = centers[rng.integers(0, clusters, size=n)] + spread * rng.standard_normal((n, dim)) / np.sqrt(dim) * 4
+    return _normalize_rows(x).astype(np.float32)
+
+
+def rank_agreement_report(vectors, queries, modes=QUANT_MODES, top_k=10, pq_subspaces=None):
+    """Spearman ρ, top-k recall vs float32 and memory/1M helpers for each mode."""
+    x = np.asarray(vectors, dtype=np.float32)
+    exact_norms = np.linalg.norm(x, axis=1)
+    rows = [{
+        "mode": "float32",
+        "spearman": 1.0,
+        "recall_at_k": 1.0,
+        "mb_per_million": round(x.shape[1] * 4 * 1_000_000 / 1e6, 1),
+    }]
+    for mode in modes:
+        store = QuantizedEmbeddingStore(mode=mode, pq_subspaces=pq_subspaces)
+        store.fit(x)
+        rhos, recalls = [], []
+        for q in queries:
+            exact = (x @ q) / (exact_norms * np.linalg.norm(q))
+            approx = store.similarities(q)
+            rhos.append(_spearman(exact, approx))
+            top_exact = set(np.argpartition(-exact, top_k)[:top_k])
+            top_approx = set(np.argpartition(-approx, top_k)[:top_k])
+            recalls.append(len(top_exact & top_approx) / top_k)
+        rows.append({
+            "mode": mode,
+            "spearman": round(float(np.mean(rhos)), 4),
+            "recall_at_k": round(float(np.mean(recalls)), 4),
+            "mb_per_million": round(store.bytes_per_vector() * 1_000_000 / 1e6, 1),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rank agreement + memory of quantized helper embeddings.")
+    parser.add_argument("--n", type=int, default=20000, help="Pool size")
+    parser.add_argument("--dim", type=int, default=384, help="384 (MiniLM) or 1536 (OpenAI)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ subspaces (default dim/4)")
+    args = parser.parse_args()
+
+    pool = _clustered_vectors(args.n, args.dim)
+    queries = _clustered_vectors(args.queries, args.dim, seed=1)
+    print(f"Pool: {args.n} × {args.dim}d, {args.queries} queries, top-{args.top_k}")
+    print(f"\n{'mode':>8} {'spearman':>9} {'recall@k':>9} {'MB / 1M helpers':>16} {'saved':>7}")
+    report = rank_agreement_report(pool, queries, top_k=args.top_k, pq_subspaces=args.pq_m)
+    base = report[0]["mb_per_million"]
+    for row in report:
+        saved = 1 - row["mb_per_million"] / base
+        print(f"{row['mode']:>8} {row['spearman']:>9.4f} {row['recall_at_k']:>9.3f} "
+              f"{row['mb_per_million']:>16.1f} {saved:>6.0%}")
@@ -0,0 +1,317 @@
+"""
+Feedback ingestion for POST /feedback: match ledger + write-behind buffer.
+
+- MatchLedger remembers what /match returned (match_id → helper_id, seeker_id,
+  breakdown features) in a SQLite file (MATCH_LEDGER_PATH) shared by every
+  uvicorn worker, bounded by MATCH_LEDGER_MAX entries and MATCH_LEDGER_TTL_S,
+  so an outcome can be joined to the exact features the model scored no matter
+  which worker served the /match. Each match accepts one outcome; the claim is
+  a single SQLite write transaction, so two workers can't both accept it.
+- FeedbackBuffer queues feedback records in memory and a background thread
+  flushes them to FeedbackStore.add_feedback_batch() when FEEDBACK_FLUSH_SIZE
+  records are waiting or FEEDBACK_FLUSH_INTERVAL_S has passed since the oldest
+  one arrived. The request path only does a queue put — it never touches disk.
+  Records still queued at interpreter exit are flushed by an atexit hook.
+- FeedbackLog is FeedbackStore's file: an append-only sequence of pickled
+  lists of entries (a pre-existing feedback_data.pkl is simply the first one).
+  A flush appends one pickle under an exclusive flock instead of rewriting the
+  file, and every reader picks up what other workers appended since its last
+  read, so the trainer sees all workers' feedback. A torn final pickle (a
+  writer crashed mid-append) is ignored by readers and cut off by the next
+  writer.
+
+A full buffer (FEEDBACK_BUFFER_MAX) rejects new records with BufferFull rather
+than growing without bound.
+"""
+
+import os
+import atexit
+import fcntl
+import logging
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import FEEDBACK_BUFFERED, FEEDBACK_FLUSH
+
+logger = logging.getLogger("bridge.feedback")
+
+MATCH_LEDGER_PATH = os.getenv("MATCH_LEDGER_PATH", "match_ledger.db")
+MATCH_LEDGER_MAX = int(os.getenv("MATCH_LEDGER_MAX", "50000"))
+MATCH_LEDGER_TTL_S = float(os.getenv("MATCH_LEDGER_TTL_S", str(7 * 24 * 3600)))
+FEEDBACK_FLUSH_SIZE = int(os.getenv("FEEDBACK_FLUSH_SIZE", "100"))
+FEEDBACK_FLUSH_INTERVAL_S = float(os.getenv("FEEDBACK_FLUSH_INTERVAL_S", "5"))
+FEEDBACK_BUFFER_MAX = int(os.getenv("FEEDBACK_BUFFER_MAX", "10000"))
+LEDGER_PRUNE_EVERY = 1000  # records written by this process between expiry / size sweeps
+
+
+class BufferFull(RuntimeError):
+    """The write-behind buffer is at capacity (the store is not keeping up)."""
+
+
+class MatchLedger:
+    """Bounded match_id → scored-match record map with a TTL, in SQLite shared across processes."""
+
+    def __init__(self, path=MATCH_LEDGER_PATH, max_entries=MATCH_LEDGER_MAX, ttl_s=MATCH_LEDGER_TTL_S):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._since_prune = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")  # a lost ledger row only costs that match's feedback
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS matches (
+                match_id TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL,         -- wall clock: shared by every process
+                seeker_id TEXT,
+                helper_id TEXT NOT NULL,
+                features BLOB NOT NULL,           -- pickled breakdown dict
+                claimed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS matches_expires ON matches(expires_at);
+        """)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM matches WHERE expires_at >= ?", (time.time(),)).fetchone()[0]
+
+    def record(self, match_id, seeker_id, helper_id, features):
+        self.record_many([(match_id, seeker_id, helper_id, features)])
+
+    def record_many(self, matches):
+        """Remember (match_id, seeker_id, helper_id, features) tuples in one write transaction."""
+        expires_at = time.time() + self.ttl_s
+        rows = [(match_id, expires_at, seeker_id, helper_id, pickle.dumps(features))
+                for match_id, seeker_id, helper_id, features in matches]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO matches (match_id, expires_at, seeker_id, helper_id, features) "
+                    "VALUES (?, ?, ?, ?, ?)", rows,
+                )
+                self._since_prune += len(rows)
+                if self._since_prune >= LEDGER_PRUNE_EVERY:
+                    self._prune()
+                    self._since_prune = 0
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _prune(self):
+        """Drop expired matches, then the oldest beyond max_entries (rowids grow with insertion)."""
+        self._db.execute("DELETE FROM matches WHERE expires_at < ?", (time.time(),))
+        self._db.execute("DELETE FROM matches WHERE rowid <= (SELECT MAX(rowid) FROM matches) - ?",
+                         (self.max_entries,))
+
+    def claim(self, match_id):
+        """
+        Record for a match that hasn't received feedback yet, marking it used.
+        Returns (record, None) or (None, "unknown" | "duplicate").
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")  # check-and-mark is atomic across workers
+            try:
+                found = self._db.execute(
+                    "SELECT expires_at, claimed, seeker_id, helper_id, features FROM matches WHERE match_id = ?",
+                    (match_id,),
+                ).fetchone()
+                if found is None or found[0] < time.time():
+                    if found is not None:
+                        self._db.execute("DELETE FROM matches WHERE match_id = ?", (match_id,))
+                    problem = "unknown"
+                elif found[1]:
+                    problem = "duplicate"
+                else:
+                    self._db.execute("UPDATE matches SET claimed = 1 WHERE match_id = ?", (match_id,))
+                    problem = None
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if problem is not None:
+            return None, problem
+        return {
+            "seeker_id": found[2],
+            "helper_id": found[3],
+            "features": pickle.loads(found[4]),
+            "feedback_received": True,
+        }, None
+
+    def release(self, match_id):
+        """Undo a claim (the record couldn't be queued)."""
+        with self._lock:
+            self._db.execute("UPDATE matches SET claimed = 0 WHERE match_id = ?", (match_id,))
+
+
+# ── Feedback log (FeedbackStore's file) ──────────────────────────────────────
+
+def read_feedback_log(path, offset=0):
+    """(entries, offset after the last complete pickle) for a feedback log read from `offset`."""
+    entries = []
+    if not os.path.exists(path):
+        return entries, offset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                break
+            except Exception:  # torn final pickle: stop at the last complete one
+                logger.warning("Ignoring a partial record batch at byte %d of %s", offset, path)
+                break
+            entries.extend(batch)
+            offset = f.tell()
+    return entries, offset
+
+
+class FeedbackLog:
+    """Append-only feedback file shared by every worker: a sequence of pickled entry lists."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self._offset = 0  # bytes of the file already read into entries
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _flocked(self, mode):
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, mode)
+            yield
+        finally:
+            os.close(fd)  # releases the flock
+
+    def _read_new(self):
+        new, self._offset = read_feedback_log(self.path, self._offset)
+        self.entries.extend(new)
+
+    def refresh(self):
+        """Every entry, including those other processes appended since the last read."""
+        with self._lock, self._flocked(fcntl.LOCK_SH):
+            self._read_new()
+        return self.entries
+
+    def append(self, new_entries):
+        """Append one batch as a single pickle (fsynced before returning)."""
+        blob = pickle.dumps(list(new_entries))
+        with self._lock, self._flocked(fcntl.LOCK_EX):
+            self._read_new()  # catch up first so entries keep file order
+            with open(self.path, "ab") as f:
+                if f.tell() > self._offset:  # no writer holds the lock, so these bytes are a crashed append
+                    logger.warning("Truncating a partial record batch at the end of %s", self.path)
+                    f.truncate(self._offset)
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+                self._offset = f.tell()
+            self.entries.extend(new_entries)
+
+
+class FeedbackBuffer:
+    """In-memory queue flushed to a FeedbackStore in batches by a background thread."""
+
+    def __init__(self, store, flush_size=FEEDBACK_FLUSH_SIZE, flush_interval_s=FEEDBACK_FLUSH_INTERVAL_S,
+                 max_size=FEEDBACK_BUFFER_MAX):
+        self.store = store
+        self.flush_size = flush_size
+        self.flush_interval_s = flush_interval_s
+        self._queue = queue.Queue(maxsize=max_size)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.flushed = 0
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="feedback-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def put(self, record):
+        """Queue one record (no I/O). Raises BufferFull when at capacity."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            raise BufferFull(f"Feedback buffer full ({self._queue.maxsize} records)")
+        size = self._queue.qsize()
+        FEEDBACK_BUFFERED.set(size)
+        if size == 1 or size >= self.flush_size:
+            self._wake.set()  # start the interval clock / flush a full batch now
+
+    def _run(self):
+        pending_since = None
+        while not self._stop.is_set():
+            size = self._queue.qsize()
+            if size == 0:
+                pending_since = None
+                self._wake.wait(self.flush_interval_s)
+                self._wake.clear()
+                continue
+            if pending_since is None:
+                pending_since = time.monotonic()
+            remaining = self.flush_interval_s - (time.monotonic() - pending_since)
+            if size < self.flush_size and remaining > 0:
+                self._wake.wait(remaining)
+                self._wake.clear()
+                continue
+            try:
+                self.flush("size" if size >= self.flush_size else "time")
+                pending_since = None
+            except Exception:
+                logger.error("Feedback flush failed; records stay queued for the next attempt", exc_info=True)
+                self._stop.wait(self.flush_interval_s)
+
+    def flush(self, trigger="manual"):
+        """Write everything currently queued in one batch. Returns the number written."""
+        with self._flush_lock:
+            batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                self.store.add_feedback_batch(batch)
+            except Exception:
+                for record in batch:  # put back so nothing is lost on a transient failure
+                    try:
+                        self._queue.put_nowait(record)
+                    except queue.Full:
+                        logger.error("Dropping feedback for match %s (buffer full)", record.get("match_id"))
+                raise
+            finally:
+                FEEDBACK_BUFFERED.set(self._queue.qsize())
+            elapsed = time.perf_counter() - start
+            FEEDBACK_FLUSH.labels(trigger).observe(elapsed)
+            self.flushed += len(batch)
+            logger.info("Flushed %d feedback records (%s, %.0fms, store=%d)",
+                        len(batch), trigger, elapsed * 1000, len(self.store.data))
+            return len(batch)
+
+    def close(self):
+        """Stop the flusher and write whatever is left."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.flush("shutdown")
+        except Exception:
+            logger.error("Final feedback flush failed", exc_info=True)
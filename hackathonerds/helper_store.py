@@ -0,0 +1,888 @@
+"""
+Durable helper store (SQLite + memmapped embeddings) with versioned binary snapshots.
+
+Layout (HELPER_STORE_PATH):
+
+    helper_store/
+        helpers.db           # SQLite: user_id → profile JSON (everything but the embedding),
+                             #         embedding row, write sequence number
+        embeddings.f32       # raw float32 [rows, dim] matrix, memory-mapped
+                             # (embeddings.<generation>.f32 once compacted)
+        snapshots/
+            v20250301T101500-1a2b3c4d/
+                manifest.json    # {format, version, count, dim, seq, schema, files: {name: {sha256, size_bytes}}}
+                user_id.npy  embedding.npy  themes_experience.npy  ...  extras.npy  extras_offsets.npy
+            CURRENT          # name of the snapshot api.py loads (swapped with os.replace)
+
+Writes (upsert / upsert_many) never overwrite an embedding row in place: each
+upsert gets fresh rows and the SQLite commit is what switches a helper to
+them, so a crash mid-write leaves the previous version intact. Every write
+batch bumps a store-wide sequence number.
+
+The price is that the embedding file only grows: each update of an existing
+helper leaves its old row dead. compact() rewrites the live rows into a new
+embeddings.<generation>.f32 and renumbers the `row` column in the same
+transaction that points meta at the new file, so readers see either the old
+file + old rows or the new file + new rows. The previous generation is kept
+until the next compaction for readers still mapped to it. write_snapshot
+compacts first once dead rows pass HELPER_COMPACT_DEAD_FRACTION of the file;
+`info` reports live / dead rows.
+
+Snapshots are columnar .npy files (one per profile field, fixed-shape numeric
+columns plus offset-indexed byte blobs for strings and the free-form "extras"
+like theme_scores). Loading one is np.load(mmap_mode="r") per file — nothing is
+parsed, and several uvicorn workers share the same page cache. Every file is
+checked against the manifest's size + sha256 (HELPER_SNAPSHOT_VERIFY=size skips
+hashing), and the manifest's schema (theme / style key lists) must match this
+code; a snapshot that fails either check is ignored and rebuilt from SQLite.
+
+At startup api.py loads CURRENT and replays helpers written after it (seq >
+snapshot seq) on top, so a stale snapshot is still correct — just slower to
+load. After that a HelperWatcher polls the store every HELPER_POLL_INTERVAL_S
+and applies helpers any process wrote since (changes(since_seq)), so every
+uvicorn worker serves the same pool within one interval. Pools of
+HELPER_POOL_LAZY_MIN helpers or more stay as read-through HelperView mappings
+over the memmapped columns instead of being materialized into dicts (1M dicts
+don't fit in a small box).
+
+CLI:
+    python helper_store.py seed --n 1000000          # synthetic helpers (synthetic.py)
+    python helper_store.py snapshot                  # write + activate a new snapshot
+    python helper_store.py verify [<version>]
+    python helper_store.py info
+    python helper_store.py compact                   # reclaim rows left dead by updates
+    python helper_store.py bench                     # time a cold load_pool()
+"""
+
+import os
+if __name__ == "__main__":
+    os.environ.setdefault("SKIP_SENTENCE_TRANSFORMERS", "1")  # seeding never needs the model
+
+import json
+import hashlib
+import logging
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+from itertools import repeat
+from types import MappingProxyType
+
+import numpy as np
+
+from local_test_matcher import COPING_STYLES, CONVERSATION_PREFERENCES, ENERGY_LEVELS, THEMES, generate_helper_narrative
+from synthetic import DAYS, STRENGTHS
+
+logger = logging.getLogger("bridge.helpers")
+
+HELPER_STORE_PATH = os.getenv("HELPER_STORE_PATH")
+HELPER_SNAPSHOT_VERIFY = os.getenv("HELPER_SNAPSHOT_VERIFY", "full")  # full | size
+HELPER_SNAPSHOT_KEEP = int(os.getenv("HELPER_SNAPSHOT_KEEP", "3"))
+HELPER_POOL_LAZY_MIN = int(os.getenv("HELPER_POOL_LAZY_MIN", "100000"))
+HELPER_COMPACT_DEAD_FRACTION = float(os.getenv("HELPER_COMPACT_DEAD_FRACTION", "0.25"))
+HELPER_POLL_INTERVAL_S = float(os.getenv("HELPER_POLL_INTERVAL_S", "2"))
+
+SNAPSHOT_FORMAT = 1
+DB_FILE = "helpers.db"
+EMBEDDINGS_FILE = "embeddings.f32"
+SNAPSHOTS_DIR = "snapshots"
+MANIFEST_FILE = "manifest.json"
+BATCH_ROWS = 20_000
+MIN_CAPACITY = 1024
+
+# Dict-valued profile fields, stored as float64 [n, len(keys)] columns
+KEYED_FIELDS = {
+    "themes_experience": THEMES,
+    "coping_style_expertise": COPING_STYLES,
+    "conversation_style": CONVERSATION_PREFERENCES,
+    "support_strengths": STRENGTHS,
+}
+SCALAR_FIELDS = ["energy_consistency", "reliability_score", "response_rate", "completion_rate"]
+CORE_FIELDS = [
+    "user_id", "role", "themes_experience", "emotion_embedding", "experience_narrative",
+    "coping_style_expertise", "conversation_style", "availability_windows", "energy_level",
+    *SCALAR_FIELDS, "support_strengths",
+]
+CORE_SET = frozenset(CORE_FIELDS)
+# New helpers start at the same priors /match assumes for missing fields
+PRIORS = {"energy_consistency": 0.8, "reliability_score": 0.8, "response_rate": 0.8, "completion_rate": 0.8}
+ALWAYS_AVAILABLE = {day: [1] * 24 for day in DAYS}
+_EMPTY = MappingProxyType({})
+
+
+class HelperSnapshotError(RuntimeError):
+    """A snapshot is missing files, fails its checksum, or was written for a different schema."""
+
+
+def _schema():
+    return {field: list(keys) for field, keys in KEYED_FIELDS.items()} | {"days": DAYS, "energy_levels": ENERGY_LEVELS}
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # not supported on this platform
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def split_helper(helper):
+    """(profile JSON dict with every core field normalized, float32 embedding) for storage."""
+    profile = {key: value for key, value in helper.items() if key != "emotion_embedding"}
+    profile["user_id"] = str(helper["user_id"])
+    profile["role"] = "helper"
+    for field, keys in KEYED_FIELDS.items():
+        values = profile.get(field) or {}
+        profile[field] = {key: float(values.get(key, 0.0)) for key in keys}
+    for field in SCALAR_FIELDS:
+        profile[field] = float(profile.get(field, PRIORS[field]))
+    if profile.get("energy_level") not in ENERGY_LEVELS:
+        profile["energy_level"] = "moderate"
+    windows = profile.get("availability_windows") or ALWAYS_AVAILABLE
+    profile["availability_windows"] = {day: [1 if v else 0 for v in windows.get(day, [0] * 24)] for day in DAYS}
+    profile["experience_narrative"] = profile.get("experience_narrative") or ""
+    return profile, np.asarray(helper["emotion_embedding"], dtype=np.float32).ravel()
+
+
+def helper_from_profile(profile, user_id, embed, availability_windows=None, energy_level=None):
+    """
+    Pool-format helper from an /extract-profile extract_helper result
+    ({themes, coping_style, communication_style, bio, theme_scores}).
+    """
+    intensities = {t.get("name"): float(t.get("intensity", 0.0)) for t in profile.get("themes", [])}
+    themes_experience = {theme: intensities.get(theme, 0.0) for theme in THEMES}
+    narrative = profile.get("bio") or generate_helper_narrative(themes_experience)
+    helper = {
+        "user_id": user_id,
+        "role": "helper",
+        "themes_experience": themes_experience,
+        "emotion_embedding": np.asarray(embed(narrative), dtype=np.float32),
+        "experience_narrative": narrative,
+        "coping_style_expertise": {s: 1.0 if s == profile.get("coping_style") else 0.5 for s in COPING_STYLES},
+        "conversation_style": {
+            p: 1.0 if p == profile.get("communication_style") else 0.3 for p in CONVERSATION_PREFERENCES
+        },
+        "availability_windows": availability_windows or ALWAYS_AVAILABLE,
+        "energy_level": energy_level or "moderate",
+        "support_strengths": {s: 0.7 for s in STRENGTHS},
+        **PRIORS,
+    }
+    for key in ("theme_scores", "coping_style", "communication_style", "display_name", "age_decade"):
+        if key in profile:
+            helper[key] = profile[key]
+    return helper
+
+
+# ── Snapshot (read side) ─────────────────────────────────────────────────────
+
+class HelperView(Mapping):
+    """
+    Read-through helper profile over one snapshot row. Fields are decoded from
+    the memmapped columns on access; writes (e.g. quantize_pool swapping the
+    embedding) and parsed extras live in a small per-row overlay.
+    """
+
+    __slots__ = ("_snapshot", "_row", "_overlay")
+
+    def __init__(self, snapshot, row):
+        self._snapshot = snapshot
+        self._row = row
+        self._overlay = None
+
+    def _extras(self):
+        if self._overlay is None:
+            self._overlay = self._snapshot.extras(self._row) or _EMPTY
+        return self._overlay
+
+    def __getitem__(self, key):
+        overlay = self._overlay
+        if overlay is not None and key in overlay:
+            return overlay[key]
+        getter = self._snapshot.getters.get(key)
+        if getter is not None:
+            return getter(self._row)
+        return self._extras()[key]
+
+    def __setitem__(self, key, value):
+        extras = self._extras()
+        if extras is _EMPTY:
+            extras = self._overlay = {}
+        extras[key] = value
+
+    def __iter__(self):
+        yield from CORE_FIELDS
+        yield from (key for key in self._extras() if key not in CORE_SET)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)  # pickles (match_log pool snapshots) as plain dicts
+
+    def __repr__(self):
+        return f"HelperView({self['user_id']!r})"
+
+
+class HelperSnapshot:
+    """Memory-mapped columns of one snapshot version."""
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.count = manifest["count"]
+        self.seq = manifest["seq"]
+        c = self.columns = {
+            name[:-4]: np.load(os.path.join(directory, name), mmap_mode="r")
+            for name in manifest["files"] if name.endswith(".npy")
+        }
+        for name, column in c.items():
+            if name in ("extras", "narratives", "narratives_offsets"):
+                continue  # byte blobs / per-unique-string offsets
+            expected = self.count + 1 if name == "extras_offsets" else self.count
+            if len(column) != expected:
+                raise HelperSnapshotError(f"{self.version}: column {name} has {len(column)} rows, expected {expected}")
+        self.user_ids = c["user_id"]
+        self.embeddings = c["embedding"]
+        scalars = c["scalars"]
+        energy = c["energy_level"]
+        availability = c["availability"]
+        codes = c["narrative_code"]
+        self.getters = {
+            "user_id": lambda r: str(self.user_ids[r]),
+            "role": lambda r: "helper",
+            "emotion_embedding": lambda r: self.embeddings[r],
+            "experience_narrative": lambda r: self._string("narratives", int(codes[r])),
+            "availability_windows": lambda r: dict(zip(DAYS, np.unpackbits(availability[r]).reshape(7, 24).tolist())),
+            "energy_level": lambda r: ENERGY_LEVELS[energy[r]],
+            **{field: (lambda r, j=j: float(scalars[r, j])) for j, field in enumerate(SCALAR_FIELDS)},
+            **{field: (lambda r, col=c[field], keys=keys: dict(zip(keys, col[r].tolist())))
+               for field, keys in KEYED_FIELDS.items()},
+        }
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, blob, i):
+        offsets = self.columns[f"{blob}_offsets"]
+        return bytes(self.columns[blob][offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def extras(self, row):
+        offsets = self.columns["extras_offsets"]
+        if offsets[row] == offsets[row + 1]:
+            return None
+        return json.loads(self._string("extras", row))
+
+    def views(self):
+        return list(map(HelperView, repeat(self, self.count), range(self.count)))
+
+    def to_dicts(self):
+        return [dict(HelperView(self, row)) for row in range(self.count)]
+
+
+def snapshot_rows(helpers):
+    """
+    (snapshot directory, row numbers, other helpers) for a pool: HelperViews over one
+    snapshot can be re-opened in another process from their rows instead of pickled.
+    """
+    directory, rows, others = None, [], []
+    for helper in helpers:
+        if isinstance(helper, HelperView) and directory in (None, helper._snapshot.directory):
+            directory = helper._snapshot.directory
+            rows.append(helper._row)
+        else:
+            others.append(helper)
+    return directory, np.asarray(rows, dtype=np.int64), others
+
+
+def snapshot_groups(helpers, fields=CORE_FIELDS):
+    """
+    {snapshot: (positions, rows)} for the HelperViews in a pool whose `fields` are still
+    read straight from the snapshot columns, so they can be gathered a column at a time.
+    """
+    groups = {}
+    for position, helper in enumerate(helpers):
+        if isinstance(helper, HelperView) and (not helper._overlay or helper._overlay.keys().isdisjoint(fields)):
+            positions, rows = groups.setdefault(helper._snapshot, ([], []))
+            positions.append(position)
+            rows.append(helper._row)
+    return {snapshot: (np.asarray(positions, dtype=np.int64), np.asarray(rows, dtype=np.int64))
+            for snapshot, (positions, rows) in groups.items()}
+
+
+def open_snapshot(directory):
+    """HelperSnapshot for a directory already verified by another process (sizes only)."""
+    return HelperSnapshot(directory, verify_snapshot(directory, full=False))
+
+
+def verify_snapshot(directory, full=True):
+    """Manifest of a snapshot directory after checking format, schema, sizes and (if full) sha256."""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise HelperSnapshotError(f"Unreadable manifest in {directory}: {e}") from e
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise HelperSnapshotError(f"{directory}: format {manifest.get('format')}, expected {SNAPSHOT_FORMAT}")
+    if manifest.get("schema") != _schema():
+        raise HelperSnapshotError(f"{directory}: written for a different theme/style schema")
+    for name, meta in manifest["files"].items():
+        path = os.path.join(directory, name)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            raise HelperSnapshotError(f"{directory}: missing {name}") from None
+        if size != meta["size_bytes"]:
+            raise HelperSnapshotError(f"{directory}: {name} is {size} bytes, expected {meta['size_bytes']}")
+        if full:
+            digest = _sha256(path)
+            if digest != meta["sha256"]:
+                raise HelperSnapshotError(
+                    f"{directory}: checksum mismatch for {name}: expected {meta['sha256'][:12]}, got {digest[:12]}"
+                )
+    return manifest
+
+
+# ── Store ────────────────────────────────────────────────────────────────────
+
+class HelperStore:
+    """SQLite helper profiles + a memmapped embedding matrix, with snapshot publishing."""
+
+    def __init__(self, root=HELPER_STORE_PATH):
+        self.root = root
+        self.snapshots_dir = os.path.join(root, SNAPSHOTS_DIR)
+        self.current_path = os.path.join(self.snapshots_dir, "CURRENT")
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._mm = None
+        self._mm_file = None
+        self._db = sqlite3.connect(os.path.join(root, DB_FILE), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS helpers (
+                user_id TEXT PRIMARY KEY,
+                row INTEGER NOT NULL UNIQUE,      -- row in the embeddings file (meta embeddings_file)
+                seq INTEGER NOT NULL,             -- write batch (snapshot delta cursor)
+                updated_at REAL NOT NULL,
+                profile TEXT NOT NULL             -- JSON, everything except the embedding
+            );
+            CREATE INDEX IF NOT EXISTS helpers_seq ON helpers(seq);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM helpers").fetchone()[0]
+
+    def _meta(self, key, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    @property
+    def dim(self):
+        return self._meta("dim")
+
+    @property
+    def seq(self):
+        return self._meta("seq", 0)
+
+    # ── Embedding matrix ──
+
+    @property
+    def embeddings_path(self):
+        return os.path.join(self.root, self._meta("embeddings_file", EMBEDDINGS_FILE))
+
+    def _embeddings(self, rows_needed):
+        """
+        Memmap covering at least rows_needed rows (grows the file; remaps if another
+        process grew or compacted it). Call inside the transaction that read the rows.
+        """
+        dim = self.dim
+        row_bytes = dim * 4
+        path = self.embeddings_path
+        if self._mm is None or self._mm_file != path or len(self._mm) < rows_needed:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < rows_needed * row_bytes:
+                capacity = max(MIN_CAPACITY, rows_needed, 2 * (size // row_bytes))
+                with open(path, "ab") as f:
+                    f.truncate(capacity * row_bytes)
+                size = capacity * row_bytes
+            self._mm = np.memmap(path, dtype=np.float32, mode="r+", shape=(size // row_bytes, dim))
+            self._mm_file = path
+        return self._mm
+
+    def embedding(self, row):
+        return np.array(self._embeddings(row + 1)[row])
+
+    def embedding_rows(self):
+        """(live rows, allocated rows): everything in between is dead rows left by updates."""
+        live, allocated = self._db.execute("SELECT COUNT(*), COALESCE(MAX(row) + 1, 0) FROM helpers").fetchone()
+        return live, allocated
+
+    def compact(self):
+        """Rewrite the live embedding rows contiguously into a new file; returns the rows reclaimed."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")  # no writer can allocate rows while they are renumbered
+            try:
+                live, allocated = self.embedding_rows()
+                if live == allocated:
+                    self._db.execute("COMMIT")
+                    return 0
+                current, previous = self._meta("embeddings_file", EMBEDDINGS_FILE), self._meta("embeddings_previous")
+                for name in os.listdir(self.root):  # leftovers of an interrupted compaction
+                    if name.startswith("embeddings.") and name.endswith(".f32") and name not in (current, previous):
+                        os.remove(os.path.join(self.root, name))
+                generation = self._meta("embeddings_generation", 0) + 1
+                name = f"embeddings.{generation}.f32"
+                source = self._embeddings(allocated)
+                target = np.memmap(os.path.join(self.root, name), dtype=np.float32, mode="w+",
+                                   shape=(max(MIN_CAPACITY, live), self.dim))
+                rows = np.fromiter((row for row, in self._db.execute("SELECT row FROM helpers ORDER BY row")),
+                                   dtype=np.int64, count=live)
+                for start in range(0, live, BATCH_ROWS):
+                    stop = min(start + BATCH_ROWS, live)  # the file has MIN_CAPACITY rows; only `live` are copied
+                    target[start:stop] = source[rows[start:stop]]
+                target.flush()
+                del target
+                _fsync_dir(self.root)
+                # New row = rank in the old row order (the order just copied). Negative first: row is UNIQUE.
+                self._db.execute(
+                    "UPDATE helpers SET row = -1 - ranked.rank FROM "
+                    "(SELECT user_id, ROW_NUMBER() OVER (ORDER BY row) - 1 AS rank FROM helpers) AS ranked "
+                    "WHERE helpers.user_id = ranked.user_id"
+                )
+                self._db.execute("UPDATE helpers SET row = -1 - row")
+                self._set_meta("embeddings_generation", generation)
+                self._set_meta("embeddings_file", name)
+                self._set_meta("embeddings_previous", current)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if previous and previous not in (current, name):
+                try:
+                    os.remove(os.path.join(self.root, previous))  # two generations old: no reader maps it
+                except FileNotFoundError:
+                    pass
+        logger.info("Compacted helper embeddings: %d live rows, %d dead rows reclaimed (%s)",
+                    live, allocated - live, name)
+        return allocated - live
+
+    # ── Writes ──
+
+    def upsert(self, helper):
+        return self.upsert_many([helper])
+
+    def upsert_many(self, helpers):
+        """Insert or replace helpers (pool-format dicts) as one write batch. Returns the batch seq."""
+        split = [split_helper(helper) for helper in helpers]
+        if not split:
+            return self.seq
+        dims = {len(embedding) for _, embedding in split}
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")  # serializes row allocation across processes
+            try:
+                dim = self.dim
+                if dim is None:
+                    dim = dims.pop() if len(dims) == 1 else None
+                    self._set_meta("dim", dim)
+                if dims - {dim} or dim is None:
+                    raise ValueError(f"Embedding size {sorted(dims)} doesn't match the store's {dim}")
+                seq = self.seq + 1
+                first_row = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM helpers").fetchone()[0]
+                mm = self._embeddings(first_row + len(split))
+                mm[first_row:first_row + len(split)] = np.stack([embedding for _, embedding in split])
+                mm.flush()  # embeddings reach disk before the commit that points at them
+                now = time.time()
+                self._db.executemany(
+                    "INSERT INTO helpers (user_id, row, seq, updated_at, profile) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET row = excluded.row, seq = excluded.seq, "
+                    "updated_at = excluded.updated_at, profile = excluded.profile",
+                    ((profile["user_id"], first_row + i, seq, now, json.dumps(profile, default=_json_default))
+                     for i, (profile, _) in enumerate(split)),
+                )
+                self._set_meta("seq", seq)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return seq
+
+    # ── Reads ──
+
+    def rows(self, since_seq=0, batch=BATCH_ROWS):
+        """Yield (profile dict, embedding row) for helpers written after since_seq, in row order."""
+        cursor = self._db.execute("SELECT row, profile FROM helpers WHERE seq > ? ORDER BY row", (since_seq,))
+        while True:
+            fetched = cursor.fetchmany(batch)
+            if not fetched:
+                return
+            for row, profile in fetched:
+                yield json.loads(profile), row
+
+    def get(self, user_id):
+        with self._lock:
+            self._db.execute("BEGIN")  # the row and the embeddings file it points into (compaction moves both)
+            try:
+                found = self._db.execute("SELECT row, profile FROM helpers WHERE user_id = ?", (user_id,)).fetchone()
+                if found is None:
+                    return None
+                return {**json.loads(found[1]), "emotion_embedding": self.embedding(found[0])}
+            finally:
+                self._db.execute("COMMIT")
+
+    def changes(self, since_seq):
+        """(helpers written after since_seq as pool-format dicts, the seq they bring a reader up to)."""
+        with self._lock:
+            self._db.execute("BEGIN")  # the rows, their embeddings file and seq from one state
+            try:
+                seq = self.seq
+                helpers = [{**profile, "emotion_embedding": self.embedding(row)}
+                           for profile, row in self.rows(since_seq=since_seq)]
+            finally:
+                self._db.execute("COMMIT")
+        return helpers, seq
+
+    # ── Snapshots ──
+
+    def write_snapshot(self, activate=True, keep=HELPER_SNAPSHOT_KEEP):
+        """Write every helper as a new columnar snapshot; returns its version."""
+        live, allocated = self.embedding_rows()
+        if allocated - live > HELPER_COMPACT_DEAD_FRACTION * allocated:
+            self.compact()
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.snapshots_dir)
+        try:
+            with self._lock:
+                # One read transaction: count, seq and rows all come from the same state
+                self._db.execute("BEGIN")
+                try:
+                    count, seq, dim = len(self), self.seq, self.dim
+                    if not count:
+                        raise ValueError("Helper store is empty; nothing to snapshot")
+                    id_len = self._db.execute("SELECT MAX(LENGTH(user_id)) FROM helpers").fetchone()[0]
+                    self._write_columns(tmp_dir, count, dim, id_len)
+                finally:
+                    self._db.execute("COMMIT")
+            files = {}
+            for name in sorted(os.listdir(tmp_dir)):
+                path = os.path.join(tmp_dir, name)
+                with open(path, "rb") as f:
+                    os.fsync(f.fileno())
+                files[name] = {"sha256": _sha256(path), "size_bytes": os.path.getsize(path)}
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        digest = hashlib.sha256("".join(m["sha256"] for m in files.values()).encode("ascii")).hexdigest()
+        version = f"v{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{digest[:8]}"
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "count": count,
+            "dim": dim,
+            "seq": seq,
+            "created_at": time.time(),
+            "schema": _schema(),
+            "files": files,
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        final_dir = os.path.join(self.snapshots_dir, version)
+        if os.path.exists(final_dir):  # same content published this second (another worker, or a rebuild)
+            try:
+                verify_snapshot(final_dir)
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            except HelperSnapshotError:
+                shutil.rmtree(final_dir, ignore_errors=True)  # the existing copy is damaged: replace it
+                os.rename(tmp_dir, final_dir)
+        else:
+            os.rename(tmp_dir, final_dir)
+        _fsync_dir(self.snapshots_dir)
+        logger.info("Wrote helper snapshot %s (%d helpers, seq=%d)", version, count, seq)
+        if activate:
+            self.activate(version)
+            self._prune(keep)
+        return version
+
+    def _write_columns(self, directory, count, dim, id_len):
+        def column(name, dtype, shape=()):
+            return np.lib.format.open_memmap(os.path.join(directory, f"{name}.npy"), mode="w+",
+                                             dtype=dtype, shape=(count, *shape))
+
+        user_ids = column("user_id", f"<U{id_len}")
+        embeddings = column("embedding", np.float32, (dim,))
+        keyed = {field: column(field, np.float64, (len(keys),)) for field, keys in KEYED_FIELDS.items()}
+        scalars = column("scalars", np.float64, (len(SCALAR_FIELDS),))
+        energy = column("energy_level", np.int8)
+        availability = column("availability", np.uint8, (21,))  # 7 × 24 bits
+        narrative_codes = column("narrative_code", np.int32)
+        narratives, extras = {}, []
+
+        energy_index = {level: i for i, level in enumerate(ENERGY_LEVELS)}
+        source = self._embeddings(1) if count else None
+        i = 0
+        batch_rows, batch_profiles = [], []
+
+        def flush_batch():
+            start = i - len(batch_rows)
+            embeddings[start:i] = source[np.asarray(batch_rows)]
+            batch_rows.clear()
+            batch_profiles.clear()
+
+        for profile, row in self.rows(since_seq=-1):
+            user_ids[i] = profile["user_id"]
+            for field, keys in KEYED_FIELDS.items():
+                values = profile[field]
+                keyed[field][i] = [values[key] for key in keys]
+            scalars[i] = [profile[field] for field in SCALAR_FIELDS]
+            energy[i] = energy_index[profile["energy_level"]]
+            windows = profile["availability_windows"]
+            availability[i] = np.packbits([v for day in DAYS for v in windows[day]])
+            narrative_codes[i] = narratives.setdefault(profile["experience_narrative"], len(narratives))
+            rest = {key: value for key, value in profile.items() if key not in CORE_SET}
+            extras.append(json.dumps(rest).encode("utf-8") if rest else b"")
+            batch_rows.append(row)
+            i += 1
+            if len(batch_rows) >= BATCH_ROWS:
+                source = self._embeddings(max(batch_rows) + 1)
+                flush_batch()
+        if batch_rows:
+            source = self._embeddings(max(batch_rows) + 1)
+            flush_batch()
+        if i != count:
+            raise RuntimeError(f"Store changed while snapshotting ({i} rows read, {count} expected)")
+
+        for name, strings in (("narratives", [s.encode("utf-8") for s in narratives]), ("extras", extras)):
+            offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+            np.cumsum([len(s) for s in strings], out=offsets[1:])
+            np.save(os.path.join(directory, f"{name}.npy"), np.frombuffer(b"".join(strings), dtype=np.uint8))
+            np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+        for col in (user_ids, embeddings, scalars, energy, availability, narrative_codes, *keyed.values()):
+            col.flush()
+
+    def activate(self, version):
+        tmp_path = f"{self.current_path}.tmp{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.current_path)
+
+    def current_version(self):
+        try:
+            with open(self.current_path) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def list_snapshots(self):
+        return sorted(name for name in os.listdir(self.snapshots_dir) if name.startswith("v"))
+
+    def _prune(self, keep):
+        current = self.current_version()
+        for version in self.list_snapshots()[:-keep]:
+            if version != current:
+                shutil.rmtree(os.path.join(self.snapshots_dir, version), ignore_errors=True)
+
+    def load_snapshot(self, version=None, verify=HELPER_SNAPSHOT_VERIFY):
+        """HelperSnapshot for version (default CURRENT), or None if nothing was published yet."""
+        version = version or self.current_version()
+        if version is None:
+            return None
+        directory = os.path.join(self.snapshots_dir, version)
+        manifest = verify_snapshot(directory, full=verify != "size")
+        if manifest["count"] and manifest["dim"] != self.dim:
+            raise HelperSnapshotError(f"{version}: embedding size {manifest['dim']}, store has {self.dim}")
+        return HelperSnapshot(directory, manifest)
+
+    def load_pool(self, lazy_min=HELPER_POOL_LAZY_MIN):
+        """
+        The helper pool for api.py: CURRENT snapshot plus helpers written since,
+        as HelperViews (large pools) or plain dicts. Rebuilds the snapshot from
+        SQLite if it is missing or fails verification.
+        """
+        start = time.perf_counter()
+        try:
+            snapshot = self.load_snapshot()
+        except HelperSnapshotError:
+            logger.error("Helper snapshot unusable; rebuilding from SQLite", exc_info=True)
+            snapshot = None
+        if snapshot is None:
+            if not len(self):
+                return []
+            snapshot = self.load_snapshot(self.write_snapshot())
+        loaded_at = time.perf_counter()
+
+        pool = snapshot.views() if snapshot.count >= lazy_min else snapshot.to_dicts()
+        delta, _ = self.changes(snapshot.seq)
+        if delta:
+            positions = dict(zip(snapshot.user_ids.tolist(), range(snapshot.count)))
+            for helper in delta:
+                position = positions.get(helper["user_id"])
+                if position is None:
+                    positions[helper["user_id"]] = len(pool)
+                    pool.append(helper)
+                else:
+                    pool[position] = helper
+        logger.info("Helper pool loaded from %s: %d helpers (%s, +%d newer) in %.2fs (snapshot %.2fs)",
+                    snapshot.version, len(pool), "lazy views" if snapshot.count >= lazy_min else "dicts",
+                    len(delta), time.perf_counter() - start, loaded_at - start)
+        return pool
+
+
+class HelperWatcher:
+    """Background thread that applies helpers written to the store by any process to this one's pool."""
+
+    def __init__(self, store, apply, seq, interval_s=HELPER_POLL_INTERVAL_S):
+        self.store = store
+        self.apply = apply  # apply(helpers, seq): upsert pool-format helpers into the live pool
+        self.seq = seq  # store seq the pool already reflects
+        self.interval_s = interval_s
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="helper-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self):
+        """Apply everything written since the last poll; returns the number of helpers applied."""
+        with self._lock:
+            if self.store.seq == self.seq:
+                return 0
+            helpers, seq = self.store.changes(self.seq)
+            if helpers:
+                self.apply(helpers, seq)
+            self.seq = seq
+            return len(helpers)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                applied = self.poll()
+                if applied:
+                    logger.info("Applied %d helpers from the store (seq=%d)", applied, self.seq)
+            except Exception:
+                logger.error("Helper store poll failed", exc_info=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import resource
+
+    parser = argparse.ArgumentParser(description="Manage the persistent helper store.")
+    parser.add_argument("--path", default=HELPER_STORE_PATH or "helper_store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    seed = sub.add_parser("seed", help="add synthetic helpers (synthetic.py)")
+    seed.add_argument("--n", type=int, default=100_000)
+    seed.add_argument("--seed", type=int, default=0)
+    seed.add_argument("--dim", type=int, default=None, help="embedding size (default: the live embedder's)")
+    seed.add_argument("--batch", type=int, default=50_000)
+    sub.add_parser("snapshot", help="write and activate a new snapshot")
+    verify = sub.add_parser("verify", help="check a snapshot's checksums")
+    verify.add_argument("version", nargs="?")
+    sub.add_parser("info", help="store and snapshot summary")
+    sub.add_parser("compact", help="rewrite the embedding file without rows left dead by updates")
+    bench = sub.add_parser("bench", help="time a cold load_pool()")
+    bench.add_argument("--lazy-min", type=int, default=HELPER_POOL_LAZY_MIN)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    store = HelperStore(args.path)
+
+    if args.command == "seed":
+        from synthetic import PopulationGenerator
+        from local_test_matcher import generate_emotion_embedding
+
+        dim = args.dim or store.dim or len(generate_emotion_embedding("", use_openai=False))
+        gen = PopulationGenerator(args.seed, dim=dim, id_start=len(store))  # ids continue past the store's
+        start = time.perf_counter()
+        for done in range(0, args.n, args.batch):
+            helpers = gen.helpers(min(args.batch, args.n - done)).to_dicts()
+            store.upsert_many(helpers)
+            print(f"  {done + len(helpers):>9} / {args.n} helpers  ({time.perf_counter() - start:.1f}s)")
+        print(f"✓ Seeded {args.n} helpers (dim={dim}) into {args.path}; run `snapshot` to publish")
+
+    elif args.command == "snapshot":
+        start = time.perf_counter()
+        version = store.write_snapshot()
+        print(f"✓ {version} ({len(store)} helpers) in {time.perf_counter() - start:.1f}s")
+
+    elif args.command == "verify":
+        version = args.version or store.current_version()
+        if version is None:
+            print("❌ No snapshot published")
+        else:
+            start = time.perf_counter()
+            try:
+                manifest = verify_snapshot(os.path.join(store.snapshots_dir, version))
+                print(f"✓ {version}: {manifest['count']} helpers, {len(manifest['files'])} files verified "
+                      f"in {time.perf_counter() - start:.1f}s")
+            except HelperSnapshotError as e:
+                print(f"❌ {e}")
+
+    elif args.command == "info":
+        current = store.current_version()
+        print(f"\nstore {args.path}: {len(store)} helpers, dim={store.dim}, seq={store.seq}")
+        live, allocated = store.embedding_rows()
+        dead = allocated - live
+        mb = os.path.getsize(store.embeddings_path) / 1e6 if os.path.exists(store.embeddings_path) else 0.0
+        marker = "✓" if dead <= HELPER_COMPACT_DEAD_FRACTION * allocated else "⚠️ run `compact`"
+        print(f"embeddings {os.path.basename(store.embeddings_path)}: {live} live rows, {dead} dead rows, "
+              f"{mb:.1f} MB  {marker}")
+        print(f"\n{'snapshot':<28} {'helpers':>9} {'seq':>6} {'MB':>9}")
+        for version in store.list_snapshots():
+            directory = os.path.join(store.snapshots_dir, version)
+            with open(os.path.join(directory, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+            mb = sum(m["size_bytes"] for m in manifest["files"].values()) / 1e6
+            behind = store.seq - manifest["seq"]
+            marker = ("✓" if not behind else f"⚠️ {behind} write batches behind") if version == current else ""
+            print(f"{version:<28} {manifest['count']:>9} {manifest['seq']:>6} {mb:>9.1f}  {marker}")
+
+    elif args.command == "compact":
+        start = time.perf_counter()
+        reclaimed = store.compact()
+        print(f"✓ Reclaimed {reclaimed} dead rows ({len(store)} live) in {time.perf_counter() - start:.1f}s")
+
+    elif args.command == "bench":
+        start = time.perf_counter()
+        pool = store.load_pool(lazy_min=args.lazy_min)
+        elapsed = time.perf_counter() - start
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        first = pool[0] if pool else {}
+        print(f"{'✓' if elapsed < 10 else '⚠️'} load_pool: {len(pool)} helpers in {elapsed:.2f}s, "
+              f"peak RSS {rss_mb:.0f} MB (first: {first.get('user_id')}, "
+              f"top theme {max(first['themes_experience'], key=first['themes_experience'].get) if first else None})")
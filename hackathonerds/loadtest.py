@@ -0,0 +1,453 @@
+"""
+Load-test harness for api.py: scripted user sessions, per-route latency, saturation sweeps.
+
+Pair it with openai_stub.py so GPT calls take realistic time (and sometimes
+fail) instead of returning the instant mock fallbacks.
+
+Scenarios (each virtual user loops over one, picked by --mix weight):
+  - session: transcribe → safety-check → extract-profile → match → scaffold
+             (the voice onboarding flow; transcribe is skipped with --no-transcribe)
+  - chat:    3 seeker_chat turns → extract-profile → match → /scaffold/stream
+             (time to first event and total)
+  - match:   /match only, with a ready-made profile (scoring throughput)
+
+Usage:
+    # against a server you started yourself
+    python loadtest.py run --url http://127.0.0.1:8000 --users 16 --duration 30
+
+    # start the stub and api.py for every (workers, pool size), ramp users until saturation
+    python loadtest.py sweep --workers 1,2,4 --pool-sizes 30,2000,20000 --users 1,2,4,8,16,32,64
+
+A configuration is saturated at the first user count where throughput grows by
+less than --plateau over the previous step, or p95 session latency exceeds --slo-ms.
+"""
+
+import os
+import asyncio
+import io
+import json
+import logging
+import random
+import subprocess
+import sys
+import time
+import wave
+
+import httpx
+import numpy as np
+
+logger = logging.getLogger("bridge.loadtest")
+
+ROUTE_ORDER = [
+    "/transcribe", "/safety-check", "/extract-profile", "/match", "/scaffold",
+    "/scaffold/stream (first event)", "/scaffold/stream",
+]
+VENT_OPENERS = [
+    "I've been failing my mock exams and my parents keep comparing me to my cousin.",
+    "My best friend stopped talking to me and I don't know what I did wrong.",
+    "I'm so tired all the time, even after sleeping ten hours.",
+    "I moved here for uni and I still eat lunch alone every day.",
+    "I have no idea what I'm doing with my life after graduation.",
+    "Every time I speak up in class I feel like everyone thinks I'm stupid.",
+    "Things at home have been really tense since my dad lost his job.",
+]
+VENT_DETAILS = [
+    "I keep lying awake replaying everything.",
+    "I haven't told anyone because I don't want to be a burden.",
+    "Some days I can't even get out of bed.",
+    "I feel like I'm pretending to be okay all the time.",
+    "I just want someone who gets it to talk to.",
+]
+CHAT_MODES = ["vent", "reflect", "clarity", "growth"]
+THEMES = [
+    "Exam Stress / Academic Pressure", "Family Problems", "Friendship / Social Issues",
+    "Burnout / Emotional Exhaustion", "Loneliness / Isolation", "Life Direction / Purpose",
+    "Self-Confidence / Self-Esteem",
+]
+COPING_STYLES = ["problem_focused", "emotion_focused", "avoidant", "social_support", "meaning_making"]
+CONVERSATION_PREFERENCES = ["direct_advice", "reflective_listening", "collaborative_problem_solving",
+                            "validation_focused"]
+
+
+# ── Payloads ────────────────────────────────────────────────────────────────
+
+def make_vent(rng):
+    """A unique vent, so analysis contexts and caches don't turn every session into a hit."""
+    details = rng.sample(VENT_DETAILS, 2)
+    return f"{rng.choice(VENT_OPENERS)} {' '.join(details)} It's been {rng.randint(2, 40)} weeks like this."
+
+
+def make_profile(rng, vent):
+    """A seeker profile as /extract-profile would return it, plus the vent text."""
+    return {
+        "themes": [{"name": t, "intensity": round(rng.uniform(0.5, 1.0), 2)} for t in rng.sample(THEMES, 2)],
+        "coping_style_preference": {s: round(rng.random(), 2) for s in COPING_STYLES},
+        "conversation_preference": {p: round(rng.random(), 2) for p in CONVERSATION_PREFERENCES},
+        "energy_level": rng.choice(["depleted", "low", "moderate", "high"]),
+        "distress_level": rng.choice(["Low", "Medium", "High"]),
+        "urgency": round(rng.uniform(0.3, 1.0), 2),
+        "vent_text": vent,
+    }
+
+
+def make_wav(rng, seconds=3.0, rate=16000):
+    """Short 16 kHz mono clip with unique noise (so the transcript cache can't short-circuit it)."""
+    t = np.arange(int(seconds * rate)) / rate
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * np.random.default_rng(rng.getrandbits(32)).standard_normal(len(t))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((signal * 32767).astype(np.int16).tobytes())
+    return buf.getvalue()
+
+
+# ── Scenarios ───────────────────────────────────────────────────────────────
+
+class Recorder:
+    """
+    Collects (route, seconds, ok) samples and whole-scenario durations that
+    finish inside the measurement window [start, end) (perf_counter time).
+    """
+
+    def __init__(self, start, end):
+        self.start, self.end = start, end
+        self.elapsed_s = end - start
+        self.samples = {}  # route → [(seconds, ok), ...]
+        self.scenarios = {}  # scenario → [seconds, ...] (completed without errors)
+        self.failed_scenarios = 0
+
+    def _in_window(self):
+        return self.start <= time.perf_counter() < self.end
+
+    def add(self, route, seconds, ok):
+        if self._in_window():
+            self.samples.setdefault(route, []).append((seconds, ok))
+
+    def scenario(self, name, seconds, ok):
+        if not self._in_window():
+            return
+        if ok:
+            self.scenarios.setdefault(name, []).append(seconds)
+        else:
+            self.failed_scenarios += 1
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+async def _call(client, rec, route, **kw):
+    start = time.perf_counter()
+    try:
+        resp = await client.post(route, **kw)
+        ok = resp.status_code < 400
+    except httpx.HTTPError:
+        resp, ok = None, False
+    rec.add(route, time.perf_counter() - start, ok)
+    if not ok:
+        raise ScenarioFailed(route)
+    return resp.json()
+
+
+async def _call_stream(client, rec, route, **kw):
+    """POST an SSE endpoint; records time to first event and time to the done event."""
+    start = time.perf_counter()
+    first = None
+    try:
+        async with client.stream("POST", route, **kw) as resp:
+            ok = resp.status_code < 400
+            async for line in resp.aiter_lines():
+                if line.startswith("data:") and first is None:
+                    first = time.perf_counter() - start
+                    rec.add(f"{route} (first event)", first, True)
+    except httpx.HTTPError:
+        ok = False
+    rec.add(route, time.perf_counter() - start, ok)
+    if not ok:
+        raise ScenarioFailed(route)
+
+
+async def scenario_session(client, rec, rng, transcribe=True):
+    if transcribe:
+        await _call(client, rec, "/transcribe", files={"file": ("vent.wav", make_wav(rng), "audio/wav")})
+    vent = make_vent(rng)  # the stub can't transcribe noise; send what the seeker "said"
+    safety = await _call(client, rec, "/safety-check", json={"transcript": vent})
+    context_id = safety.get("context_id")
+    await _call(client, rec, "/extract-profile", json={"transcript": vent, "context_id": context_id,
+                                                         "mode": "extract_seeker"})
+    await _call(client, rec, "/match", json={"seeker_profile": {}, "context_id": context_id})
+    await _call(client, rec, "/scaffold", json={
+        "mode": rng.choice(CHAT_MODES), "system_prompt": "You are a peer supporter.",
+        "messages": [{"role": "user", "content": vent}],
+    })
+
+
+async def scenario_chat(client, rec, rng, transcribe=True):
+    messages = []
+    for _ in range(3):
+        messages.append({"role": "user", "content": make_vent(rng)})
+        reply = await _call(client, rec, "/extract-profile", json={"mode": "seeker_chat", "messages": messages})
+        messages.append({"role": "assistant", "content": reply.get("reply", "")})
+    vent = " ".join(m["content"] for m in messages if m["role"] == "user")
+    profile = await _call(client, rec, "/extract-profile", json={"transcript": vent, "mode": "extract_seeker"})
+    await _call(client, rec, "/match", json={"seeker_profile": {}, "context_id": profile.get("context_id")})
+    await _call_stream(client, rec, "/scaffold/stream", json={
+        "mode": rng.choice(CHAT_MODES), "system_prompt": "You are a peer supporter.", "messages": messages,
+    })
+
+
+async def scenario_match(client, rec, rng, transcribe=True):
+    await _call(client, rec, "/match", json={"seeker_profile": make_profile(rng, make_vent(rng))})
+
+
+SCENARIOS = {"session": scenario_session, "chat": scenario_chat, "match": scenario_match}
+
+
+def parse_mix(spec):
+    """'session=3,chat=1' → ([names], [weights])."""
+    names, weights = [], []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+        names.append(name)
+        weights.append(float(weight or 1))
+    return names, weights
+
+
+async def run_load(url, users, duration_s, mix="session", transcribe=True, warmup_s=2.0, seed=0, timeout_s=60.0):
+    """
+    Run `users` looping virtual users for warmup_s + duration_s. Only requests and
+    scenarios that finish after the warmup count; whatever is still in flight at
+    the end is cancelled (a saturated server shows up as few completions, not a
+    run that never ends).
+    """
+    names, weights = parse_mix(mix)
+    measure_from = time.perf_counter() + warmup_s
+    rec = Recorder(measure_from, measure_from + duration_s)
+
+    async def user(i):
+        rng = random.Random(seed * 100_003 + i)
+        while True:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                await SCENARIOS[name](client, rec, rng, transcribe=transcribe)
+                rec.scenario(name, time.perf_counter() - start, True)
+            except ScenarioFailed:
+                rec.scenario(name, time.perf_counter() - start, False)
+                await asyncio.sleep(0.1)  # don't hammer a server that is already refusing
+
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout_s, limits=limits) as client:
+        tasks = [asyncio.create_task(user(i)) for i in range(users)]
+        await asyncio.sleep(warmup_s + duration_s)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return rec
+
+
+# ── Reporting ───────────────────────────────────────────────────────────────
+
+def summarize(rec):
+    """Per-route and per-scenario throughput and latency percentiles (milliseconds)."""
+    routes = {}
+    for route, samples in rec.samples.items():
+        seconds = np.array([s for s, _ in samples]) * 1000
+        errors = sum(1 for _, ok in samples if not ok)
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+        routes[route] = {"n": len(samples), "errors": errors, "rps": len(samples) / rec.elapsed_s,
+                         "p50": p50, "p95": p95, "p99": p99, "max": seconds.max()}
+    scenarios = {}
+    for name, durations in rec.scenarios.items():
+        ms = np.array(durations) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        scenarios[name] = {"n": len(durations), "per_s": len(durations) / rec.elapsed_s,
+                           "p50": p50, "p95": p95, "p99": p99}
+    completed = sum(len(d) for d in rec.scenarios.values())
+    all_ms = np.concatenate([np.array(d) * 1000 for d in rec.scenarios.values()]) if completed else None
+    return {
+        "routes": routes,
+        "scenarios": scenarios,
+        "completed": completed,
+        "failed": rec.failed_scenarios,
+        "per_s": completed / rec.elapsed_s,
+        "p95": float(np.percentile(all_ms, 95)) if completed else float("inf"),  # nothing finished in the window
+        "elapsed_s": rec.elapsed_s,
+    }
+
+
+def print_summary(summary, slo_ms):
+    print(f"\n{'route':<32} {'n':>7} {'err':>5} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    ordered = sorted(summary["routes"], key=lambda r: ROUTE_ORDER.index(r) if r in ROUTE_ORDER else len(ROUTE_ORDER))
+    for route in ordered:
+        r = summary["routes"][route]
+        marker = "✓" if not r["errors"] else "⚠️" if r["errors"] / r["n"] < 0.05 else "❌"
+        print(f"{route:<32} {r['n']:>7} {r['errors']:>5} {r['rps']:>8.2f} {r['p50']:>7.0f}ms {r['p95']:>7.0f}ms "
+              f"{r['p99']:>7.0f}ms {r['max']:>7.0f}ms  {marker}")
+    print(f"\n{'scenario':<32} {'n':>7} {'per s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, s in summary["scenarios"].items():
+        marker = "✓" if s["p95"] <= slo_ms else "⚠️"
+        print(f"{name:<32} {s['n']:>7} {s['per_s']:>8.2f} {s['p50']:>7.0f}ms {s['p95']:>7.0f}ms "
+              f"{s['p99']:>7.0f}ms  {marker}")
+    print(f"\n{summary['completed']} scenarios completed, {summary['failed']} failed "
+          f"in {summary['elapsed_s']:.1f}s ({summary['per_s']:.2f}/s)")
+
+
+# ── Sweep: spawn stub + api per configuration, ramp users to saturation ──────
+
+def _wait_ready(url, timeout_s=120.0, proc=None):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"{url} exited during startup (code {proc.returncode})")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"{url} not ready after {timeout_s:.0f}s")
+
+
+def start_stub(port, latency, error_rate, tokens_per_s):
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(here, "openai_stub.py"), "--port", str(port), "--latency", latency,
+         "--error-rate", str(error_rate), "--tokens-per-s", str(tokens_per_s)],
+        stdout=subprocess.DEVNULL,
+    )
+    _wait_ready(f"http://127.0.0.1:{port}/stats", proc=proc)
+    return proc
+
+
+def start_api(port, workers, pool_size, stub_port, extra_env=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "HELPER_POOL_SIZE": str(pool_size),
+        "HELPER_POOL_SOURCE": "synthetic",
+        **(extra_env or {}),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    _wait_ready(f"http://127.0.0.1:{port}/health", proc=proc)
+    return proc
+
+
+def _stop(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def find_saturation(steps, plateau, slo_ms):
+    """Index of the first ramp step that stops scaling (or breaks the SLO), else None."""
+    for i, step in enumerate(steps):
+        if step["p95"] > slo_ms:
+            return i
+        if i and step["per_s"] < steps[i - 1]["per_s"] * (1 + plateau):
+            return i
+    return None
+
+
+def sweep(workers_list, pool_sizes, user_steps, duration_s, mix, transcribe, slo_ms, plateau,
+          api_port=8100, stub_port=8900, latency="lognormal:600,0.5", error_rate=0.0, tokens_per_s=60.0):
+    stub = start_stub(stub_port, latency, error_rate, tokens_per_s)
+    results = []
+    try:
+        for workers in workers_list:
+            for pool_size in pool_sizes:
+                print(f"\n── workers={workers} pool={pool_size} ──")
+                api = start_api(api_port, workers, pool_size, stub_port)
+                steps = []
+                try:
+                    for users in user_steps:
+                        rec = asyncio.run(run_load(f"http://127.0.0.1:{api_port}", users, duration_s, mix, transcribe))
+                        summary = summarize(rec)
+                        steps.append({"users": users, **summary})
+                        route_p95 = "  ".join(f"{route} {r['p95']:.0f}ms" for route, r in summary["routes"].items())
+                        print(f"  users={users:<4} {summary['per_s']:>7.2f}/s  p95={summary['p95']:>7.0f}ms  "
+                              f"failed={summary['failed']}  [{route_p95}]")
+                        if find_saturation(steps, plateau, slo_ms) is not None:
+                            break
+                finally:
+                    _stop(api)
+                results.append({"workers": workers, "pool": pool_size, "steps": steps,
+                                "saturated_at": find_saturation(steps, plateau, slo_ms)})
+    finally:
+        _stop(stub)
+    return results
+
+
+def print_sweep(results, slo_ms):
+    print(f"\n{'workers':>7} {'pool':>8} {'peak/s':>8} {'at users':>9} {'p95 there':>10} {'saturates at':>13}")
+    for r in results:
+        steps = r["steps"]
+        best = max(steps, key=lambda s: s["per_s"])
+        sat = r["saturated_at"]
+        if sat is None:
+            where, marker = f">{steps[-1]['users']} users", "✓"
+        else:
+            where = f"{steps[sat]['users']} users"
+            marker = "⚠️" if steps[sat]["p95"] <= slo_ms else "❌"
+        print(f"{r['workers']:>7} {r['pool']:>8} {best['per_s']:>8.2f} {best['users']:>9} {best['p95']:>8.0f}ms "
+              f"{where:>13}  {marker}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def int_list(spec):
+        return [int(v) for v in spec.split(",") if v]
+
+    parser = argparse.ArgumentParser(description="Load-test api.py with scripted user sessions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--duration", type=float, default=20.0, help="measured seconds per run/step")
+    common.add_argument("--mix", default="session", help="scenario weights, e.g. session=3,chat=1,match=1")
+    common.add_argument("--no-transcribe", action="store_true", help="skip the /transcribe step of session")
+    common.add_argument("--slo-ms", type=float, default=10_000, help="p95 scenario latency target")
+    common.add_argument("--json", help="also write the raw results here")
+
+    run = sub.add_parser("run", parents=[common], help="one load level against a running server")
+    run.add_argument("--url", default="http://127.0.0.1:8000")
+    run.add_argument("--users", type=int, default=8)
+
+    sw = sub.add_parser("sweep", parents=[common], help="spawn stub + api per config and ramp users")
+    sw.add_argument("--workers", type=int_list, default=[1, 2])
+    sw.add_argument("--pool-sizes", type=int_list, default=[30, 2000])
+    sw.add_argument("--users", type=int_list, default=[1, 2, 4, 8, 16, 32, 64])
+    sw.add_argument("--plateau", type=float, default=0.10, help="min throughput gain per step to keep ramping")
+    sw.add_argument("--api-port", type=int, default=8100)
+    sw.add_argument("--stub-port", type=int, default=8900)
+    sw.add_argument("--latency", default="lognormal:600,0.5", help="stub latency spec (see openai_stub.py)")
+    sw.add_argument("--error-rate", type=float, default=0.0)
+    sw.add_argument("--tokens-per-s", type=float, default=60.0)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        summary = summarize(asyncio.run(run_load(args.url, args.users, args.duration, args.mix,
+                                                 not args.no_transcribe)))
+        print_summary(summary, args.slo_ms)
+        output = summary
+    else:
+        results = sweep(args.workers, args.pool_sizes, args.users, args.duration, args.mix, not args.no_transcribe,
+                        args.slo_ms, args.plateau, args.api_port, args.stub_port, args.latency, args.error_rate,
+                        args.tokens_per_s)
+        print_sweep(results, args.slo_ms)
+        output = results
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2, default=float)
@@ -1,17 +1,16 @@
 import random
 import numpy as np
-import pickle
 import os
+import time
 from datetime import datetime
 
 # CRITICAL: Load Sentence Transformers BEFORE LightGBM to avoid OpenMP segfault.
 # LightGBM and PyTorch/SentenceTransformers have conflicting OpenMP libraries.
-# sentence_transformers must init its OpenMP first.
-try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
+# sentence_transformers must init its OpenMP first — embedding_backends imports it
+# at module import when EMBEDDING_BACKEND=torch (the default), so keep this above
+# the lightgbm import. The ONNX backends (onnx / onnx-int8) never load torch.
+from embedding_backends import EMBEDDING_BACKEND, BACKEND_AVAILABLE, load_backend
+SENTENCE_TRANSFORMERS_AVAILABLE = BACKEND_AVAILABLE
 
 import pandas as pd
 from faker import Faker
@@ -19,6 +18,11 @@ from openai import OpenAI
 import lightgbm as lgb
 from sklearn.model_selection import train_test_split
 
+from embedding_quant import QuantizedEmbedding
+from feedback_buffer import FeedbackLog
+from tracing import span
+from model_registry import MODEL_REGISTRY_DIR, ModelIntegrityError, ModelRegistry
+
 fake = Faker()
 
 # Initialize OpenAI/OpenRouter client
@@ -39,21 +43,25 @@ use_sentence_transformers = (
 
 if use_sentence_transformers:
     try:
-        print("📥 Loading local Sentence Transformer model (free, no API key needed)...")
+        print(f"📥 Loading local Sentence Transformer model (backend={EMBEDDING_BACKEND}, free, no API key needed)...")
         print("   This may take a moment on first run (downloads ~90MB model)...")
         print("   Note: If this hangs, set SKIP_SENTENCE_TRANSFORMERS=1")
         # all-MiniLM-L6-v2: 384 dimensions, fast, good quality
-        sentence_model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')  # Force CPU to avoid issues
+        sentence_model = load_backend(EMBEDDING_BACKEND)
         EMBEDDING_MODE = "sentence_transformers"
         print("✓ Sentence Transformers Loaded (100% FREE - runs locally)")
-        print("  Model: all-MiniLM-L6-v2 (384 dimensions)")
+        print(f"  Model: all-MiniLM-L6-v2 (384 dimensions, {EMBEDDING_BACKEND} backend)")
     except Exception as e:
         print(f"⚠️  Could not load Sentence Transformers: {e}")
         print("   Falling back to synthetic embeddings")
         EMBEDDING_MODE = "synthetic"
 elif not USE_OPENAI and not SENTENCE_TRANSFORMERS_AVAILABLE:
-    print("💡 Tip: Install sentence-transformers for FREE local embeddings:")
-    print("   pip install sentence-transformers")
+    if EMBEDDING_BACKEND == "torch":
+        print("💡 Tip: Install sentence-transformers for FREE local embeddings:")
+        print("   pip install sentence-transformers")
+    else:
+        print(f"💡 Tip: EMBEDDING_BACKEND={EMBEDDING_BACKEND} needs onnxruntime + tokenizers and an exported model:")
+        print("   pip install onnxruntime tokenizers && python embedding_backends.py export --int8")
     EMBEDDING_MODE = "synthetic"
 elif not USE_OPENAI and os.getenv("SKIP_SENTENCE_TRANSFORMERS") == "1":
     print("⏭️  Skipping Sentence Transformers (SKIP_SENTENCE_TRANSFORMERS=1)")
@@ -149,7 +157,8 @@ def generate_emotion_embedding(text=None, use_openai=False):
         # Try Sentence Transformers (FREE local model)
         if sentence_model is not None:
             try:
-                embedding = sentence_model.encode(text, convert_to_numpy=True)
+                with span("sentence_model.encode", backend=EMBEDDING_BACKEND):
+                    embedding = sentence_model.encode(text, convert_to_numpy=True)
                 return embedding / np.linalg.norm(embedding)  # Normalize
             except Exception as e:
                 print(f"Sentence Transformer error: {e}, falling back...")
@@ -288,13 +297,18 @@ def generate_seeker():
 # ---------------------------
 
 class FeedbackStore:
-    """Stores conversation outcomes for learning"""
+    """Stores conversation outcomes for learning (append-only FeedbackLog shared by all workers)"""
     
     def __init__(self, filepath="feedback_data.pkl"):
         self.filepath = filepath
-        self.data = []
+        self.log = FeedbackLog(filepath)
         self.load()
     
+    @property
+    def data(self):
+        """Every stored outcome, including ones other processes appended since the last read"""
+        return self.log.refresh()
+    
     def add_feedback(self, seeker, helper, match_features, outcome):
         """
         Record a conversation outcome
@@ -312,29 +326,43 @@ class FeedbackStore:
             "features": match_features,
             "outcome": outcome
         }
-        self.data.append(feedback_entry)
-        self.save()
+        self.log.append([feedback_entry])
     
-    def save(self):
-        """Save feedback to disk"""
-        with open(self.filepath, 'wb') as f:
-            pickle.dump(self.data, f)
+    def add_feedback_batch(self, entries):
+        """
+        Record many outcomes with a single append
+        
+        Args:
+            entries: List of dicts with seeker_id, helper_id, features, outcome
+                     (and optionally timestamp, match_id)
+        """
+        if not entries:
+            return
+        now = datetime.now()
+        new_entries = [{
+            "timestamp": entry.get("timestamp", now),
+            "match_id": entry.get("match_id"),
+            "seeker_id": entry["seeker_id"],
+            "helper_id": entry["helper_id"],
+            "features": entry["features"],
+            "outcome": entry["outcome"]
+        } for entry in entries]
+        self.log.append(new_entries)  # on failure nothing is recorded; the caller may retry the batch
     
     def load(self):
-        """Load feedback from disk"""
-        if os.path.exists(self.filepath):
-            with open(self.filepath, 'rb') as f:
-                self.data = pickle.load(f)
-    
-    def get_training_data(self):
-        """Convert feedback to training dataset"""
-        if not self.data:
+        """Load feedback from disk (only what was appended since the last load is read)"""
+        self.log.refresh()
+    
+    def get_training_data(self, window=None):
+        """Convert feedback to training dataset (optionally only the newest `window` entries)"""
+        entries = self.data[-window:] if window else self.data
+        if not entries:
             return None, None
         
         X = []  # Features
         y = []  # Labels (conversation quality)
         
-        for entry in self.data:
+        for entry in entries:
             features = entry["features"]
             outcome = entry["outcome"]
             
@@ -366,12 +394,19 @@ class LearnedMatcher:
     """
     Matcher that learns optimal weights from feedback
     Uses LightGBM to predict match quality
+    
+    With a ModelRegistry, trained models are published as new versions and
+    refresh() hot-swaps to whatever version is active (see model_registry.py).
+    Without one, the booster lives in model_path as before.
     """
     
-    def __init__(self, model_path="matcher_model.txt"):
+    def __init__(self, model_path="matcher_model.txt", registry=None):
         self.model_path = model_path
+        self.registry = registry
         self.model = None
+        self.model_version = None
         self.is_trained = False
+        self._rejected_version = None
         self.load()
     
     def train(self, X, y, verbose=True):
@@ -408,7 +443,7 @@ class LearnedMatcher:
         }
         
         # Train
-        self.model = lgb.train(
+        model = lgb.train(
             params,
             train_data,
             num_boost_round=100,
@@ -416,14 +451,15 @@ class LearnedMatcher:
             callbacks=[lgb.early_stopping(stopping_rounds=10, verbose=False)]
         )
         
-        self.is_trained = True
-        self.save()
+        # Evaluate
+        y_pred = model.predict(X_test)
+        rmse = float(np.sqrt(np.mean((y_pred - y_test) ** 2)))
+        
+        self._swap(model, self.model_version)
+        self.save(metrics={"rmse": round(rmse, 4), "n_samples": len(X)})
         
         if verbose:
-            # Evaluate
-            y_pred = self.model.predict(X_test)
-            rmse = np.sqrt(np.mean((y_pred - y_test) ** 2))
-            print(f"✓ Model trained on {len(X)} samples, RMSE: {rmse:.3f}")
+            print(f"✓ Model trained on {len(X)} samples, RMSE: {rmse:.3f} (version {self.model_version})")
             
             # Feature importance
             importance = self.model.feature_importance()
@@ -445,7 +481,8 @@ class LearnedMatcher:
         Returns:
             Predicted quality score (0-1)
         """
-        if not self.is_trained or self.model is None:
+        model = self.model  # one read: a concurrent hot-swap can't change it mid-call
+        if model is None:
             # Fallback to rule-based
             return None
         
@@ -459,26 +496,72 @@ class LearnedMatcher:
             features["energy_bonus"]
         ]])
         
-        return self.model.predict(feature_vec)[0]
-    
-    def save(self):
-        """Save model to disk"""
-        if self.model:
-            self.model.save_model(self.model_path)
+        return model.predict(feature_vec)[0]
+    
+    def save(self, metrics=None):
+        """Publish to the registry, or atomically replace model_path when there is none"""
+        if not self.model:
+            return
+        if self.registry is not None:
+            version = self.registry.publish(self.model, metrics=metrics, activate=False)
+            self.model_version = version  # set first so the watcher doesn't reload our own model
+            self.registry.activate(version)
+            return
+        tmp_path = self.model_path + ".tmp"
+        self.model.save_model(tmp_path)
+        os.replace(tmp_path, self.model_path)
+        self.model_version = f"file:{os.path.basename(self.model_path)}"
     
     def load(self):
-        """Load model from disk"""
+        """Load the active registry version, falling back to model_path"""
+        if self.registry is not None and self.registry.active_version():
+            try:
+                version, booster = self.registry.load_booster()
+                self._swap(booster, version)
+                return
+            except ModelIntegrityError as e:
+                print(f"⚠️  Could not load active model from registry: {e}")
         if os.path.exists(self.model_path):
             try:
-                self.model = lgb.Booster(model_file=self.model_path)
-                self.is_trained = True
-            except:
-                pass
+                self._swap(lgb.Booster(model_file=self.model_path), f"file:{os.path.basename(self.model_path)}")
+            except lgb.basic.LightGBMError as e:
+                print(f"⚠️  Could not load {self.model_path}, using rule-based scoring: {e}")
+    
+    def refresh(self):
+        """Hot-swap to the registry's active version if it changed. Returns True on swap."""
+        if self.registry is None:
+            return False
+        active = self.registry.active_version()
+        if not active or active in (self.model_version, self._rejected_version):
+            return False
+        try:
+            version, booster = self.registry.load_booster(active)
+        except ModelIntegrityError as e:
+            self._rejected_version = active  # warn once per bad version, not every poll
+            print(f"⚠️  Keeping model {self.model_version}; {active} failed validation: {e}")
+            return False
+        self._swap(booster, version)
+        print(f"✓ Hot-swapped matcher model → {version}")
+        return True
+    
+    def rollback(self):
+        """Re-activate the previous registry version and swap to it."""
+        if self.registry is None:
+            raise ModelIntegrityError("No model registry configured")
+        version = self.registry.rollback()
+        self.refresh()
+        return version
+    
+    def _swap(self, booster, version):
+        # Single reference assignment: in-flight predict() calls keep the old booster
+        self.model = booster
+        self.model_version = version
+        self.is_trained = True
 
 
 # Global instances
 feedback_store = FeedbackStore()
-learned_matcher = LearnedMatcher()
+learned_matcher = LearnedMatcher(registry=ModelRegistry(MODEL_REGISTRY_DIR))
 
 # ---------------------------
 # PSYCHOLOGICALLY SMART SCORING FUNCTIONS
@@ -496,9 +579,13 @@ def emotion_embedding_similarity(seeker, helper):
     0.35 weight: Measures emotional state alignment
     High score = helper understands seeker's emotional landscape
     """
+    helper_embedding = helper["emotion_embedding"]
+    if isinstance(helper_embedding, QuantizedEmbedding):
+        # Scored directly on the int8/float16/PQ codes (see embedding_quant.py)
+        return helper_embedding.cosine(seeker["emotion_embedding"])
     return cosine_similarity(
         seeker["emotion_embedding"],
-        helper["emotion_embedding"]
+        helper_embedding
     )
 
 
@@ -723,7 +810,8 @@ def compute_dha_match_score(seeker, helper, use_learned=True):
     
     # Try learned model first
     if use_learned and learned_matcher.is_trained:
-        ml_score = learned_matcher.predict(features)
+        with span("LearnedMatcher.predict", aggregate=True):
+            ml_score = learned_matcher.predict(features)
         if ml_score is not None:
             features["score_source"] = "learned_model"
             return round(ml_score, 3), features
@@ -788,7 +876,7 @@ def simulate_conversation_outcome(match_score, breakdown):
     }
 
 
-def match_seeker_to_helpers(seeker, helpers, top_k=5, min_score=0.5, use_learned=True):
+def match_seeker_to_helpers(seeker, helpers, top_k=5, min_score=0.5, use_learned=True, timings=None):
     """
     Main matching function - returns top K helpers for a seeker
     
@@ -798,22 +886,31 @@ def match_seeker_to_helpers(seeker, helpers, top_k=5, min_score=0.5, use_learned
         top_k: Number of top matches to return
         min_score: Minimum score threshold (filters out poor matches)
         use_learned: Whether to use learned model
+        timings: Optional dict; filled with per-stage seconds ("scoring", "sort")
     
     Returns:
         List of (score, helper_id, breakdown) tuples
     """
     scored = []
+    start = time.perf_counter()
     
-    for helper in helpers:
-        score, breakdown = compute_dha_match_score(seeker, helper, use_learned=use_learned)
-        
-        # Only include if meets minimum threshold
-        if score >= min_score:
-            scored.append((score, helper["user_id"], breakdown, helper))
+    with span("scoring", helpers=len(helpers)):
+        for helper in helpers:
+            with span("compute_dha_match_score", aggregate=True):
+                score, breakdown = compute_dha_match_score(seeker, helper, use_learned=use_learned)
+            
+            # Only include if meets minimum threshold
+            if score >= min_score:
+                scored.append((score, helper["user_id"], breakdown, helper))
     
+    scored_at = time.perf_counter()
     # Sort by score descending
-    scored.sort(reverse=True, key=lambda x: x[0])
+    with span("sort", candidates=len(scored)):
+        scored.sort(reverse=True, key=lambda x: x[0])
     
+    if timings is not None:
+        timings["scoring"] = scored_at - start
+        timings["sort"] = time.perf_counter() - scored_at
     return scored[:top_k]
 
 
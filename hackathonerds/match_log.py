@@ -0,0 +1,161 @@
+"""
+Opt-in log of /match traffic for offline replay (replay.py).
+
+With MATCH_LOG_DIR set, every /match request is appended to
+<dir>/matches-YYYYMMDD.jsonl:
+
+    {"ts": ..., "seeker": {...profile incl. emotion_embedding...},
+     "pool_id": "ab12…", "pool_version": 42, "positions": null | {"size": ..., "mask": "<base64>"},
+     "model_version": "...",
+     "results": [{"match_id": ..., "helper_id": ..., "score": ..., "rank": 1}, ...]}
+
+The full (unfiltered) helper pool is snapshotted once per (pool_id,
+pool_version) to <dir>/pool-<pool_id>-<pool_version>.pkl (pickle), so a log
+line only carries its ID. pool_id hashes the user_ids and is recomputed only
+when the pool list, its length or its version changes; the caller bumps
+pool_version whenever a helper's profile changes (api.py passes the helper
+store seq it has applied), so an updated profile gets a new snapshot. When a
+request scored only part of the pool (prefilter, helper_ids), the kept
+positions travel in the log line as a zlib-compressed bitmask instead of as
+another snapshot. Writes happen on a background thread; the request path only
+enqueues.
+"""
+
+import os
+import base64
+import json
+import hashlib
+import logging
+import pickle
+import queue
+import threading
+import time
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger("bridge.matchlog")
+
+MATCH_LOG_DIR = os.getenv("MATCH_LOG_DIR")
+MATCH_LOG_QUEUE_MAX = int(os.getenv("MATCH_LOG_QUEUE_MAX", "10000"))
+
+
+def pool_id_for(helpers):
+    """Stable ID for a helper pool (hash of its sorted user_ids)."""
+    ids = sorted(h["user_id"] for h in helpers)
+    return hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_positions(positions, size):
+    """Pool positions → {"size", "mask"}: a zlib-compressed, base64 packbits mask over the pool."""
+    mask = np.zeros(size, dtype=bool)
+    mask[np.asarray(positions, dtype=np.int64)] = True
+    return {"size": size, "mask": base64.b64encode(zlib.compress(np.packbits(mask).tobytes())).decode("ascii")}
+
+
+def decode_positions(encoded):
+    """Inverse of encode_positions: sorted int64 positions."""
+    packed = np.frombuffer(zlib.decompress(base64.b64decode(encoded["mask"])), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, count=encoded["size"]))
+
+
+def _jsonable(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, "dequantize"):  # QuantizedEmbedding
+        return obj.dequantize().tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class MatchLog:
+    """Background JSONL writer for /match requests + one-time pool snapshots."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=MATCH_LOG_QUEUE_MAX)
+        self._snapshotted = set()
+        self._last_pool = (None, 0, None, None)  # (pool list, len, version, pool_id): skip rehashing the pool
+        self._thread = threading.Thread(target=self._run, name="match-log", daemon=True)
+        self._thread.start()
+
+    def log(self, seeker, pool, results, model_version=None, pool_version=0, positions=None):
+        """
+        Enqueue one /match request (results = [(match_id, helper_id, score), ...]).
+        `pool` is the full helper pool; `positions` the part of it that was scored, if not all.
+        """
+        last_pool, last_len, last_version, pool_id = self._last_pool
+        if last_pool is not pool or last_len != len(pool) or last_version != pool_version:
+            pool_id = pool_id_for(pool)
+            self._last_pool = (pool, len(pool), pool_version, pool_id)
+        record = {
+            "ts": time.time(),
+            "seeker": seeker,
+            "pool_id": pool_id,
+            "pool_version": pool_version,
+            "positions": None if positions is None else encode_positions(positions, len(pool)),
+            "model_version": model_version,
+            "results": [
+                {"match_id": match_id, "helper_id": helper_id, "score": score, "rank": rank}
+                for rank, (match_id, helper_id, score) in enumerate(results, start=1)
+            ],
+        }
+        key = (pool_id, pool_version)
+        snapshot = None if key in self._snapshotted else list(pool)
+        self._snapshotted.add(key)
+        try:
+            self._queue.put_nowait((record, snapshot))
+        except queue.Full:
+            logger.warning("Match log queue full; dropping request log")
+
+    def _run(self):
+        while True:
+            record, snapshot = self._queue.get()
+            try:
+                if snapshot is not None:
+                    path = _pool_path(self.directory, record["pool_id"], record["pool_version"])
+                    if not os.path.exists(path):
+                        tmp_path = path + ".tmp"
+                        with open(tmp_path, "wb") as f:
+                            pickle.dump(snapshot, f)
+                        os.replace(tmp_path, path)
+                day = time.strftime("%Y%m%d", time.gmtime(record["ts"]))
+                with open(os.path.join(self.directory, f"matches-{day}.jsonl"), "a") as f:
+                    f.write(json.dumps(record, default=_jsonable) + "\n")
+            except Exception:
+                logger.error("Could not write match log", exc_info=True)
+
+
+def read_log(directory):
+    """Yield logged /match records (oldest file first)."""
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("matches-") and name.endswith(".jsonl")):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    emb = record["seeker"].get("emotion_embedding")
+                    if emb is not None:
+                        record["seeker"]["emotion_embedding"] = np.asarray(emb, dtype=np.float32)
+                    yield record
+
+
+def _pool_path(directory, pool_id, pool_version=None):
+    if pool_version is None:  # logged before pool versions existed
+        return os.path.join(directory, f"pool-{pool_id}.pkl")
+    return os.path.join(directory, f"pool-{pool_id}-{pool_version}.pkl")
+
+
+def load_pool(directory, pool_id, pool_version=None):
+    with open(_pool_path(directory, pool_id, pool_version), "rb") as f:
+        return pickle.load(f)
+
+
+def request_pool(record, pool):
+    """The helpers a logged request actually scored: its kept positions of the full pool."""
+    if record.get("positions") is None:
+        return pool
+    return [pool[i] for i in decode_positions(record["positions"]).tolist()]
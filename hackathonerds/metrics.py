@@ -0,0 +1,298 @@
+"""
+Minimal Prometheus-style metrics (counters, gauges, histograms) for the Bridge API.
+
+No client library needed: metrics live in-process and GET /metrics renders them
+in the Prometheus text exposition format (0.0.4). Recording is a dict lookup, a
+bisect and two additions under a lock — cheap enough for every request.
+
+    REQUEST_LATENCY.labels("/match", "POST").observe(0.012)
+    FALLBACKS.labels("scaffold").inc()
+    with MATCH_STAGE.labels("embedding").time(): ...
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets (seconds): sub-ms local work up to multi-second LLM / STT calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+REGISTRY = []
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        """Child for metrics without labels."""
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}_total{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _CounterChild
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = float(value)
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    _new_child = _GaugeChild
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self, name, labelnames, key):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, ('le', _format_value(bound)))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {self.count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+def render_latest():
+    """All registered metrics in Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ── Bridge metrics ───────────────────────────────────────────────────────────
+
+REQUEST_LATENCY = Histogram(
+    "bridge_http_request_duration_seconds", "HTTP request latency by route template",
+    ["route", "method"],
+)
+REQUESTS = Counter(
+    "bridge_http_requests", "HTTP requests by route template and status code",
+    ["route", "method", "status"],
+)
+FALLBACKS = Counter(
+    "bridge_fallback", "Times a scripted/mock fallback was served instead of a model result",
+    ["path"],
+)
+SAFETY_DECISIONS = Counter(
+    "bridge_safety_decisions", "/safety-check verdicts by tier (local | llm | fallback | cached)",
+    ["tier", "risk_level"],
+)
+LLM_LATENCY = Histogram(
+    "bridge_llm_request_duration_seconds", "Upstream LLM call latency",
+    ["endpoint"],
+)
+LLM_TOKENS = Histogram(
+    "bridge_llm_tokens", "Tokens per upstream LLM call",
+    ["endpoint", "kind"], buckets=TOKEN_BUCKETS,
+)
+STREAM_TTFB = Histogram(
+    "bridge_stream_first_byte_seconds", "Time to first streamed delta",
+    ["route", "source"],
+)
+MATCH_STAGE = Histogram(
+    "bridge_match_stage_duration_seconds", "Matching-engine stage latency (embedding | prefilter | scoring | sort)",
+    ["stage"],
+)
+MATCH_SHARD_LATENCY = Histogram(
+    "bridge_match_shard_duration_seconds", "Scatter/gather round trip per helper shard", ["shard"],
+)
+MATCH_SHARD_RESULTS = Counter(
+    "bridge_match_shard_results", "Shard replies to /match scatters (ok | timeout | skipped | error)",
+    ["result"],
+)
+MATCH_PARTIAL = Counter("bridge_match_partial", "/match responses merged from fewer than all shards")
+MATCH_PREFILTER_SELECTIVITY = Histogram(
+    "bridge_match_prefilter_selectivity", "Fraction of remaining candidates each hard-constraint filter keeps",
+    ["filter"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+MATCH_PREFILTER_RELAXED = Counter(
+    "bridge_match_prefilter_relaxed", "Prefilter steps skipped because they left too few candidates",
+    ["filter"],
+)
+HELPER_POOL_SIZE = Gauge("bridge_helper_pool_size", "Helpers loaded in the in-memory pool")
+MATCH_CANDIDATES = Histogram(
+    "bridge_match_candidates", "Helpers scored per /match request",
+    buckets=(10, 30, 100, 300, 1000, 3000, 10000, 100000, 1000000),
+)
+TRAINER_RUNS = Counter(
+    "bridge_trainer_runs", "Background retraining runs by result (published | rejected | failed)",
+    ["result"],
+)
+TRAINER_DURATION = Histogram(
+    "bridge_trainer_duration_seconds", "Wall-clock time of background retraining runs",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800),
+)
+TRAINER_WINDOW = Gauge("bridge_trainer_window_samples", "Feedback samples in the last training window")
+FEEDBACK_RECEIVED = Counter(
+    "bridge_feedback", "POST /feedback outcomes by result (queued | unknown_match | duplicate | rejected)",
+    ["result"],
+)
+FEEDBACK_BUFFERED = Gauge("bridge_feedback_buffered", "Feedback records waiting in the write-behind buffer")
+FEEDBACK_FLUSH = Histogram(
+    "bridge_feedback_flush_duration_seconds", "Write-behind buffer flush latency by trigger (size | time | shutdown)",
+    ["trigger"],
+)
+SHADOW_RUNS = Counter(
+    "bridge_shadow_runs", "Shadow scorer runs by result (scored | budget | busy | error)",
+    ["result"],
+)
+SHADOW_DURATION = Histogram("bridge_shadow_duration_seconds", "Wall-clock time of one shadow scoring run")
+SHADOW_OVERLAP = Histogram(
+    "bridge_shadow_topk_overlap", "Fraction of the live top-k also in the shadow scorer's top-k",
+    buckets=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+)
+STT_STAGE = Histogram(
+    "bridge_stt_stage_duration_seconds", "File transcription stage latency (decode | vad | transcribe)",
+    ["stage"],
+)
+STT_AUDIO_SECONDS = Counter(
+    "bridge_stt_audio_seconds", "Seconds of uploaded audio processed (audio | speech after VAD)",
+    ["kind"],
+)
+STT_SPEED = Histogram(
+    "bridge_stt_audio_seconds_per_second", "Audio seconds transcribed per wall-clock second, per file",
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+STT_PASSES = Counter(
+    "bridge_stt_passes", "Whisper decode passes by model, beam size and pass (draft | final)",
+    ["model", "beam_size", "pass"],
+)
+STT_BATCH_UPLOADS = Histogram(
+    "bridge_stt_batch_uploads", "Uploads sharing one batched Whisper decode pass",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16),
+)
+TRANSCRIPT_CACHE = Counter(
+    "bridge_transcript_cache", "/transcribe cache lookups (hit | miss | coalesced | bypass)",
+    ["result"],
+)
+TRANSCRIPT_CACHE_BYTES = Gauge("bridge_transcript_cache_bytes", "Bytes held by the on-disk transcript cache")
+TRANSCRIBE_JOBS = Counter(
+    "bridge_transcribe_jobs", "Transcription jobs by event (submitted | done | failed)",
+    ["event"],
+)
+TRANSCRIBE_QUEUE_DEPTH = Gauge("bridge_transcribe_jobs_queued", "Transcription jobs waiting for a worker")
+TRANSCRIBE_JOB_WAIT = Histogram(
+    "bridge_transcribe_job_queue_seconds", "Time a transcription job waited before a worker picked it up",
+    buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+TRANSCRIBE_JOB_DURATION = Histogram(
+    "bridge_transcribe_job_duration_seconds", "Time a worker spent on one transcription job",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
@@ -0,0 +1,273 @@
+"""
+Versioned, checksummed registry for LearnedMatcher boosters.
+
+Layout (MODEL_REGISTRY_DIR, default ./model_registry):
+
+    model_registry/
+        versions/
+            v20250301T101500-1a2b3c4d/
+                model.txt          # LightGBM text model
+                manifest.json      # {version, sha256, size_bytes, created_at, metrics, parent}
+        ACTIVE                     # name of the active version (swapped with os.replace)
+        history.jsonl              # one line per activation (used by rollback)
+
+Publishing writes into a temp directory, fsyncs, then renames it into
+versions/ — readers never see a half-written model. Every load re-hashes the
+file and refuses it if it doesn't match the manifest.
+
+Workers poll ACTIVE (ModelWatcher) and swap the booster reference in place;
+in-flight predictions keep using the booster they already hold.
+
+CLI:
+    python model_registry.py list
+    python model_registry.py publish matcher_model.txt [--no-activate]
+    python model_registry.py activate <version>
+    python model_registry.py rollback
+    python model_registry.py verify [<version>]
+"""
+
+import os
+import json
+import hashlib
+import logging
+import shutil
+import tempfile
+import threading
+import time
+
+import lightgbm as lgb
+
+logger = logging.getLogger("bridge.models")
+
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model_registry")
+MODEL_POLL_INTERVAL_S = float(os.getenv("MODEL_POLL_INTERVAL_S", "10"))
+
+MODEL_FILE = "model.txt"
+MANIFEST_FILE = "manifest.json"
+
+
+class ModelIntegrityError(RuntimeError):
+    """A registry version is missing, incomplete or fails its checksum."""
+
+
+def _fsync_write(path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # not supported on this platform
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ModelRegistry:
+    """Filesystem registry of published LightGBM models with an ACTIVE pointer."""
+
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = root
+        self.versions_dir = os.path.join(root, "versions")
+        self.active_path = os.path.join(root, "ACTIVE")
+        self.history_path = os.path.join(root, "history.jsonl")
+
+    # ── Read side ──
+
+    def active_version(self):
+        """Name of the active version, or None if nothing has been activated."""
+        try:
+            with open(self.active_path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, version):
+        path = os.path.join(self.versions_dir, version, MANIFEST_FILE)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ModelIntegrityError(f"Version {version} has no manifest")
+        except ValueError as e:  # truncated / corrupt JSON
+            raise ModelIntegrityError(f"Version {version} has an unreadable manifest: {e}") from e
+
+    def list_versions(self):
+        """Manifests of all published versions, oldest first."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        manifests = []
+        for name in sorted(os.listdir(self.versions_dir)):
+            if name.startswith("."):
+                continue  # in-progress publish
+            try:
+                manifests.append(self.manifest(name))
+            except (ModelIntegrityError, ValueError):
+                logger.warning("Skipping registry entry without a valid manifest: %s", name)
+        return manifests
+
+    def read_verified(self, version):
+        """Model text for a version after checking size + sha256 against its manifest."""
+        manifest = self.manifest(version)
+        path = os.path.join(self.versions_dir, version, MODEL_FILE)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise ModelIntegrityError(f"Version {version} has no {MODEL_FILE}")
+        digest = hashlib.sha256(data).hexdigest()
+        if len(data) != manifest["size_bytes"] or digest != manifest["sha256"]:
+            raise ModelIntegrityError(
+                f"Checksum mismatch for {version}: expected {manifest['sha256'][:12]}, got {digest[:12]}"
+            )
+        return data.decode("utf-8")
+
+    def load_booster(self, version=None):
+        """(version, Booster) for a version (default: active). Raises ModelIntegrityError."""
+        version = version or self.active_version()
+        if not version:
+            raise ModelIntegrityError("No active model version")
+        text = self.read_verified(version)
+        try:
+            return version, lgb.Booster(model_str=text)
+        except lgb.basic.LightGBMError as e:
+            raise ModelIntegrityError(f"LightGBM could not parse {version}: {e}")
+
+    # ── Write side ──
+
+    def publish(self, model, metrics=None, activate=True):
+        """
+        Atomically add a model (Booster or LightGBM model text) as a new version.
+        Returns the version name.
+        """
+        text = model.model_to_string() if isinstance(model, lgb.Booster) else str(model)
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        version = f"v{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{digest[:8]}"
+        final_dir = os.path.join(self.versions_dir, version)
+        if os.path.exists(final_dir):
+            logger.info("Model %s already published", version)
+        else:
+            os.makedirs(self.versions_dir, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(prefix=".publish-", dir=self.versions_dir)
+            try:
+                _fsync_write(os.path.join(tmp_dir, MODEL_FILE), data)
+                manifest = {
+                    "version": version,
+                    "sha256": digest,
+                    "size_bytes": len(data),
+                    "created_at": time.time(),
+                    "metrics": metrics or {},
+                    "parent": self.active_version(),
+                }
+                _fsync_write(os.path.join(tmp_dir, MANIFEST_FILE), json.dumps(manifest, indent=2).encode("utf-8"))
+                _fsync_dir(tmp_dir)
+                os.rename(tmp_dir, final_dir)
+                _fsync_dir(self.versions_dir)
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+            logger.info("Published model %s (%d bytes, metrics=%s)", version, len(data), metrics or {})
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version, reason="activate"):
+        """Point ACTIVE at a (verified) version."""
+        self.read_verified(version)
+        previous = self.active_version()
+        tmp_path = self.active_path + ".tmp"
+        _fsync_write(tmp_path, (version + "\n").encode("utf-8"))
+        os.replace(tmp_path, self.active_path)
+        _fsync_dir(self.root)
+        with open(self.history_path, "a") as f:
+            f.write(json.dumps({"ts": time.time(), "version": version, "previous": previous, "reason": reason}) + "\n")
+        logger.info("Active model %s → %s (%s)", previous, version, reason)
+
+    def rollback(self):
+        """Re-activate the version that was active before the current one."""
+        current = self.active_version()
+        previous = None
+        try:
+            with open(self.history_path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        # Latest forward activation of the current version (skip rollbacks → no ping-pong)
+                        if entry["version"] == current and entry.get("reason") != "rollback":
+                            previous = entry["previous"]
+        except FileNotFoundError:
+            pass
+        if not previous:
+            raise ModelIntegrityError(f"No earlier version to roll back to from {current}")
+        self.activate(previous, reason="rollback")
+        return previous
+
+
+class ModelWatcher:
+    """Background thread that hot-swaps a LearnedMatcher when ACTIVE changes."""
+
+    def __init__(self, matcher, interval_s=MODEL_POLL_INTERVAL_S):
+        self.matcher = matcher
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.matcher.refresh()
+            except Exception:
+                logger.error("Model refresh failed", exc_info=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Manage the LearnedMatcher model registry.")
+    parser.add_argument("command", choices=["list", "publish", "activate", "rollback", "verify"])
+    parser.add_argument("target", nargs="?", help="model file (publish) or version (activate/verify)")
+    parser.add_argument("--root", default=MODEL_REGISTRY_DIR)
+    parser.add_argument("--no-activate", action="store_true")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    try:
+        if args.command == "list":
+            active = registry.active_version()
+            for m in registry.list_versions():
+                marker = "→" if m["version"] == active else " "
+                print(f"{marker} {m['version']}  {m['size_bytes']:>9,d} B  "
+                      f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(m['created_at']))}  {m['metrics']}")
+        elif args.command == "publish":
+            with open(args.target) as f:
+                version = registry.publish(f.read(), activate=not args.no_activate)
+            print(f"✓ Published {version}{'' if args.no_activate else ' (active)'}")
+        elif args.command == "activate":
+            registry.activate(args.target)
+            print(f"✓ Active model: {args.target}")
+        elif args.command == "rollback":
+            print(f"✓ Rolled back to {registry.rollback()}")
+        else:
+            targets = [args.target] if args.target else [m["version"] for m in registry.list_versions()]
+            for version in targets:
+                registry.load_booster(version)
+                print(f"✓ {version}")
+    except ModelIntegrityError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,220 @@
+"""
+Local OpenAI-compatible stub server for load tests (no credentials, no cost).
+
+Serves POST /v1/chat/completions (blocking and streamed) with configurable
+latency, error rate and streaming speed, so api.py exercises its real client
+code paths: timeouts, retries, SSE relaying and fallbacks. The mock fallbacks
+in api.py return instantly and hide all of that.
+
+Replies follow the prompt they get, so api.py parses them like the real thing:
+  - safety classifier prompt  → "low" | "medium" | "high"
+  - seeker profile extraction → seeker profile JSON
+  - helper profile extraction → helper profile JSON (themes, theme_scores, ...)
+  - scaffold instruction      → "Try: ..."
+  - anything else             → a short empathetic chat reply
+
+Run it, then point api.py at it:
+    python openai_stub.py --port 8900 --latency lognormal:600,0.5 --error-rate 0.02
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8900/v1 uvicorn api:app
+
+Latency specs (milliseconds, time to first token for streams):
+    fixed:300   uniform:200,900   lognormal:<median>,<sigma>
+Streams then emit tokens at --tokens-per-s.
+"""
+
+import os
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger("bridge.openai_stub")
+
+STUB_LATENCY = os.getenv("STUB_LATENCY", "lognormal:600,0.5")
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_TOKENS_PER_S = float(os.getenv("STUB_TOKENS_PER_S", "60"))
+STUB_SEED = os.getenv("STUB_SEED")
+
+THEMES = [
+    "Exam Stress / Academic Pressure", "Family Problems", "Friendship / Social Issues",
+    "Burnout / Emotional Exhaustion", "Loneliness / Isolation", "Life Direction / Purpose",
+    "Self-Confidence / Self-Esteem",
+]
+COPING_STYLES = ["problem_focused", "emotion_focused", "avoidant", "social_support", "meaning_making"]
+CONVERSATION_PREFERENCES = ["direct_advice", "reflective_listening", "collaborative_problem_solving",
+                            "validation_focused"]
+CHAT_REPLIES = [
+    "That sounds really heavy to carry on your own. What's been weighing on you the most lately?",
+    "Thank you for sharing that with me. How long have you been feeling this way?",
+    "It makes sense that you'd feel worn out. I'll find you someone who's been through something similar.",
+]
+SCAFFOLD_REPLIES = [
+    'Try: "That sounds exhausting. I\'m here for as long as you need."',
+    'Try: "It sounds like you\'ve been carrying this alone. What would help most right now?"',
+    'Try: "What\'s one small thing that might make tomorrow a little easier?"',
+]
+
+rng = random.Random(STUB_SEED)
+
+
+def parse_latency(spec):
+    """'fixed:300' | 'uniform:a,b' | 'lognormal:median,sigma' → callable returning seconds."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values[0], values[1] if len(values) > 1 else 0.5
+        return lambda: rng.lognormvariate(0.0, sigma) * median / 1000
+    raise ValueError(f"Unknown latency spec {spec!r}")
+
+
+def _seeker_profile():
+    themes = rng.sample(THEMES, rng.randint(1, 3))
+    return {
+        "themes": [{"name": t, "intensity": round(rng.uniform(0.5, 1.0), 2)} for t in themes],
+        "coping_style_preference": {s: round(rng.random(), 2) for s in COPING_STYLES},
+        "conversation_preference": {p: round(rng.random(), 2) for p in CONVERSATION_PREFERENCES},
+        "energy_level": rng.choice(["depleted", "low", "moderate", "high"]),
+        "distress_level": rng.choice(["Low", "Medium", "High"]),
+        "urgency": round(rng.uniform(0.3, 1.0), 2),
+    }
+
+
+def _helper_profile():
+    themes = rng.sample(THEMES, rng.randint(1, 3))
+    return {
+        "themes": [{"name": t, "intensity": round(rng.uniform(0.5, 1.0), 2)} for t in themes],
+        "coping_style": rng.choice(COPING_STYLES),
+        "communication_style": rng.choice(CONVERSATION_PREFERENCES),
+        "bio": "Has been through a hard stretch and came out the other side.",
+        "theme_scores": {t: {
+            "emotional_depth": round(rng.random(), 2),
+            "resilience_demonstrated": round(rng.random(), 2),
+            "approach_style": rng.choice(["introvert", "extrovert", "balanced"]),
+            "coping_method": rng.choice(COPING_STYLES),
+            "communication_tone": rng.choice(CONVERSATION_PREFERENCES),
+            "empathy_signal": round(rng.random(), 2),
+            "actionability": round(rng.random(), 2),
+            "self_awareness": round(rng.random(), 2),
+        } for t in themes},
+    }
+
+
+def reply_for(messages):
+    """Content shaped like what the real model returns for api.py's prompt."""
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    last = (messages[-1].get("content") or "") if messages else ""
+    if "risk classifier" in system:
+        return rng.choices(["low", "medium", "high"], weights=[0.8, 0.15, 0.05])[0]
+    if "Extract a structured profile" in system:
+        return json.dumps(_seeker_profile())
+    if "psychometric profiler" in system:
+        return json.dumps(_helper_profile())
+    if "Start with 'Try: '" in last:
+        return rng.choice(SCAFFOLD_REPLIES)
+    return rng.choice(CHAT_REPLIES)
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _error():
+    status = rng.choice([429, 500, 503])
+    return JSONResponse(status_code=status, content={"error": {
+        "message": f"Stub injected error ({status})", "type": "server_error" if status >= 500 else "rate_limit",
+    }})
+
+
+def create_app(latency=STUB_LATENCY, error_rate=STUB_ERROR_RATE, tokens_per_s=STUB_TOKENS_PER_S):
+    app = FastAPI(title="OpenAI stub")
+    app.state.latency = parse_latency(latency)
+    app.state.stats = {"requests": 0, "streams": 0, "errors": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats = app.state.stats
+        stats["requests"] += 1
+        await asyncio.sleep(app.state.latency())
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return _error()
+
+        messages = body.get("messages", [])
+        content = reply_for(messages)
+        if body.get("max_tokens"):
+            content = content[: body["max_tokens"] * 4]
+        prompt_tokens = sum(_tokens(m.get("content") or "") for m in messages)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": _tokens(content),
+                 "total_tokens": prompt_tokens + _tokens(content)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4o")
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        stats["streams"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def events():
+            def chunk(delta, finish=None, usage=None):
+                data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish}]}
+                if usage is not None:
+                    data["usage"] = usage
+                return f"data: {json.dumps(data)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                yield chunk({"content": word if i == 0 else " " + word})
+                await asyncio.sleep(max(1, _tokens(word)) / tokens_per_s)
+            yield chunk({}, finish="stop")
+            if include_usage:
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stub_stats():
+        return app.state.stats
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the local OpenAI-compatible stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default=STUB_LATENCY, help="fixed:ms | uniform:a,b | lognormal:median,sigma")
+    parser.add_argument("--error-rate", type=float, default=STUB_ERROR_RATE)
+    parser.add_argument("--tokens-per-s", type=float, default=STUB_TOKENS_PER_S)
+    args = parser.parse_args()
+
+    parse_latency(args.latency)  # fail fast on a bad spec
+    print(f"✓ OpenAI stub on http://{args.host}:{args.port}/v1 "
+          f"(latency={args.latency}, errors={args.error_rate:.0%}, {args.tokens_per_s:g} tok/s)")
+    uvicorn.run(create_app(args.latency, args.error_rate, args.tokens_per_s),
+                host=args.host, port=args.port, log_level="warning")
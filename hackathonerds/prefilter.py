@@ -0,0 +1,305 @@
+"""
+Hard-constraint prefilter: drop helpers who can't serve this seeker before scoring.
+
+compute_dha_match_score costs tens of microseconds per helper and runs on every
+helper in the pool, including ones who are offline for the next day or whose
+energy would overwhelm a depleted, highly distressed seeker. The prefilter
+packs the fields those constraints need into NumPy columns once, then
+evaluates each constraint over the whole pool as a vector op and hands only
+the survivors to match_seeker_to_helpers.
+
+Filters (MATCH_PREFILTER, comma-separated, applied in order, e.g.
+"available:3,energy:2,reliability:0.75,themes:0.5"):
+  - available:<hours>     free in some hour of [now, now + hours) — answered by
+                          the hour-of-week bitmaps in availability_index.py
+  - energy:<max_gap>      High-distress seekers only: helper energy at most
+                          max_gap levels above the seeker's ("depleted" seeker → no "high" helper)
+  - reliability:<floor>   helper_reliability_score() composite ≥ floor
+  - themes:<min>          themes_experience ≥ min in at least one of the seeker's themes
+
+A filter that would leave fewer than MATCH_PREFILTER_MIN_CANDIDATES helpers is
+skipped for that request ("relaxed") rather than returning an empty match at
+3am. Missing fields pass: no availability_windows means always available, as
+availability_overlap_score treats them as neutral.
+
+Every select() returns a per-filter report (candidates in, kept, relaxed);
+PREFILTER_STATS aggregates them into bridge_match_prefilter_* metrics and the
+totals GET /admin/prefilter serves, so filter order and thresholds can be tuned.
+
+Snapshot-backed pools (helper_store.py) are packed straight from the snapshot
+columns, without decoding a profile per helper. api.py shares its
+AvailabilityIndex with the prefilter (index=); otherwise it builds its own.
+
+Selectivity + timing on a synthetic pool:
+    python prefilter.py --helpers 200000 --filters available:3,energy:2,reliability:0.75,themes:0.5
+"""
+
+import os
+if __name__ == "__main__":
+    os.environ.setdefault("SKIP_SENTENCE_TRANSFORMERS", "1")  # synthetic seekers; no model needed
+
+import logging
+import threading
+
+import numpy as np
+
+from availability_index import AvailabilityIndex
+from helper_store import PRIORS, SCALAR_FIELDS, snapshot_groups
+from local_test_matcher import ENERGY_LEVELS, THEMES
+from metrics import MATCH_PREFILTER_RELAXED, MATCH_PREFILTER_SELECTIVITY
+
+logger = logging.getLogger("bridge.prefilter")
+
+MATCH_PREFILTER = os.getenv("MATCH_PREFILTER", "")
+MATCH_PREFILTER_MIN_CANDIDATES = int(os.getenv("MATCH_PREFILTER_MIN_CANDIDATES", "20"))
+
+FILTER_DEFAULTS = {"available": 3.0, "energy": 2.0, "reliability": 0.75, "themes": 0.5}
+PACKED_FIELDS = ("energy_level", "themes_experience", *SCALAR_FIELDS)
+RELIABILITY_WEIGHTS = {"reliability_score": 0.5, "response_rate": 0.3, "completion_rate": 0.2}
+ENERGY_CODES = {level: i for i, level in enumerate(ENERGY_LEVELS)}
+MODERATE = ENERGY_CODES["moderate"]
+THEME_INDEX = {theme: i for i, theme in enumerate(THEMES)}
+
+
+def parse_filters(spec):
+    """'available:3,energy' → [("available", 3.0), ("energy", 2.0)]; unknown names raise ValueError."""
+    filters = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, arg = item.partition(":")
+        if name not in FILTER_DEFAULTS:
+            raise ValueError(f"Unknown prefilter {name!r} (expected one of {', '.join(FILTER_DEFAULTS)})")
+        filters.append((name, float(arg) if arg else FILTER_DEFAULTS[name]))
+    return filters
+
+
+def compile_filter(name, arg):
+    """
+    Predicate (packed, seeker, now) → boolean mask over the packed pool, or None when
+    the filter doesn't apply to this seeker.
+    """
+    if name == "available":
+        def available(p, seeker, now):
+            return p.index.mask(arg, now)[:p.count]
+        return available
+    if name == "energy":
+        def energy(p, seeker, now):
+            if seeker.get("distress_level") != "High" or seeker.get("energy_level") not in ENERGY_CODES:
+                return None
+            return p.energy[:p.count] <= ENERGY_CODES[seeker["energy_level"]] + arg
+        return energy
+    if name == "reliability":
+        def reliability(p, seeker, now):
+            return p.reliability[:p.count] >= arg
+        return reliability
+    if name == "themes":
+        def themes(p, seeker, now):
+            columns = [THEME_INDEX[t["name"]] for t in seeker.get("themes") or [] if t.get("name") in THEME_INDEX]
+            if not columns:
+                return None
+            return (p.themes[:p.count, columns] >= arg).any(axis=1)
+        return themes
+    raise ValueError(f"Unknown prefilter {name!r}")
+
+
+class PackedHelpers:
+    """
+    Constraint columns aligned with a helper list's positions (kept in sync via upsert);
+    availability lives in the shared AvailabilityIndex.
+    """
+
+    def __init__(self, helpers, index):
+        n = len(helpers)
+        self.index = index
+        self.count = 0
+        self._allocate(n)
+        self.count = n
+        packed_views = np.zeros(n, dtype=bool)
+        for snapshot, (positions, rows) in snapshot_groups(helpers, PACKED_FIELDS).items():
+            c = snapshot.columns
+            self.energy[positions] = c["energy_level"][rows]
+            scalars = c["scalars"][rows]
+            self.reliability[positions] = sum(weight * scalars[:, SCALAR_FIELDS.index(field)]
+                                              for field, weight in RELIABILITY_WEIGHTS.items())
+            self.themes[positions] = c["themes_experience"][rows]
+            packed_views[positions] = True
+        for position in np.flatnonzero(~packed_views).tolist():
+            self._pack(position, helpers[position])
+
+    def _allocate(self, capacity):
+        old = (self.energy, self.reliability, self.themes) if self.count else None
+        self.energy = np.full(capacity, MODERATE, dtype=np.int8)
+        self.reliability = np.zeros(capacity, dtype=np.float32)
+        self.themes = np.zeros((capacity, len(THEMES)), dtype=np.float32)
+        if old is not None:
+            for new, previous in zip((self.energy, self.reliability, self.themes), old):
+                new[:self.count] = previous[:self.count]
+
+    def _pack(self, position, helper):
+        self.energy[position] = ENERGY_CODES.get(helper.get("energy_level"), MODERATE)
+        self.reliability[position] = sum(weight * helper.get(field, PRIORS[field])
+                                         for field, weight in RELIABILITY_WEIGHTS.items())
+        experience = helper.get("themes_experience") or {}
+        self.themes[position] = [experience.get(theme, 0.0) for theme in THEMES]
+
+    def __len__(self):
+        return self.count
+
+    def upsert(self, position, helper):
+        """Re-pack the helper at `position` (position == len() appends)."""
+        if position >= len(self.energy):
+            self._allocate(max(2 * len(self.energy), 1024))
+        self.count = max(self.count, position + 1)
+        self._pack(position, helper)
+
+
+class HelperPrefilter:
+    """Compiled hard-constraint filters over one helper pool."""
+
+    def __init__(self, helpers, spec=MATCH_PREFILTER, min_candidates=MATCH_PREFILTER_MIN_CANDIDATES, index=None):
+        self.spec = spec
+        self.filters = [(f"{name}:{arg:g}", compile_filter(name, arg)) for name, arg in parse_filters(spec)]
+        self.min_candidates = min_candidates
+        self._owns_index = index is None
+        self.packed = PackedHelpers(helpers, index if index is not None else AvailabilityIndex(helpers))
+        self._lock = threading.Lock()  # upserts may regrow the columns under a concurrent select()
+
+    def upsert(self, position, helper):
+        """Re-pack one helper; a shared index is updated by its owner, not here."""
+        with self._lock:
+            self.packed.upsert(position, helper)
+            if self._owns_index:
+                self.packed.index.set(position, helper.get("availability_windows"))
+
+    def select(self, seeker, now=None):
+        """
+        (positions of helpers passing every applied filter, report). Report:
+        {"candidates", "kept", "filters": [{"filter", "in", "kept", "relaxed"}]}, where a
+        relaxed step's "kept" is what it would have kept.
+        """
+        with self._lock:
+            n = self.packed.count
+            keep = np.ones(n, dtype=bool)
+            remaining = n
+            steps = []
+            for label, predicate in self.filters:
+                mask = predicate(self.packed, seeker, now)
+                if mask is None:
+                    continue
+                candidate = keep & mask
+                kept = int(np.count_nonzero(candidate))
+                relaxed = kept < min(self.min_candidates, remaining)
+                steps.append({"filter": label, "in": remaining, "kept": kept, "relaxed": relaxed})
+                if not relaxed:
+                    keep, remaining = candidate, kept
+        return np.flatnonzero(keep), {"candidates": n, "kept": remaining, "filters": steps}
+
+
+def merge_reports(reports):
+    """Sum per-shard prefilter reports into one; "relaxed" becomes the number of shards that relaxed."""
+    reports = [r for r in reports if r is not None]
+    if not reports:
+        return None
+    steps = {}
+    for report in reports:
+        for step in report["filters"]:
+            total = steps.setdefault(step["filter"], {"filter": step["filter"], "in": 0, "kept": 0, "relaxed": 0})
+            total["in"] += step["in"]
+            total["kept"] += step["kept"]
+            total["relaxed"] += step["relaxed"]
+    return {"candidates": sum(r["candidates"] for r in reports), "kept": sum(r["kept"] for r in reports),
+            "filters": list(steps.values())}
+
+
+class PrefilterStats:
+    """Running per-filter totals behind GET /admin/prefilter (plus the Prometheus series)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.candidates = 0
+        self.kept = 0
+        self.filters = {}
+
+    def record(self, report):
+        """Count one select() report (or a merge_reports() of several)."""
+        with self._lock:
+            self.requests += 1
+            self.candidates += report["candidates"]
+            self.kept += report["kept"]
+            for step in report["filters"]:
+                totals = self.filters.setdefault(step["filter"], {"applied": 0, "relaxed": 0, "in": 0, "kept": 0})
+                totals["applied"] += 1
+                totals["relaxed"] += int(step["relaxed"])
+                totals["in"] += step["in"]
+                totals["kept"] += step["kept"]
+                if step["relaxed"]:
+                    MATCH_PREFILTER_RELAXED.labels(step["filter"]).inc(int(step["relaxed"]))
+                if step["in"]:
+                    MATCH_PREFILTER_SELECTIVITY.labels(step["filter"]).observe(step["kept"] / step["in"])
+
+    def status(self):
+        """Per filter: share of its input it passes ("selectivity"); overall: share of the pool scored."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "selectivity": round(self.kept / self.candidates, 4) if self.candidates else None,
+                "filters": {
+                    name: {**totals, "selectivity": round(totals["kept"] / totals["in"], 4) if totals["in"] else None}
+                    for name, totals in self.filters.items()
+                },
+            }
+
+
+PREFILTER_STATS = PrefilterStats()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from local_test_matcher import generate_emotion_embedding, match_seeker_to_helpers
+    from synthetic import PopulationGenerator
+
+    parser = argparse.ArgumentParser(description="Measure prefilter selectivity and its effect on /match latency.")
+    parser.add_argument("--helpers", type=int, default=100_000)
+    parser.add_argument("--seekers", type=int, default=200)
+    parser.add_argument("--filters", default=MATCH_PREFILTER or "available:3,energy:2,reliability:0.75,themes:0.5")
+    parser.add_argument("--score", type=int, default=3, help="seekers to time through match_seeker_to_helpers")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dim = len(generate_emotion_embedding("", use_openai=False))
+    pool = PopulationGenerator(args.seed, dim=dim).helpers(args.helpers).to_dicts()
+    seekers = PopulationGenerator(args.seed + 1, dim=dim).seekers(args.seekers).to_dicts()
+
+    start = time.perf_counter()
+    prefilter = HelperPrefilter(pool, args.filters)
+    print(f"\nPacked {len(pool)} helpers in {time.perf_counter() - start:.2f}s; filters: {args.filters}")
+
+    stats = PrefilterStats()
+    select_s = []
+    for seeker in seekers:
+        t = time.perf_counter()
+        positions, report = prefilter.select(seeker)
+        select_s.append(time.perf_counter() - t)
+        stats.record(report)
+    status = stats.status()
+    print(f"\n{'filter':<18} {'applied':>8} {'relaxed':>8} {'kept':>8}")
+    for name, totals in status["filters"].items():
+        kept = f"{totals['selectivity']:.1%}" if totals["selectivity"] is not None else "-"
+        print(f"{name:<18} {totals['applied']:>8} {totals['relaxed']:>8} {kept:>8}")
+    print(f"{'overall':<18} {status['requests']:>8} {'':>8} {status['selectivity']:>8.1%}")
+    print(f"\nselect(): p50 {np.percentile(select_s, 50) * 1e3:.2f} ms, p95 {np.percentile(select_s, 95) * 1e3:.2f} ms")
+
+    full_s, filtered_s = [], []
+    for seeker in seekers[:args.score]:
+        t = time.perf_counter()
+        match_seeker_to_helpers(seeker, pool)
+        full_s.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        positions, _ = prefilter.select(seeker)
+        match_seeker_to_helpers(seeker, [pool[i] for i in positions.tolist()])
+        filtered_s.append(time.perf_counter() - t)
+    if full_s:
+        print(f"/match scoring: {np.mean(full_s) * 1e3:.0f} ms full pool → {np.mean(filtered_s) * 1e3:.0f} ms "
+              f"prefiltered ({np.mean(full_s) / np.mean(filtered_s):.1f}x) ✓")
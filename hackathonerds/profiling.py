@@ -0,0 +1,230 @@
+"""
+On-demand profiling of a live API worker (used by the /admin/profile/* endpoints).
+
+- sample_cpu(): wall-clock sampling profiler over sys._current_frames(). Every
+  `interval_s` it records the stack of every other thread; the result is in the
+  collapsed-stack format flamegraph.pl / speedscope / inferno read directly:
+
+      MainThread;api.py:match;local_test_matcher.py:match_seeker_to_helpers 42
+
+- memory_diff(): tracemalloc snapshot at start and after N seconds, top
+  allocation sites by growth.
+- embedding_bytes(): bytes held by helper embeddings (ndarray or quantized).
+
+Only one profiling session may run per process at a time (profiling_session()
+raises ProfilerBusy otherwise). Everything runs in the calling thread, so API
+endpoints hand it to a worker thread instead of blocking the event loop.
+
+Offline:
+    python profiling.py cpu --seconds 5      # profiles a synthetic /match loop
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+DEFAULT_INTERVAL_S = 0.005
+
+_session_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profiling session is already running in this process."""
+
+
+@contextmanager
+def profiling_session():
+    """Non-blocking process-wide guard: raises ProfilerBusy instead of queueing."""
+    if not _session_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profiling session is already running")
+    try:
+        yield
+    finally:
+        _session_lock.release()
+
+
+def _clamp_seconds(seconds):
+    return max(0.1, min(float(seconds), MAX_SECONDS))
+
+
+# ── CPU (sampling) ───────────────────────────────────────────────────────────
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def sample_cpu(seconds, interval_s=DEFAULT_INTERVAL_S, include_idle=False):
+    """
+    Sample every thread's stack for `seconds`. Returns (collapsed_text, stats).
+
+    Idle threads (parked in a lock/selector/sleep) are dropped unless
+    include_idle is set, so a pegged worker's hot path dominates the output.
+    """
+    seconds = _clamp_seconds(seconds)
+    me = threading.get_ident()
+    names = {}
+    stacks = Counter()
+    samples = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if len(names) != threading.active_count():
+            names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if not labels:
+                continue
+            if not include_idle and _is_idle(labels[0]):
+                continue
+            labels.append(names.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(labels))] += 1
+        samples += 1
+        time.sleep(interval_s)
+    collapsed = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+    stats = {
+        "seconds": seconds,
+        "interval_ms": interval_s * 1000,
+        "samples": samples,
+        "unique_stacks": len(stacks),
+    }
+    return collapsed + ("\n" if collapsed else ""), stats
+
+
+_IDLE_LEAVES = (
+    "threading.py:wait", "threading.py:_wait_for_tstate_lock", "queue.py:get",
+    "selectors.py:select", "thread.py:_worker", "base_events.py:_run_once",
+)
+
+
+def _is_idle(leaf):
+    return leaf.endswith(":sleep") or leaf in _IDLE_LEAVES
+
+
+# ── Memory (tracemalloc) ─────────────────────────────────────────────────────
+
+def memory_diff(seconds, top=25, key_type="lineno"):
+    """
+    Allocation growth over `seconds`. Starts tracemalloc for the window if it
+    isn't already tracing (allocations from before the window aren't attributed).
+    """
+    seconds = _clamp_seconds(seconds)
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(25)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), key_type)
+    growth = [s for s in stats if s.size_diff > 0][:top]
+    return {
+        "seconds": seconds,
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "top_growth": [
+            {
+                "site": str(s.traceback[0]) if s.traceback else "?",
+                "size_diff_bytes": s.size_diff,
+                "size_bytes": s.size,
+                "count_diff": s.count_diff,
+                "count": s.count,
+            }
+            for s in growth
+        ],
+    }
+
+
+# ── Object inventories ───────────────────────────────────────────────────────
+
+def embedding_bytes(helpers):
+    """Bytes held by helper emotion embeddings (shared quantized stores counted once)."""
+    total = 0
+    stores = set()
+    for helper in helpers:
+        emb = helper.get("emotion_embedding")
+        if isinstance(emb, np.ndarray):
+            total += emb.nbytes
+        elif hasattr(emb, "store"):  # QuantizedEmbedding: codes live in one shared store
+            if id(emb.store) not in stores:
+                stores.add(id(emb.store))
+                total += emb.store.nbytes()
+    return total
+
+
+def deep_sizeof(obj, limit=200000):
+    """Approximate recursive size of containers (numpy arrays counted by nbytes)."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < limit:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            total += item.nbytes
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile a synthetic /match workload in-process.")
+    parser.add_argument("command", choices=["cpu", "memory"])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--helpers", type=int, default=200)
+    parser.add_argument("--out", help="Write collapsed stacks here (cpu)")
+    args = parser.parse_args()
+
+    from local_test_matcher import generate_helper, generate_seeker, match_seeker_to_helpers
+
+    helpers = [generate_helper() for _ in range(args.helpers)]
+    stop = threading.Event()
+
+    def workload():
+        while not stop.is_set():
+            match_seeker_to_helpers(generate_seeker(), helpers, top_k=5)
+
+    worker = threading.Thread(target=workload, name="match-workload", daemon=True)
+    worker.start()
+    try:
+        if args.command == "cpu":
+            collapsed, stats = sample_cpu(args.seconds)
+            if args.out:
+                with open(args.out, "w") as f:
+                    f.write(collapsed)
+                print(f"✓ {stats['samples']} samples, {stats['unique_stacks']} stacks → {args.out}")
+            else:
+                print(collapsed)
+        else:
+            report = memory_diff(args.seconds)
+            print(f"Traced: {report['traced_current_bytes'] / 1e6:.1f} MB (peak {report['traced_peak_bytes'] / 1e6:.1f} MB)")
+            for row in report["top_growth"]:
+                print(f"{row['size_diff_bytes']:>+12,d} B {row['count_diff']:>+8d}  {row['site']}")
+        print(f"Helper embeddings: {embedding_bytes(helpers):,d} B for {len(helpers)} helpers")
+    finally:
+        stop.set()
@@ -0,0 +1,294 @@
+"""
+Prompt templates + token budgets for the GPT-4o calls in api.py.
+
+- System prompts that interpolate THEMES / COPING_STYLES / CONVERSATION_PREFERENCES
+  are rendered ONCE at import instead of being rebuilt as f-strings per request.
+- Every endpoint has an input-token budget. Chat histories are fitted newest-first;
+  older turns that don't fit are folded into a short extractive summary note, and
+  single oversized messages / transcripts are clipped head+tail — except the
+  safety check, which splits long transcripts (split_text) and classifies
+  every chunk rather than lose the middle of a vent.
+- record_usage() writes one accounting line per upstream call (tokens + est. cost),
+  optionally also appended to a JSONL file (TOKEN_LOG_PATH), and feeds the LLM
+  latency/token histograms exposed on /metrics.
+
+Token counting uses tiktoken when installed, else a ~4 chars/token estimate.
+"""
+
+import os
+import json
+import logging
+import re
+import time
+from typing import Optional
+
+from local_test_matcher import THEMES, COPING_STYLES, CONVERSATION_PREFERENCES
+from metrics import LLM_LATENCY, LLM_TOKENS
+
+logger = logging.getLogger("bridge.prompts")
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")  # gpt-4o tokenizer
+    TOKENIZER = "tiktoken"
+except Exception:
+    _ENCODING = None
+    TOKENIZER = "estimate"
+
+# Per-message overhead the chat format adds (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# ── Budgets (input tokens per upstream call; override with PROMPT_BUDGET_<NAME>) ──
+
+ENDPOINT_BUDGETS = {
+    "seeker_chat": 1500,
+    "scaffold": 1200,
+    "extract_seeker": 3000,
+    "extract_helper": 4000,
+    "safety_check": 2000,
+}
+
+# No single chat message may take more than this share of a history budget
+MAX_MESSAGE_SHARE = 0.4
+# Tokens reserved for the "earlier in the conversation" summary note
+SUMMARY_BUDGET_TOKENS = 150
+# Tokens neighbouring split_text chunks share, so a sentence cut at a boundary is read whole once
+SPLIT_OVERLAP_TOKENS = 50
+
+# USD per 1M tokens (input, output)
+MODEL_PRICING = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+TOKEN_LOG_PATH = os.getenv("TOKEN_LOG_PATH")
+
+
+def budget_for(endpoint: str) -> int:
+    """Input-token budget for an endpoint (env PROMPT_BUDGET_<ENDPOINT> wins)."""
+    override = os.getenv(f"PROMPT_BUDGET_{endpoint.upper()}")
+    if override:
+        try:
+            return int(override)
+        except ValueError:
+            logger.error("Ignoring invalid PROMPT_BUDGET_%s=%r", endpoint.upper(), override)
+    return ENDPOINT_BUDGETS[endpoint]
+
+
+# ── Templates (rendered once at startup) ─────────────────────────────────────
+
+SEEKER_CHAT_SYSTEM_PROMPT = (
+    "You are a warm, empathetic mental-health onboarding assistant called Bridge. "
+    "Your goal is to gently understand the user's situation in 3-4 exchanges, "
+    "then say you'll find them someone who understands. Keep replies short (2-3 sentences)."
+)
+
+SCAFFOLD_INSTRUCTION = (
+    "Based on the conversation so far, suggest ONE short, warm response the helper could say. "
+    "Start with 'Try: '"
+)
+
+SAFETY_SYSTEM_PROMPT = (
+    "You are a mental health risk classifier. Assess the following text for self-harm, "
+    "suicidal ideation, or crisis indicators. Respond with ONLY one word: low, medium, or high."
+)
+
+EXTRACT_SEEKER_SYSTEM_PROMPT = f"""Extract a structured profile from this vent/narrative. Return ONLY valid JSON with:
+- themes: list of {{"name": "<one of {THEMES}>", "intensity": 0.0-1.0}}
+- coping_style_preference: {{"problem_focused": 0-1, "emotion_focused": 0-1, "social_support": 0-1, "avoidant": 0-1, "meaning_making": 0-1}}
+- conversation_preference: {{"direct_advice": 0-1, "reflective_listening": 0-1, "collaborative_problem_solving": 0-1, "validation_focused": 0-1}}
+- energy_level: one of ["depleted", "low", "moderate", "high"]
+- distress_level: one of ["Low", "Medium", "High"]
+- urgency: 0-1 float"""
+
+EXTRACT_HELPER_SYSTEM_PROMPT = f"""You are an expert psychometric profiler for a peer-support matching platform.
+Analyze the helper's per-theme narratives and score them on MIRRORED METRICS that match how seekers are scored.
+This enables accurate helper↔seeker cosine-similarity matching.
+
+Return ONLY valid JSON with this structure:
+{{
+  "themes": [{{"name": "<one of {THEMES}>", "intensity": 0.0-1.0}}],
+  "coping_style": "<one of {list(COPING_STYLES)}>",
+  "communication_style": "<one of {list(CONVERSATION_PREFERENCES)}>",
+  "bio": "1-2 sentence bio summarizing their experience",
+  "theme_scores": {{
+    "<theme_name>": {{
+      "emotional_depth": 0.0-1.0,
+      "resilience_demonstrated": 0.0-1.0,
+      "approach_style": "introvert|extrovert|balanced",
+      "coping_method": "<one of {list(COPING_STYLES)}>",
+      "communication_tone": "<one of {list(CONVERSATION_PREFERENCES)}>",
+      "empathy_signal": 0.0-1.0,
+      "actionability": 0.0-1.0,
+      "self_awareness": 0.0-1.0
+    }}
+  }}
+}}
+
+Scoring guide:
+- emotional_depth: How deeply did they engage with the emotional reality? (0=surface, 1=profound)
+- resilience_demonstrated: How much growth/recovery is evident? (0=still struggling, 1=fully processed)
+- approach_style: Introvert=internal reflection, Extrovert=social coping, Balanced=both
+- coping_method: What strategy did they primarily use?
+- communication_tone: How do they naturally communicate about difficult topics?
+- empathy_signal: How well do they demonstrate understanding of others in similar situations?
+- actionability: How practical/actionable is their experience? (0=abstract, 1=concrete steps)
+- self_awareness: How self-aware are they about the experience? (0=unexamined, 1=deeply reflected)"""
+
+
+# ── Token counting ───────────────────────────────────────────────────────────
+
+def count_tokens(text: str) -> int:
+    """Token count for a string (tiktoken if available, else ~4 chars/token)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: list) -> int:
+    """Token count for a chat message list, including per-message overhead."""
+    return sum(count_tokens(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def clip_text(text: str, max_tokens: int, keep_tail: bool = True) -> str:
+    """
+    Clip text to roughly max_tokens.
+
+    keep_tail=True keeps the head AND tail (the end of a vent is often where the
+    important part is); keep_tail=False keeps only the head.
+    """
+    if not text or count_tokens(text) <= max_tokens:
+        return text
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text)
+        if not keep_tail:
+            return _ENCODING.decode(tokens[:max_tokens]) + " …"
+        half = max_tokens // 2
+        return _ENCODING.decode(tokens[:half]) + " … " + _ENCODING.decode(tokens[-half:])
+    max_chars = max_tokens * 4
+    if not keep_tail:
+        return text[:max_chars] + " …"
+    half = max_chars // 2
+    return text[:half] + " … " + text[-half:]
+
+
+def split_text(text: str, max_tokens: int, overlap: int = SPLIT_OVERLAP_TOKENS) -> list:
+    """
+    Split text into consecutive chunks of roughly max_tokens that together cover
+    all of it (for calls that must not lose the middle, like the safety check).
+    """
+    if not text or count_tokens(text) <= max_tokens:
+        return [text]
+    overlap = min(overlap, max_tokens // 4)
+    step = max_tokens - overlap
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text)
+        return [_ENCODING.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens) - overlap, step)]
+    max_chars, step_chars = max_tokens * 4, step * 4
+    return [text[i:i + max_chars] for i in range(0, len(text) - overlap * 4, step_chars)]
+
+
+# ── History fitting ──────────────────────────────────────────────────────────
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def _first_sentence(text: str, max_chars: int = 160) -> str:
+    sentence = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "…"
+
+
+def _summarize_dropped(dropped: list, max_tokens: int) -> Optional[dict]:
+    """
+    Extractive summary of turns that fell out of the budget: the first sentence of
+    each earlier user message. No extra LLM round-trip, so it adds no latency.
+    """
+    points = [_first_sentence(m.get("content") or "") for m in dropped if m.get("role") == "user"]
+    points = list(dict.fromkeys(p for p in points if p))
+    if not points:
+        return None
+    note = "Earlier in the conversation the user said: " + " / ".join(points)
+    return {"role": "system", "content": clip_text(note, max_tokens, keep_tail=False)}
+
+
+def fit_history(messages: list, budget: int, summarize: bool = True) -> list:
+    """
+    Fit a chat history into `budget` tokens, newest turns first.
+
+    Oversized single messages are clipped to MAX_MESSAGE_SHARE of the budget.
+    Turns that don't fit are dropped from the front and (optionally) replaced by a
+    one-line summary note so the model keeps the gist of the early conversation.
+    """
+    per_message_cap = max(32, int(budget * MAX_MESSAGE_SHARE))
+    summary_budget = SUMMARY_BUDGET_TOKENS if summarize else 0
+    available = budget - summary_budget
+
+    kept = []
+    used = 0
+    cut = 0
+    for idx in range(len(messages) - 1, -1, -1):
+        msg = messages[idx]
+        content = msg.get("content") or ""
+        if count_tokens(content) > per_message_cap:
+            msg = {**msg, "content": clip_text(content, per_message_cap)}
+        cost = count_tokens(msg.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > available:
+            cut = idx + 1
+            break
+        kept.append(msg)
+        used += cost
+    kept.reverse()
+
+    if cut and summarize:
+        summary = _summarize_dropped(messages[:cut], summary_budget)
+        if summary:
+            kept.insert(0, summary)
+    if cut:
+        logger.info("History fitted to budget (kept=%d, dropped=%d, budget=%d)",
+                    len(messages) - cut, cut, budget)
+    return kept
+
+
+# ── Per-request accounting ───────────────────────────────────────────────────
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of one call (0.0 for models without a price entry)."""
+    price_in, price_out = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+def record_usage(endpoint: str, model: str, usage, latency_s: float, prompt_estimate: int = None) -> dict:
+    """
+    Log token usage + estimated cost for one upstream call.
+
+    `usage` is the OpenAI `usage` object (or None when the upstream didn't return
+    one, in which case the local prompt estimate is logged instead).
+    """
+    prompt_tokens = getattr(usage, "prompt_tokens", None) if usage is not None else None
+    completion_tokens = getattr(usage, "completion_tokens", None) if usage is not None else None
+    entry = {
+        "ts": time.time(),
+        "endpoint": endpoint,
+        "model": model,
+        "prompt_tokens": prompt_tokens if prompt_tokens is not None else prompt_estimate,
+        "completion_tokens": completion_tokens or 0,
+        "estimated": prompt_tokens is None,
+        "latency_ms": round(latency_s * 1000, 1),
+    }
+    entry["cost_usd"] = round(estimate_cost(model, entry["prompt_tokens"] or 0, entry["completion_tokens"]), 6)
+    LLM_LATENCY.labels(endpoint).observe(latency_s)
+    if entry["prompt_tokens"] is not None:
+        LLM_TOKENS.labels(endpoint, "prompt").observe(entry["prompt_tokens"])
+    LLM_TOKENS.labels(endpoint, "completion").observe(entry["completion_tokens"])
+    logger.info("LLM usage %s (prompt=%s, completion=%s, cost=$%.5f, %.0fms)",
+                endpoint, entry["prompt_tokens"], entry["completion_tokens"],
+                entry["cost_usd"], entry["latency_ms"])
+    if TOKEN_LOG_PATH:
+        try:
+            with open(TOKEN_LOG_PATH, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            logger.error("Could not append to TOKEN_LOG_PATH=%s", TOKEN_LOG_PATH, exc_info=True)
+    return entry
@@ -0,0 +1,210 @@
+"""
+Offline replay evaluator: re-rank logged /match traffic under several scorers.
+
+Inputs
+  - MATCH_LOG_DIR (see match_log.py): every logged /match request — the seeker
+    profile, a snapshot of the candidate pool, and the match_ids that were served.
+  - feedback_data.pkl (FeedbackStore): outcomes posted to /feedback, joined to
+    the served matches by match_id. Graded relevance is the same composite the
+    LearnedMatcher is trained on: 0.5·rating + 0.3·length + 0.2·follow_up.
+
+Each scorer (see scorers.py for the spec syntax) re-scores the full candidate
+pool of every request that has at least one outcome. Work is split into
+(scorer, chunk) jobs on a process pool, so scorers run in parallel and
+none of them hold the GIL for the others.
+
+Reported per scorer
+  ndcg@k      graded NDCG of the re-ranked pool (helpers without an outcome gain 0)
+  hit@k       share of requests with a positive outcome (quality ≥ --positive) in the top k
+  pairs/s     (seeker, helper) pairs scored per second of worker time
+  p50/p95 ms  per-request scoring latency for the whole pool
+
+Caveat: outcomes only exist for helpers the live scorer actually served, so
+the metrics reward agreeing with the logging policy. Use them to compare
+scorers relative to each other, not as absolute quality.
+
+Usage:
+    python replay.py rules learned demo_v3
+    python replay.py rules "rules:emotional_similarity=0.5,experience_overlap=0.1" --k 5
+    python replay.py learned:v20250301T101500-1a2b3c4d learned --log-dir match_logs --workers 4
+"""
+
+import os
+
+# Workers only re-score stored embeddings — don't load the sentence model in each of them
+os.environ.setdefault("SKIP_SENTENCE_TRANSFORMERS", "1")
+
+import logging
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from feedback_buffer import read_feedback_log
+from match_log import MATCH_LOG_DIR, load_pool, read_log, request_pool
+
+logger = logging.getLogger("bridge.replay")
+
+REPLAY_K = 5
+POSITIVE_QUALITY = 2.0  # ≈ a 4/5 rating with average engagement
+CHUNK_SIZE = 50
+
+
+def outcome_quality(outcome):
+    """Composite quality label, identical to FeedbackStore.get_training_data()."""
+    return (
+        0.5 * outcome["user_rating"] +
+        0.3 * outcome["conversation_length"] +
+        0.2 * outcome["follow_up_likelihood"]
+    )
+
+
+def load_outcomes(feedback_path):
+    """match_id → quality for every stored outcome that carries a match_id."""
+    entries, _ = read_feedback_log(feedback_path)
+    return {e["match_id"]: outcome_quality(e["outcome"]) for e in entries if e.get("match_id")}
+
+
+def load_requests(log_dir, outcomes):
+    """Logged requests with at least one outcome, each with labels = {helper_id: quality}."""
+    requests = []
+    total = 0
+    for record in read_log(log_dir):
+        total += 1
+        labels = {r["helper_id"]: outcomes[r["match_id"]] for r in record["results"] if r["match_id"] in outcomes}
+        if labels:
+            requests.append({"seeker": record["seeker"], "pool_id": record["pool_id"],
+                             "pool_version": record.get("pool_version"), "positions": record.get("positions"),
+                             "labels": labels})
+    return requests, total
+
+
+def dcg(gains):
+    return sum(g / math.log2(i + 2) for i, g in enumerate(gains))
+
+
+def rank_metrics(scores, helper_ids, labels, k, positive):
+    """(ndcg@k, hit@k) for one request's pool scores."""
+    top = np.argsort(-scores, kind="stable")[:k]
+    gains = [labels.get(helper_ids[i], 0.0) for i in top]
+    ideal = dcg(sorted(labels.values(), reverse=True)[:k])
+    ndcg = dcg(gains) / ideal if ideal > 0 else 0.0
+    hit = any(g >= positive for g in gains)
+    return ndcg, hit
+
+
+# ── Worker side ──
+
+_scorers = {}
+_pools = {}
+
+
+def _score_chunk(spec, log_dir, requests, k, positive):
+    """Score one chunk of requests with one scorer (runs in a worker process)."""
+    from scorers import build_scorer
+
+    if spec not in _scorers:
+        _scorers[spec] = build_scorer(spec)
+    scorer = _scorers[spec]
+    rows = []
+    for req in requests:
+        key = (req["pool_id"], req["pool_version"])
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = load_pool(log_dir, *key)
+        pool = request_pool(req, pool)
+        start = time.perf_counter()
+        scores = np.asarray(scorer.score_pool(req["seeker"], pool), dtype=float)
+        elapsed = time.perf_counter() - start
+        ndcg, hit = rank_metrics(scores, [h["user_id"] for h in pool], req["labels"], k, positive)
+        rows.append((ndcg, hit, len(pool), elapsed))
+    return spec, rows
+
+
+# ── Driver ──
+
+def replay(specs, log_dir=MATCH_LOG_DIR, feedback_path="feedback_data.pkl", k=REPLAY_K,
+           positive=POSITIVE_QUALITY, workers=None, chunk_size=CHUNK_SIZE):
+    """Re-score logged requests under each scorer spec. Returns {spec: summary dict}."""
+    from scorers import build_scorer
+
+    for spec in specs:
+        build_scorer(spec)  # fail fast on a bad spec / missing model, before spawning workers
+    outcomes = load_outcomes(feedback_path)
+    requests, total = load_requests(log_dir, outcomes)
+    logger.info("Replaying %d/%d logged requests with outcomes (%d outcomes) under %d scorers",
+                len(requests), total, len(outcomes), len(specs))
+
+    results = {spec: [] for spec in specs}
+    wall = time.perf_counter()
+    if requests:
+        chunks = [requests[i:i + chunk_size] for i in range(0, len(requests), chunk_size)]
+        workers = workers or min(os.cpu_count() or 1, len(specs) * len(chunks))
+        # spawn: LightGBM's OpenMP runtime doesn't survive fork reliably
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_score_chunk, spec, log_dir, chunk, k, positive)
+                for spec in specs for chunk in chunks
+            ]
+            for future in as_completed(futures):
+                spec, rows = future.result()
+                results[spec].extend(rows)
+    wall = time.perf_counter() - wall
+
+    summary = {}
+    for spec, rows in results.items():
+        if not rows:
+            summary[spec] = {"requests": 0}
+            continue
+        ndcg, hit, pairs, seconds = (np.array(col, dtype=float) for col in zip(*rows))
+        summary[spec] = {
+            "requests": len(rows),
+            f"ndcg@{k}": round(float(ndcg.mean()), 4),
+            f"hit@{k}": round(float(hit.mean()), 4),
+            "pairs_per_s": round(float(pairs.sum() / seconds.sum())) if seconds.sum() else None,
+            "p50_ms": round(float(np.percentile(seconds, 50)) * 1000, 2),
+            "p95_ms": round(float(np.percentile(seconds, 95)) * 1000, 2),
+        }
+    summary["_meta"] = {"logged": total, "with_outcomes": len(requests), "outcomes": len(outcomes),
+                        "wall_s": round(wall, 2)}
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Replay logged /match traffic under several scorers.")
+    parser.add_argument("scorers", nargs="+", help="scorer specs, e.g. rules learned demo_v3")
+    parser.add_argument("--log-dir", default=MATCH_LOG_DIR or "match_logs")
+    parser.add_argument("--feedback", default="feedback_data.pkl")
+    parser.add_argument("--k", type=int, default=REPLAY_K)
+    parser.add_argument("--positive", type=float, default=POSITIVE_QUALITY,
+                        help="quality at or above which an outcome counts as a hit")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    if not os.path.isdir(args.log_dir):
+        print(f"❌ No match log at {args.log_dir} (run the API with MATCH_LOG_DIR set)")
+        sys.exit(1)
+    try:
+        summary = replay(args.scorers, args.log_dir, args.feedback, args.k, args.positive, args.workers)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    meta = summary.pop("_meta")
+    print(f"\n{meta['with_outcomes']}/{meta['logged']} logged requests have outcomes "
+          f"({meta['outcomes']} outcomes), wall {meta['wall_s']}s\n")
+    width = max(len(s) for s in summary) + 2
+    print(f"{'scorer':<{width}} {'requests':>8} {f'ndcg@{args.k}':>8} {f'hit@{args.k}':>7} "
+          f"{'pairs/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for spec, row in summary.items():
+        if not row["requests"]:
+            print(f"{spec:<{width}} {0:>8}  ⚠️  nothing to score")
+            continue
+        print(f"{spec:<{width}} {row['requests']:>8} {row[f'ndcg@{args.k}']:>8.4f} {row[f'hit@{args.k}']:>7.3f} "
+              f"{row['pairs_per_s'] or 0:>10,} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}")
@@ -0,0 +1,228 @@
+"""
+Tiered safety classifier for /safety-check.
+
+Tier 1 is a local logistic head over the all-MiniLM-L6-v2 embedding that
+generate_emotion_embedding() already produces (two sigmoid outputs: P(risk) =
+P(label != low) and P(high)). It answers clear-cut cases on CPU in well under a
+millisecond. Anything in between escalates to tier 2, the GPT-4o classifier.
+
+    p_risk <= SAFETY_LOCAL_LOW_MAX          → "low"      (local)
+    p_high >= SAFETY_LOCAL_HIGH_MIN         → "high"     (local)
+    otherwise                               → escalate   (GPT-4o)
+
+The head lives in safety_head.npz (override with SAFETY_HEAD_PATH). Without a
+head file, or when embeddings are synthetic, every request escalates — i.e. the
+endpoint behaves exactly as before.
+
+Offline:
+    python safety_classifier.py train labels.jsonl     # {"text": ..., "label": "low|medium|high"}
+    python safety_classifier.py eval labels.jsonl      # escalation rate + agreement with GPT labels
+
+Labels can be collected from live traffic with SAFETY_LABEL_LOG=<path> on the
+API, which appends the GPT-4o verdict for every escalated transcript.
+"""
+
+import os
+import sys
+import json
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger("bridge.safety")
+
+RISK_LEVELS = ("low", "medium", "high")
+
+DEFAULT_HEAD_PATH = os.getenv("SAFETY_HEAD_PATH", "safety_head.npz")
+# Calibration thresholds (see `eval` for how they trade escalation vs agreement)
+DEFAULT_LOW_MAX = float(os.getenv("SAFETY_LOCAL_LOW_MAX", "0.05"))
+DEFAULT_HIGH_MIN = float(os.getenv("SAFETY_LOCAL_HIGH_MIN", "0.95"))
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class SafetyClassifier:
+    """Local logistic head that decides clear-cut cases and escalates the rest."""
+
+    def __init__(self, head_path=DEFAULT_HEAD_PATH, low_max=DEFAULT_LOW_MAX, high_min=DEFAULT_HIGH_MIN):
+        self.head_path = head_path
+        self.low_max = low_max
+        self.high_min = high_min
+        self.weights = None  # (2, dim): row 0 = risk head, row 1 = high head
+        self.bias = None     # (2,)
+        self.load()
+
+    @property
+    def is_ready(self):
+        return self.weights is not None
+
+    def load(self):
+        """Load the head from disk (missing/invalid file → escalate everything)."""
+        if not os.path.exists(self.head_path):
+            return
+        try:
+            with np.load(self.head_path) as head:
+                self.weights = head["weights"].astype(np.float32)
+                self.bias = head["bias"].astype(np.float32)
+            logger.info("Safety head loaded (%s, dim=%d, low_max=%.2f, high_min=%.2f)",
+                        self.head_path, self.weights.shape[1], self.low_max, self.high_min)
+        except Exception:
+            logger.error("Could not load safety head from %s; escalating all cases", self.head_path, exc_info=True)
+            self.weights = None
+            self.bias = None
+
+    def save(self):
+        np.savez(self.head_path, weights=self.weights, bias=self.bias)
+
+    def probabilities(self, embedding):
+        """(p_risk, p_high) for one embedding, or None if the head can't score it."""
+        if not self.is_ready or embedding is None:
+            return None
+        vec = np.asarray(embedding, dtype=np.float32)
+        if vec.shape[-1] != self.weights.shape[1]:
+            return None  # synthetic / different-model embedding
+        p_risk, p_high = _sigmoid(self.weights @ vec + self.bias)
+        return float(p_risk), float(p_high)
+
+    def classify(self, embedding):
+        """
+        Tier-1 decision for one embedding.
+
+        Returns dict with risk_level ("low" | "high" | None when escalating),
+        p_risk, p_high and tier ("local" | "escalate").
+        """
+        probs = self.probabilities(embedding)
+        if probs is None:
+            return {"risk_level": None, "p_risk": None, "p_high": None, "tier": "escalate"}
+        p_risk, p_high = probs
+        level = None
+        if p_high >= self.high_min:
+            level = "high"
+        elif p_risk <= self.low_max:
+            level = "low"
+        return {
+            "risk_level": level,
+            "p_risk": round(p_risk, 4),
+            "p_high": round(p_high, 4),
+            "tier": "local" if level else "escalate",
+        }
+
+    @staticmethod
+    def best_guess(decision):
+        """Local-only verdict for an uncertain case (used when GPT-4o is unavailable)."""
+        if decision.get("p_risk") is None:
+            return "low"
+        if decision["p_high"] >= 0.5:
+            return "high"
+        return "medium" if decision["p_risk"] >= 0.5 else "low"
+
+    def train(self, X, labels, verbose=True):
+        """Fit both logistic heads on (n, dim) embeddings + low/medium/high labels."""
+        from sklearn.linear_model import LogisticRegression
+
+        labels = np.asarray(labels)
+        targets = [labels != "low", labels == "high"]
+        weights, bias = [], []
+        for y in targets:
+            if y.all() or not y.any():
+                raise ValueError("Need both positive and negative examples for each head")
+            clf = LogisticRegression(C=1.0, class_weight="balanced", max_iter=1000)
+            clf.fit(X, y.astype(int))
+            weights.append(clf.coef_[0])
+            bias.append(clf.intercept_[0])
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.save()
+        if verbose:
+            print(f"✓ Safety head trained on {len(labels)} samples → {self.head_path}")
+
+
+# ── Offline evaluation harness ───────────────────────────────────────────────
+
+def evaluate(classifier, X, gpt_labels, thresholds=None):
+    """
+    Replay labeled embeddings through tier 1 for each (low_max, high_min) pair.
+
+    Reports escalation rate, agreement with the GPT label on locally-decided
+    cases, end-to-end agreement (escalated cases take the GPT label), the number
+    of GPT "high" cases tier 1 would have called "low" (the error that matters),
+    and mean local latency.
+    """
+    thresholds = thresholds or [(classifier.low_max, classifier.high_min)]
+    gpt_labels = list(gpt_labels)
+    rows = []
+    for low_max, high_min in thresholds:
+        classifier.low_max, classifier.high_min = low_max, high_min
+        local = agree = missed_high = 0
+        start = time.perf_counter()
+        decisions = [classifier.classify(x) for x in X]
+        elapsed = time.perf_counter() - start
+        for decision, label in zip(decisions, gpt_labels):
+            if decision["tier"] != "local":
+                continue
+            local += 1
+            agree += decision["risk_level"] == label
+            missed_high += decision["risk_level"] == "low" and label == "high"
+        n = len(gpt_labels)
+        rows.append({
+            "low_max": low_max,
+            "high_min": high_min,
+            "escalation_rate": round(1 - local / n, 4) if n else 0.0,
+            "local_agreement": round(agree / local, 4) if local else None,
+            "overall_agreement": round((agree + (n - local)) / n, 4) if n else None,
+            "missed_high": missed_high,
+            "local_us_per_item": round(elapsed / max(n, 1) * 1e6, 1),
+        })
+    return rows
+
+
+def _load_labeled(path):
+    texts, labels = [], []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            label = str(row.get("gpt_label") or row.get("label") or "").strip().lower()
+            if label in RISK_LEVELS and row.get("text"):
+                texts.append(row["text"])
+                labels.append(label)
+    return texts, labels
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train / evaluate the local safety classifier tier.")
+    parser.add_argument("command", choices=["train", "eval"])
+    parser.add_argument("labels", help="JSONL with {text, label|gpt_label}")
+    parser.add_argument("--head", default=DEFAULT_HEAD_PATH)
+    args = parser.parse_args()
+
+    from local_test_matcher import generate_emotion_embedding, EMBEDDING_MODE
+    if EMBEDDING_MODE != "sentence_transformers":
+        print("❌ The safety head needs real sentence-transformer embeddings (EMBEDDING_MODE=%s)" % EMBEDDING_MODE)
+        sys.exit(1)
+
+    texts, labels = _load_labeled(args.labels)
+    print(f"Loaded {len(texts)} labeled transcripts ({ {l: labels.count(l) for l in RISK_LEVELS} })")
+    X = np.stack([generate_emotion_embedding(t, use_openai=False) for t in texts])
+
+    classifier = SafetyClassifier(head_path=args.head)
+    if args.command == "train":
+        classifier.train(X, labels)
+    else:
+        if not classifier.is_ready:
+            print(f"❌ No safety head at {args.head}; run `train` first")
+            sys.exit(1)
+        grid = [(lo, hi) for lo in (0.02, 0.05, 0.10, 0.20) for hi in (0.80, 0.90, 0.95, 0.99)]
+        print(f"\n{'low_max':>8} {'high_min':>9} {'escalate':>9} {'local_agree':>12} "
+              f"{'overall':>8} {'missed_high':>12} {'µs/item':>8}")
+        for row in evaluate(classifier, X, labels, grid):
+            local_agree = "-" if row["local_agreement"] is None else f"{row['local_agreement']:.3f}"
+            print(f"{row['low_max']:>8.2f} {row['high_min']:>9.2f} {row['escalation_rate']:>9.3f} "
+                  f"{local_agree:>12} {row['overall_agreement']:>8.3f} "
+                  f"{row['missed_high']:>12d} {row['local_us_per_item']:>8.1f}")
@@ -0,0 +1,167 @@
+"""
+Named scorer configurations for offline comparison (see replay.py).
+
+A scorer spec is a string, so configurations can be passed on the command
+line and shipped to worker processes:
+
+    rules                                   WEIGHTS formula + bonuses (compute_dha_match_score, use_learned=False)
+    rules:emotional_similarity=0.5,experience_overlap=0.1
+                                            same features, overridden WEIGHTS entries
+    learned                                 active LearnedMatcher version from the model registry
+    learned:v20250301T101500-1a2b3c4d       a specific registry version
+    learned:path/to/model.txt               a LightGBM model file
+    demo_v3                                 the v3 formula from demo_sentence_transformers.py
+
+Every scorer exposes score_pool(seeker, helpers) → np.ndarray of scores, one
+per helper, in pool order.
+
+demo_sentence_transformers.py loads a SentenceTransformer and prints at import
+time, so its formula is reproduced here (demo_v3_score) against the profile
+shape the API uses: helper themes are the ones with themes_experience ≥
+DEMO_THEME_MIN, coping style is the strongest entry of the preference /
+expertise dict, availability is the fraction of open weekly slots.
+"""
+
+import os
+
+import numpy as np
+
+import local_test_matcher as ltm
+
+DEMO_THEME_MIN = 0.6
+
+# LearnedMatcher feature order (FeedbackStore.get_training_data)
+FEATURE_ORDER = [
+    "emotional_similarity",
+    "experience_overlap",
+    "coping_style_match",
+    "availability_overlap",
+    "reliability_score",
+    "conversation_bonus",
+    "energy_bonus",
+]
+
+# WEIGHTS key → breakdown feature it multiplies
+_WEIGHT_FEATURES = {
+    "emotional_similarity": "emotional_similarity",
+    "experience_overlap": "experience_overlap",
+    "coping_style_match": "coping_style_match",
+    "availability_overlap": "availability_overlap",
+    "helper_reliability_score": "reliability_score",
+}
+_BONUSES = ["conversation_bonus", "energy_bonus", "narrative_match_bonus"]
+
+
+def _breakdowns(seeker, helpers):
+    return [ltm.compute_dha_match_score(seeker, helper, use_learned=False)[1] for helper in helpers]
+
+
+class RulesScorer:
+    """Rule-based WEIGHTS formula, optionally with some weights overridden."""
+
+    def __init__(self, overrides=None):
+        unknown = set(overrides or {}) - set(ltm.WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown weight(s) {sorted(unknown)}; expected one of {sorted(ltm.WEIGHTS)}")
+        self.weights = {**ltm.WEIGHTS, **(overrides or {})}
+
+    def score_pool(self, seeker, helpers):
+        scores = np.empty(len(helpers))
+        for i, features in enumerate(_breakdowns(seeker, helpers)):
+            core = sum(w * features[_WEIGHT_FEATURES[k]] for k, w in self.weights.items())
+            scores[i] = core + sum(features[b] for b in _BONUSES)
+        return scores
+
+
+class LearnedScorer:
+    """LightGBM booster over the rule breakdown, predicted for the whole pool in one call."""
+
+    def __init__(self, target=None):
+        import lightgbm as lgb
+        from model_registry import MODEL_REGISTRY_DIR, ModelRegistry
+
+        if target and os.path.isfile(target):
+            self.version = os.path.basename(target)
+            self.booster = lgb.Booster(model_file=target)
+        else:
+            registry = ModelRegistry(MODEL_REGISTRY_DIR)
+            if target or registry.active_version():
+                self.version, self.booster = registry.load_booster(target)
+            elif os.path.exists(ltm.learned_matcher.model_path):
+                self.version = ltm.learned_matcher.model_path
+                self.booster = lgb.Booster(model_file=ltm.learned_matcher.model_path)
+            else:
+                raise ValueError("No learned model: empty registry and no matcher_model.txt")
+
+    def score_pool(self, seeker, helpers):
+        X = np.array([[f[name] for name in FEATURE_ORDER] for f in _breakdowns(seeker, helpers)])
+        return self.booster.predict(X) if len(X) else np.empty(0)
+
+
+def _strongest(weights):
+    return max(weights, key=weights.get) if weights else None
+
+
+def demo_v3_score(seeker, helper):
+    """demo_sentence_transformers.compute_dha_match_score (v3) on an API-shaped profile pair."""
+    s_emb, h_emb = seeker.get("emotion_embedding"), helper.get("emotion_embedding")
+    if s_emb is None or h_emb is None or len(s_emb) == 0 or len(h_emb) == 0:
+        emotional_sim = 0.5
+    else:
+        s_emb = s_emb.dequantize() if hasattr(s_emb, "dequantize") else np.asarray(s_emb, dtype=np.float32)
+        h_emb = h_emb.dequantize() if hasattr(h_emb, "dequantize") else np.asarray(h_emb, dtype=np.float32)
+        norm = np.linalg.norm(s_emb) * np.linalg.norm(h_emb)
+        similarity = float(np.dot(s_emb, h_emb) / norm) if norm else 0.0
+        emotional_sim = max(0.0, min(1.0, (similarity + 1) / 2)) if norm else 0.5
+
+    seeker_themes = {t["name"] for t in seeker.get("themes", [])}
+    helper_themes = {t for t, v in helper.get("themes_experience", {}).items() if v >= DEMO_THEME_MIN}
+    union = seeker_themes | helper_themes
+    experience_overlap = len(seeker_themes & helper_themes) / len(union) if seeker_themes and helper_themes else 0.0
+
+    coping_match = 1.0 if (
+        _strongest(seeker.get("coping_style_preference", {}))
+        == _strongest(helper.get("coping_style_expertise", {}))
+    ) else 0.3
+
+    windows = helper.get("availability_windows")
+    if windows:
+        slots = [slot for day in windows.values() for slot in day]
+        availability = sum(slots) / len(slots) if slots else 0.5
+    else:
+        availability = 0.5
+    reliability = helper.get("reliability_score", 0.5)
+
+    return (
+        0.35 * emotional_sim +
+        0.25 * experience_overlap +
+        0.15 * coping_match +
+        0.15 * availability +
+        0.10 * reliability
+    )
+
+
+class DemoV3Scorer:
+    """Original v3 weighted formula from the sentence-transformers demo."""
+
+    def score_pool(self, seeker, helpers):
+        return np.array([demo_v3_score(seeker, helper) for helper in helpers])
+
+
+def build_scorer(spec):
+    """Scorer instance for a spec string (see module docstring). Raises ValueError."""
+    kind, _, arg = spec.partition(":")
+    if kind == "rules":
+        overrides = {}
+        for item in filter(None, arg.split(",")):
+            key, _, value = item.partition("=")
+            try:
+                overrides[key.strip()] = float(value)
+            except ValueError:
+                raise ValueError(f"Bad weight override {item!r} in {spec!r} (expected name=float)")
+        return RulesScorer(overrides)
+    if kind == "learned":
+        return LearnedScorer(arg or None)
+    if kind == "demo_v3":
+        return DemoV3Scorer()
+    raise ValueError(f"Unknown scorer {spec!r} (expected rules[:w=v,...], learned[:version|file], demo_v3)")
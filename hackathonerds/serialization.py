@@ -0,0 +1,186 @@
+"""
+Response serialization for trusted internal payloads (/match, /discover).
+
+Endpoints build plain dicts that may still contain NumPy scalars/arrays and hand
+them to encode_response(), which emits the response bytes directly:
+
+- JSON via orjson with OPT_SERIALIZE_NUMPY (NumPy handled natively, no
+  pre-walk). Without orjson, the stdlib encoder with a `default` hook — still
+  no recursive sanitize pass, only leaf NumPy values hit the hook.
+- MessagePack when the client sends `Accept: application/msgpack` (or
+  application/x-msgpack). The Flutter client can opt in per request.
+
+Returning a Response skips FastAPI's response_model re-validation and
+jsonable_encoder walk; the endpoint's response_model is kept for OpenAPI docs.
+
+Benchmark (bytes/response and µs/response per path):
+    python serialization.py --matches 5 --iterations 2000
+"""
+
+import json
+
+import numpy as np
+from fastapi.responses import Response
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_ACCEPT = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _numpy_default(obj):
+    """Leaf hook for non-native types (stdlib json / msgpack)."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps_json(obj) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_numpy_default, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(obj) -> bytes:
+    return msgpack.packb(obj, default=_numpy_default, use_bin_type=True)
+
+
+def wants_msgpack(accept: str) -> bool:
+    """True if the Accept header asks for MessagePack (and msgpack is installed)."""
+    if not MSGPACK_AVAILABLE or not accept:
+        return False
+    accept = accept.lower()
+    return any(media in accept for media in _MSGPACK_ACCEPT)
+
+
+def encode_response(request, payload, status_code=200, headers=None) -> Response:
+    """Encode a trusted payload straight to bytes in the negotiated format."""
+    if wants_msgpack(request.headers.get("accept", "")):
+        body, media_type = dumps_msgpack(payload), MSGPACK_MEDIA_TYPE
+    else:
+        body, media_type = dumps_json(payload), JSON_MEDIA_TYPE
+    response = Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def sanitize(obj):
+    """Recursively convert NumPy types to native Python (for callers that need plain objects)."""
+    if isinstance(obj, dict):
+        return {k: sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [sanitize(v) for v in obj]
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return obj
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+def _sample_payload(n_matches):
+    """A /match-shaped payload with the NumPy scalars the matcher really returns."""
+    rng = np.random.default_rng(0)
+    themes = ["Family Problems", "Academic Pressure", "Loneliness", "Breakup", "Career Uncertainty"]
+    matches = []
+    for i in range(n_matches):
+        breakdown = {k: np.float64(round(rng.random(), 3)) for k in (
+            "emotional_similarity", "experience_overlap", "coping_style_match", "availability_overlap",
+            "reliability_score", "conversation_bonus", "energy_bonus", "narrative_match_bonus",
+        )}
+        breakdown["score_source"] = "rule_based"
+        matches.append({
+            "match_id": f"match_{i + 1:03d}",
+            "helper_id": f"helper_{i:04d}",
+            "score": np.float64(round(rng.random(), 3)),
+            "breakdown": breakdown,
+            "top_theme": themes[i % len(themes)],
+            "explanation": "This person deeply resonates with your emotional experience, has walked a similar path.",
+            "helper": {
+                "user_id": f"helper_{i:04d}",
+                "display_name": "Anonymous Helper",
+                "age_decade": "20s",
+                "themes_experience": {t: np.float32(rng.random()) for t in themes},
+                "coping_style_expertise": {"problem_focused": np.float32(0.4), "emotion_focused": np.float32(0.7)},
+                "conversation_style": {"listener": np.float32(0.6), "advisor": np.float32(0.3)},
+                "energy_level": "moderate",
+                "reliability_score": np.float64(rng.random()),
+                "response_rate": np.float64(rng.random()),
+                "completion_rate": np.float64(rng.random()),
+                "experience_narrative": None,
+            },
+        })
+    return {"matches": matches}
+
+
+def benchmark(n_matches=5, iterations=2000):
+    """Bytes and µs per response for the legacy and direct serialization paths."""
+    import time
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import BaseModel
+
+    class MatchResponse(BaseModel):
+        matches: List[dict]
+
+    payload = _sample_payload(n_matches)
+
+    def legacy():
+        # _sanitize → response_model validation → jsonable_encoder → stdlib json
+        model = MatchResponse(matches=sanitize(payload["matches"]))
+        validated = MatchResponse.model_validate(model.model_dump())
+        return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+    paths = [("legacy (_sanitize + validate + json)", legacy)]
+    paths.append(("stdlib json + default hook", lambda: json.dumps(
+        payload, default=_numpy_default, separators=(",", ":")).encode("utf-8")))
+    if ORJSON_AVAILABLE:
+        paths.append(("orjson (OPT_SERIALIZE_NUMPY)", lambda: orjson.dumps(payload, option=_ORJSON_OPTIONS)))
+    if MSGPACK_AVAILABLE:
+        paths.append(("msgpack", lambda: dumps_msgpack(payload)))
+
+    rows = []
+    for name, fn in paths:
+        body = fn()
+        for _ in range(min(100, iterations)):
+            fn()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        rows.append({"path": name, "bytes": len(body), "us_per_response": elapsed / iterations * 1e6})
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark /match response serialization paths.")
+    parser.add_argument("--matches", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = benchmark(args.matches, args.iterations)
+    base = rows[0]["us_per_response"]
+    print(f"\n{args.matches} matches/response, {args.iterations} iterations")
+    print(f"{'path':<38} {'bytes':>8} {'µs/resp':>9} {'speedup':>8}")
+    for row in rows:
+        print(f"{row['path']:<38} {row['bytes']:>8d} {row['us_per_response']:>9.1f} "
+              f"{base / row['us_per_response']:>7.1f}x")
@@ -0,0 +1,199 @@
+"""
+Shadow scoring: run a candidate scorer on sampled /match traffic, off the critical path.
+
+With SHADOW_SCORER set (any scorers.py spec, e.g. "learned:v20250301T101500-1a2b3c4d"
+or "rules:emotional_similarity=0.5"), a SHADOW_SAMPLE_RATE fraction of /match
+requests is handed to a single background thread after the live response is
+built. The thread re-scores the same pool with the candidate and appends one
+JSON line to SHADOW_LOG:
+
+    {"ts": ..., "scorer": "...", "live_model": "...", "pool": 30, "k": 5,
+     "live": [[helper_id, score], ...], "shadow": [[helper_id, score], ...],
+     "overlap": 0.8, "live_ms": 3.1, "shadow_ms": 2.7, "shadow_cpu_ms": 2.6}
+
+CPU budget: shadow work is metered in thread CPU seconds against a token bucket
+refilled at SHADOW_CPU_BUDGET CPU-seconds per wall second (0.1 = a tenth of one
+core). A request is only sampled when the bucket has tokens and nothing else is
+queued, and a run in progress re-checks the bucket between chunks of
+SHADOW_CHUNK helpers and gives up ("budget") once it is overdrawn — so the
+shadow scorer can fall behind or skip, but never take more than its share.
+"""
+
+import os
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from metrics import SHADOW_DURATION, SHADOW_OVERLAP, SHADOW_RUNS
+
+logger = logging.getLogger("bridge.shadow")
+
+SHADOW_SCORER = os.getenv("SHADOW_SCORER")
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.05"))
+SHADOW_CPU_BUDGET = float(os.getenv("SHADOW_CPU_BUDGET", "0.1"))
+SHADOW_LOG = os.getenv("SHADOW_LOG", "shadow_log.jsonl")
+SHADOW_CHUNK = int(os.getenv("SHADOW_CHUNK", "256"))
+SHADOW_BURST_S = 2.0  # bucket holds at most this many wall-seconds of budget
+
+
+class CpuBudget:
+    """Token bucket in CPU-seconds, refilled at `rate` CPU-seconds per wall second."""
+
+    def __init__(self, rate, burst_s=SHADOW_BURST_S):
+        self.rate = rate
+        self.capacity = max(rate * burst_s, 0.01)
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self.tokens > 0
+
+    def charge(self, cpu_s):
+        with self._lock:
+            self._refill()
+            self.tokens -= cpu_s
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class ShadowScorer:
+    """Samples /match requests and scores them with a candidate scorer on a background thread."""
+
+    def __init__(self, spec, sample_rate=SHADOW_SAMPLE_RATE, cpu_budget=SHADOW_CPU_BUDGET,
+                 log_path=SHADOW_LOG, chunk=SHADOW_CHUNK):
+        from scorers import build_scorer
+
+        self.spec = spec
+        self.scorer = build_scorer(spec)  # load any model now, not on the first sampled request
+        self.sample_rate = sample_rate
+        self.budget = CpuBudget(cpu_budget)
+        self.log_path = log_path
+        self.chunk = chunk
+        self.counts = {"scored": 0, "budget": 0, "busy": 0, "error": 0}
+        self._busy = threading.Lock()  # held while a shadow run is queued or running
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        logger.info("Shadow scorer %s (sample=%.0f%%, cpu budget=%.2f core)", spec, sample_rate * 100, cpu_budget)
+
+    def _skip(self, reason):
+        self.counts[reason] += 1
+        SHADOW_RUNS.labels(reason).inc()
+
+    def maybe_submit(self, seeker, pool, live, live_ms, live_model=None):
+        """
+        Called after a live /match result is ready: live = [(helper_id, score), ...].
+        Returns True if the request was queued for shadow scoring.
+        """
+        if random.random() >= self.sample_rate:
+            return False
+        if not self._busy.acquire(blocking=False):
+            self._skip("busy")  # one in flight at most: never build a backlog
+            return False
+        if not self.budget.available():
+            self._busy.release()
+            self._skip("budget")
+            return False
+        self._executor.submit(self._run, seeker, list(pool), live, live_ms, live_model)
+        return True
+
+    def _score(self, seeker, pool):
+        """Score in chunks, charging the budget after each and stopping once it's overdrawn."""
+        parts = []
+        for i in range(0, len(pool), self.chunk):
+            cpu_start = time.thread_time()
+            parts.append(np.asarray(self.scorer.score_pool(seeker, pool[i:i + self.chunk]), dtype=float))
+            self.budget.charge(time.thread_time() - cpu_start)
+            if i + self.chunk < len(pool):
+                if not self.budget.available():
+                    raise BudgetExceeded()
+                time.sleep(0)  # let serving threads take the GIL between chunks
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def _run(self, seeker, pool, live, live_ms, live_model):
+        try:
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            scores = self._score(seeker, pool)
+            shadow_s = time.perf_counter() - start
+            cpu_s = time.thread_time() - cpu_start
+
+            k = len(live)
+            top = np.argsort(-scores, kind="stable")[:k]
+            shadow = [[pool[i]["user_id"], round(float(scores[i]), 4)] for i in top]
+            live_ids = {helper_id for helper_id, _ in live}
+            overlap = len(live_ids & {helper_id for helper_id, _ in shadow}) / k if k else 1.0
+
+            record = {
+                "ts": time.time(),
+                "scorer": self.spec,
+                "live_model": live_model,
+                "pool": len(pool),
+                "k": k,
+                "live": [[helper_id, round(float(score), 4)] for helper_id, score in live],
+                "shadow": shadow,
+                "overlap": round(overlap, 3),
+                "live_ms": round(live_ms, 2),
+                "shadow_ms": round(shadow_s * 1000, 2),
+                "shadow_cpu_ms": round(cpu_s * 1000, 2),
+            }
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            self.counts["scored"] += 1
+            SHADOW_RUNS.labels("scored").inc()
+            SHADOW_DURATION.observe(shadow_s)
+            SHADOW_OVERLAP.observe(overlap)
+        except BudgetExceeded:
+            self._skip("budget")
+        except Exception:
+            self._skip("error")
+            logger.error("Shadow scoring failed", exc_info=True)
+        finally:
+            self._busy.release()
+
+    def status(self):
+        return {
+            "scorer": self.spec,
+            "sample_rate": self.sample_rate,
+            "cpu_budget": self.budget.rate,
+            "budget_tokens_s": round(self.budget.tokens, 4),
+            "log": self.log_path,
+            **self.counts,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarise a shadow scoring log.")
+    parser.add_argument("log", nargs="?", default=SHADOW_LOG)
+    args = parser.parse_args()
+
+    by_scorer = {}
+    with open(args.log) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                by_scorer.setdefault(record["scorer"], []).append(record)
+
+    print(f"\n{'scorer':<40} {'runs':>6} {'overlap':>8} {'live p50':>9} {'shadow p50':>11} {'shadow p95':>11} {'cpu p50':>8}")
+    for scorer, records in by_scorer.items():
+        overlap = np.mean([r["overlap"] for r in records])
+        live = np.percentile([r["live_ms"] for r in records], 50)
+        shadow = np.percentile([r["shadow_ms"] for r in records], [50, 95])
+        cpu = np.percentile([r["shadow_cpu_ms"] for r in records], 50)
+        marker = "✓" if overlap >= 0.6 else "⚠️"
+        print(f"{scorer:<40} {len(records):>6} {overlap:>8.2f} {live:>8.2f}ms {shadow[0]:>9.2f}ms "
+              f"{shadow[1]:>9.2f}ms {cpu:>6.2f}ms  {marker}")
@@ -0,0 +1,347 @@
+"""
+Sharded /match: the helper pool split across worker processes, scatter/gather top-k.
+
+With MATCH_SHARDS=N, api.py partitions the pool into N contiguous shards, each
+owned by one spawned worker process (a local stand-in for a matching node).
+/match scatters the seeker — embedding already computed — to every shard; each
+shard runs match_seeker_to_helpers over its own helpers and returns its top-k,
+and the coordinator merges those into the global top-k. Scores are identical
+to the in-process path; only the work is spread over N cores.
+
+Slow shards and partial results:
+  - a shard that hasn't answered within MATCH_SHARD_TIMEOUT_S is left out of
+    this request (its late reply is dropped);
+  - a shard with MATCH_SHARD_MAX_PENDING requests still queued is skipped, so
+    one stuck worker can't build an unbounded backlog;
+  - a worker that dies is respawned from its shard spec (plus any helpers
+    upserted since);
+  - every reply carries coverage {"shards", "responded", "helpers_scored",
+    "helpers_total", "partial"}; below MATCH_SHARD_MIN_COVERAGE of shards the
+    request fails with ShardsUnavailable (→ 503) instead of ranking a sliver
+    of the pool.
+
+Snapshot-backed pools (helper_store.py) ship only row numbers: each worker
+memory-maps the same snapshot files, so N shards share one copy of the
+embeddings in the page cache. Any other helpers are pickled once at spawn.
+Each worker runs its own ModelWatcher, so learned-model hot swaps reach it too,
+and (with MATCH_PREFILTER) its own prefilter over its slice; the coordinator
+merges the per-shard prefilter reports.
+
+Benchmark (1..N shards against the in-process path):
+    python sharding.py --helpers 50000 --shards 1,2,4 --requests 20 --concurrency 4
+"""
+
+import os
+if __name__ == "__main__":
+    os.environ.setdefault("SKIP_SENTENCE_TRANSFORMERS", "1")  # seekers are synthetic; no model needed
+
+import bisect
+import heapq
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from helper_store import snapshot_rows
+from metrics import MATCH_PARTIAL, MATCH_SHARD_LATENCY, MATCH_SHARD_RESULTS
+from prefilter import MATCH_PREFILTER, PREFILTER_STATS, HelperPrefilter, merge_reports
+
+logger = logging.getLogger("bridge.sharding")
+
+MATCH_SHARDS = int(os.getenv("MATCH_SHARDS", "0"))
+MATCH_SHARD_TIMEOUT_S = float(os.getenv("MATCH_SHARD_TIMEOUT_S", "2.0"))
+MATCH_SHARD_MIN_COVERAGE = float(os.getenv("MATCH_SHARD_MIN_COVERAGE", "0.5"))
+MATCH_SHARD_MAX_PENDING = int(os.getenv("MATCH_SHARD_MAX_PENDING", "4"))
+SHARD_START_TIMEOUT_S = 300
+
+
+class ShardsUnavailable(RuntimeError):
+    """Too few shards answered in time for a meaningful ranking."""
+
+    def __init__(self, coverage):
+        super().__init__(f"{coverage['responded']}/{coverage['shards']} helper shards answered")
+        self.coverage = coverage
+
+
+# ── Worker process side ──────────────────────────────────────────────────────
+
+_shard = None  # {"index", "helpers", "positions", "prefilter"} in each worker process
+
+
+def _init_shard(index, spec):
+    os.environ.setdefault("SKIP_SENTENCE_TRANSFORMERS", "1")  # seekers arrive with their embedding
+    global _shard
+    from local_test_matcher import learned_matcher
+    from model_registry import ModelWatcher
+
+    helpers = []
+    if spec["snapshot"] is not None:
+        from helper_store import HelperView, open_snapshot
+
+        snapshot = open_snapshot(spec["snapshot"])
+        helpers = [HelperView(snapshot, row) for row in spec["rows"].tolist()]
+    helpers.extend(spec["helpers"])
+    prefilter = HelperPrefilter(helpers, spec["prefilter"]) if spec["prefilter"] else None
+    _shard = {"index": index, "helpers": helpers, "positions": None, "prefilter": prefilter}
+    ModelWatcher(learned_matcher).start()
+
+
+def _shard_size():
+    return len(_shard["helpers"])
+
+
+def _score_shard(seeker, top_k, min_score, use_learned):
+    from local_test_matcher import match_seeker_to_helpers
+
+    helpers, report = _shard["helpers"], None
+    if _shard["prefilter"] is not None:
+        positions, report = _shard["prefilter"].select(seeker)
+        helpers = [helpers[i] for i in positions.tolist()]
+    timings = {}
+    results = match_seeker_to_helpers(seeker, helpers, top_k=top_k, min_score=min_score,
+                                      use_learned=use_learned, timings=timings)
+    return results, timings, len(helpers), report
+
+
+def _upsert_helper(helper):
+    helpers = _shard["helpers"]
+    if _shard["positions"] is None:
+        _shard["positions"] = {h["user_id"]: i for i, h in enumerate(helpers)}
+    position = _shard["positions"].get(helper["user_id"])
+    if position is None:
+        position = _shard["positions"][helper["user_id"]] = len(helpers)
+        helpers.append(helper)
+    else:
+        helpers[position] = helper
+    if _shard["prefilter"] is not None:
+        _shard["prefilter"].upsert(position, helper)
+
+
+# ── Coordinator side ─────────────────────────────────────────────────────────
+
+def shard_specs(helpers, shards, prefilter=MATCH_PREFILTER):
+    """Contiguous pool bounds and one spec per shard (snapshot rows travel as row numbers)."""
+    bounds = np.linspace(0, len(helpers), shards + 1).astype(int).tolist()
+    specs = []
+    for i in range(shards):
+        directory, rows, others = snapshot_rows(helpers[bounds[i]:bounds[i + 1]])
+        specs.append({"snapshot": directory, "rows": rows, "helpers": others, "prefilter": prefilter})
+    return bounds, specs
+
+
+class _Shard:
+    """One worker process owning a slice of the pool."""
+
+    def __init__(self, index, spec):
+        self.index = index
+        self.spec = spec
+        self.size = len(spec["rows"]) + len(spec["helpers"])  # including helpers appended since
+        self.pending = 0
+        self.upserts = {}  # user_id → latest helper, replayed into a respawned worker
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_shard, initargs=(self.index, self.spec))
+
+    def restart(self, broken_executor):
+        with self._lock:
+            if self.executor is not broken_executor:
+                return  # another request already respawned it
+            logger.error("Helper shard %d worker died; respawning", self.index)
+            broken_executor.shutdown(wait=False, cancel_futures=True)
+            self.pending = 0
+            self._start()
+            for helper in self.upserts.values():
+                self.executor.submit(_upsert_helper, helper)
+
+    def submit(self, fn, *args):
+        executor = self.executor
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self.restart(executor)
+            executor = self.executor
+            future = executor.submit(fn, *args)
+        future.executor = executor
+        return future
+
+    def submit_tracked(self, fn, *args):
+        """Submit counting the request as pending until it finishes (even after a timeout)."""
+        with self._lock:
+            self.pending += 1
+        start = time.perf_counter()
+
+        def finished(_):
+            with self._lock:
+                self.pending = max(0, self.pending - 1)
+            MATCH_SHARD_LATENCY.labels(self.index).observe(time.perf_counter() - start)
+
+        future = self.submit(fn, *args)
+        future.add_done_callback(finished)
+        return future
+
+
+class ShardedMatcher:
+    """Scatter/gather top-k matching over helper shards in worker processes."""
+
+    def __init__(self, helpers, shards=MATCH_SHARDS, timeout_s=MATCH_SHARD_TIMEOUT_S,
+                 min_coverage=MATCH_SHARD_MIN_COVERAGE, max_pending=MATCH_SHARD_MAX_PENDING, prefilter=MATCH_PREFILTER):
+        start = time.perf_counter()
+        self.timeout_s = timeout_s
+        self.min_responding = max(1, math.ceil(min_coverage * shards))
+        self.max_pending = max_pending
+        self.bounds, specs = shard_specs(helpers, shards, prefilter)
+        self.shards = [_Shard(i, spec) for i, spec in enumerate(specs)]
+        # Spawn and load every shard now rather than on the first /match
+        sizes = [shard.submit(_shard_size) for shard in self.shards]
+        done, not_done = wait(sizes, timeout=SHARD_START_TIMEOUT_S)
+        if not_done:
+            raise RuntimeError(f"{len(not_done)} helper shards failed to start")
+        logger.info("Sharded matcher ready: %d shards × ~%d helpers (%s) in %.1fs", len(self.shards),
+                    len(helpers) // max(1, shards), "snapshot rows" if specs and specs[0]["snapshot"] else "pickled",
+                    time.perf_counter() - start)
+
+    @property
+    def size(self):
+        return sum(shard.size for shard in self.shards)
+
+    def match(self, seeker, top_k=5, min_score=0.5, use_learned=True, timings=None):
+        """
+        Global top-k as match_seeker_to_helpers returns it, plus a coverage dict.
+        Raises ShardsUnavailable when fewer than the minimum number of shards answer.
+        """
+        start = time.perf_counter()
+        futures = {}
+        for shard in self.shards:
+            if shard.pending >= self.max_pending:
+                MATCH_SHARD_RESULTS.labels("skipped").inc()
+                continue
+            futures[shard.submit_tracked(_score_shard, seeker, top_k, min_score, use_learned)] = shard
+        done, not_done = wait(futures, timeout=self.timeout_s)
+
+        results, reports, scored, responded = [], [], 0, 0
+        for future, shard in futures.items():  # shard order, so ties keep the in-process (pool order) ranking
+            if future not in done:
+                continue
+            try:
+                part, _, shard_scored, report = future.result()
+            except BrokenProcessPool:
+                MATCH_SHARD_RESULTS.labels("error").inc()
+                shard.restart(future.executor)
+                continue
+            except Exception:
+                MATCH_SHARD_RESULTS.labels("error").inc()
+                logger.error("Helper shard %d failed", shard.index, exc_info=True)
+                continue
+            MATCH_SHARD_RESULTS.labels("ok").inc()
+            results.extend(part)
+            reports.append(report)
+            scored += shard_scored
+            responded += 1
+        for _ in not_done:
+            MATCH_SHARD_RESULTS.labels("timeout").inc()
+        gathered = time.perf_counter()
+
+        coverage = {
+            "shards": len(self.shards),
+            "responded": responded,
+            "helpers_scored": scored,
+            "helpers_total": self.size,
+            "partial": responded < len(self.shards),
+        }
+        if responded < self.min_responding:
+            raise ShardsUnavailable(coverage)
+        report = merge_reports(reports)
+        if report is not None:
+            PREFILTER_STATS.record(report)
+        if coverage["partial"]:
+            MATCH_PARTIAL.inc()
+            logger.warning("/match partial: %d/%d shards answered within %.1fs",
+                           responded, len(self.shards), self.timeout_s)
+
+        merged = heapq.nlargest(top_k, results, key=lambda r: r[0])
+        if timings is not None:
+            timings["scoring"] = gathered - start  # scatter → slowest answering shard
+            timings["sort"] = time.perf_counter() - gathered
+        return merged, coverage
+
+    def upsert(self, helper, position):
+        """Add/replace a helper on the shard that owns pool index `position` (appends go to the last shard)."""
+        index = min(bisect.bisect_right(self.bounds, position) - 1, len(self.shards) - 1)
+        shard = self.shards[index]
+        with shard._lock:
+            if position >= self.bounds[-1] and helper["user_id"] not in shard.upserts:
+                shard.size += 1  # a new helper, not an update of one the shard already holds
+            shard.upserts[helper["user_id"]] = helper
+        shard.submit(_upsert_helper, helper)
+
+    def status(self):
+        return [{"shard": s.index, "helpers": s.size, "pending": s.pending} for s in self.shards]
+
+    def close(self):
+        for shard in self.shards:
+            shard.executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+
+    from local_test_matcher import generate_emotion_embedding, match_seeker_to_helpers
+    from synthetic import PopulationGenerator
+
+    parser = argparse.ArgumentParser(description="Benchmark sharded matching from 1 to N worker processes.")
+    parser.add_argument("--helpers", type=int, default=50_000)
+    parser.add_argument("--store", help="load the pool from a helper store instead (helper_store.py)")
+    parser.add_argument("--shards", default="1,2,4")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.store:
+        from helper_store import HelperStore
+
+        pool = HelperStore(args.store).load_pool()
+        dim = len(pool[0]["emotion_embedding"])
+    else:
+        dim = len(generate_emotion_embedding("", use_openai=False))
+        pool = PopulationGenerator(args.seed, dim=dim).helpers(args.helpers).to_dicts()
+    seekers = PopulationGenerator(args.seed + 1, dim=dim).seekers(args.requests).to_dicts()
+    print(f"\n{len(pool)} helpers, {args.requests} requests, concurrency {args.concurrency}, {os.cpu_count()} cores")
+
+    start = time.perf_counter()
+    baseline = [match_seeker_to_helpers(s, pool, top_k=5) for s in seekers[:3]]
+    local_s = (time.perf_counter() - start) / len(baseline)
+    print(f"\n{'shards':>6} {'start s':>8} {'p50 ms':>9} {'p95 ms':>9} {'req/s':>7} {'speedup':>8} {'partial':>8}  top-k")
+    print(f"{'local':>6} {'-':>8} {local_s * 1000:>9.0f} {'-':>9} {1 / local_s:>7.2f} {'1.00x':>8} {'-':>8}")
+
+    for shards in [int(s) for s in args.shards.split(",")]:
+        started = time.perf_counter()
+        matcher = ShardedMatcher(pool, shards, timeout_s=args.timeout, max_pending=args.requests, prefilter="")
+        startup_s = time.perf_counter() - started
+        agree = all([r[1] for r in matcher.match(s, top_k=5)[0]] == [r[1] for r in b]
+                    for s, b in zip(seekers, baseline))
+
+        def timed(seeker):
+            t = time.perf_counter()
+            _, coverage = matcher.match(seeker, top_k=5)
+            return time.perf_counter() - t, coverage["partial"]
+
+        wall = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool_threads:
+            runs = list(pool_threads.map(timed, seekers))
+        wall = time.perf_counter() - wall
+        latencies = np.array([r[0] for r in runs]) * 1000
+        rps = len(runs) / wall
+        print(f"{shards:>6} {startup_s:>8.1f} {np.percentile(latencies, 50):>9.0f} {np.percentile(latencies, 95):>9.0f} "
+              f"{rps:>7.2f} {rps * local_s:>7.2f}x {sum(r[1] for r in runs):>8}  {'✓' if agree else '❌ differs'}")
+        matcher.close()
@@ -6,21 +6,295 @@ WRITE_TO_KEYBOARD_INTERVAL = 0.002
 
 
 # ── File-based transcription (called by FastAPI, NOT live mic) ────────────────
+#
+# Uploads go through a preprocessing stage before Whisper:
+#   1. decode + resample to 16 kHz mono float32 in-process (PyAV via faster-whisper)
+#   2. Silero VAD (the VAD faster-whisper ships, same family as the live config's
+#      silero_sensitivity) drops leading/trailing/inner silence
+#   3. speech regions are merged into chunks of at most STT_CHUNK_MAX_S, cut only
+#      at pauses, so no word is split across chunks
+#
+# Then a model tier is picked from the amount of speech and the latency budget
+# (STT_LATENCY_BUDGET_S): the most accurate (model, beam_size) in STT_TIERS whose
+# estimated decode time fits. Estimates start from the table below and track the
+# observed speed of each tier. Callers that pass on_draft get a fast first pass
+# with the cheapest tier right away and the chosen tier as a refinement, if time
+# is left for it.
+#
+# Decoding goes through one BatchedInferencePipeline per tier. Chunks from all
+# uploads queued within STT_BATCH_WINDOW_MS are concatenated into a single
+# batched pass (up to STT_BATCH_SIZE chunks per forward), so concurrent uploads
+# share one decode instead of competing for the CPU.
+#
+# Per-stage timings and audio-seconds per wall-second are logged and exported.
+
+import os
+import bisect
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import STT_AUDIO_SECONDS, STT_BATCH_UPLOADS, STT_PASSES, STT_SPEED, STT_STAGE
+
+logger = logging.getLogger("bridge.stt")
+
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "int8")
+STT_CPU_THREADS = int(os.getenv("STT_CPU_THREADS", "0"))  # 0 = CTranslate2 default
+STT_CHUNK_MAX_S = float(os.getenv("STT_CHUNK_MAX_S", "30"))  # Whisper's native window
+STT_VAD_THRESHOLD = float(os.getenv("STT_VAD_THRESHOLD", "0.5"))
+STT_MIN_SILENCE_MS = int(os.getenv("STT_MIN_SILENCE_MS", "500"))
+STT_SPEECH_PAD_MS = int(os.getenv("STT_SPEECH_PAD_MS", "200"))
+STT_LATENCY_BUDGET_S = float(os.getenv("STT_LATENCY_BUDGET_S", "8"))
+STT_BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", "8"))
+STT_BATCH_WINDOW_MS = float(os.getenv("STT_BATCH_WINDOW_MS", "50"))
+SAMPLE_RATE = 16000
+
+
+def _parse_tiers(spec):
+    """"tiny.en:1,small.en:5" → [("tiny.en", 1), ("small.en", 5)], fastest first."""
+    tiers = []
+    for item in filter(None, spec.split(",")):
+        model, _, beam = item.strip().partition(":")
+        tiers.append((model, int(beam or 1)))
+    return tiers
+
+
+# Fastest → most accurate. tiny.en / small.en match the live recorder's realtime / final models.
+STT_TIERS = _parse_tiers(os.getenv("STT_TIERS", "tiny.en:1,base.en:1,small.en:1,small.en:5"))
+
+# Initial speech-seconds decoded per wall-second on CPU int8 (batched); updated from observed runs
+_DEFAULT_SPEED = {"tiny.en": 40.0, "tiny": 35.0, "base.en": 20.0, "base": 18.0,
+                  "small.en": 8.0, "small": 7.0, "medium.en": 2.5, "medium": 2.0}
+_tier_speed = {tier: _DEFAULT_SPEED.get(tier[0], 4.0) / max(1, tier[1]) ** 0.5 for tier in STT_TIERS}
+_SPEED_ALPHA = 0.3
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def config_fingerprint(budget_s=None):
+    """Everything that changes what transcribe_file returns for the same audio (cache keys)."""
+    budget_s = STT_LATENCY_BUDGET_S if budget_s is None else budget_s
+    tiers = ",".join(f"{model}:{beam}" for model, beam in STT_TIERS)
+    return (f"tiers={tiers};budget={budget_s};compute={STT_COMPUTE_TYPE};chunk={STT_CHUNK_MAX_S};"
+            f"vad={STT_VAD_THRESHOLD}/{STT_MIN_SILENCE_MS}/{STT_SPEECH_PAD_MS}")
+
+
+def get_whisper_model(size, compute_type=STT_COMPUTE_TYPE):
+    """Load a WhisperModel once per (size, compute_type) and reuse it across requests."""
+    key = (size, compute_type)
+    with _models_lock:
+        if key not in _models:
+            from faster_whisper import WhisperModel
+            start = time.perf_counter()
+            _models[key] = WhisperModel(size, device="cpu", compute_type=compute_type, cpu_threads=STT_CPU_THREADS)
+            logger.info("Loaded Whisper %s/%s in %.1fs", size, compute_type, time.perf_counter() - start)
+        return _models[key]
+
+
+def split_on_pauses(speech, max_samples):
+    """
+    Merge VAD speech regions ([{"start", "end"}] in samples) into chunks no longer
+    than max_samples, cutting only in the pauses between regions.
+    """
+    chunks = []
+    for region in speech:
+        if chunks and region["end"] - chunks[-1][0] <= max_samples:
+            chunks[-1][1] = region["end"]
+        else:
+            chunks.append([region["start"], region["end"]])
+    return [(start, end) for start, end in chunks]
+
 
-def transcribe_file(audio_path: str) -> str:
+def preprocess_audio(audio_path, stats=None):
+    """
+    Decode to 16 kHz mono, VAD-trim and split on pauses.
+    Returns a list of float32 chunks (empty when no speech was found).
+    """
+    from faster_whisper.audio import decode_audio
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    stats = stats if stats is not None else {}
+    start = time.perf_counter()
+    audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+    stats["decode_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    speech = get_speech_timestamps(audio, VadOptions(
+        threshold=STT_VAD_THRESHOLD,
+        min_silence_duration_ms=STT_MIN_SILENCE_MS,
+        speech_pad_ms=STT_SPEECH_PAD_MS,
+        max_speech_duration_s=STT_CHUNK_MAX_S,
+    ), sampling_rate=SAMPLE_RATE)
+    bounds = split_on_pauses(speech, int(STT_CHUNK_MAX_S * SAMPLE_RATE))
+    stats["vad_s"] = time.perf_counter() - start
+
+    stats["audio_s"] = len(audio) / SAMPLE_RATE
+    stats["speech_s"] = sum(r["end"] - r["start"] for r in speech) / SAMPLE_RATE
+    stats["chunks"] = len(bounds)
+    return [audio[s:e] for s, e in bounds]
+
+
+def choose_tier(speech_s, budget_s):
+    """Most accurate tier whose estimated decode time fits the budget (else the fastest)."""
+    best = STT_TIERS[0]
+    for tier in STT_TIERS:
+        if speech_s / _tier_speed[tier] <= budget_s:
+            best = tier
+    return best
+
+
+class _TierBatcher:
+    """Collects chunk lists from concurrent uploads and decodes them in one batched pass."""
+
+    def __init__(self, tier):
+        self.tier = tier
+        self._queue = queue.Queue()
+        self._pipeline = None
+        threading.Thread(target=self._run, name=f"stt-{tier[0]}-b{tier[1]}", daemon=True).start()
+
+    def submit(self, chunks, on_segment=None):
+        """Future of per-chunk texts; on_segment(chunk_index, text) is called as segments decode."""
+        future = Future()
+        self._queue.put((chunks, on_segment, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        n_chunks = len(batch[0][0])
+        deadline = time.monotonic() + STT_BATCH_WINDOW_MS / 1000
+        while n_chunks < STT_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_chunks += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self._decode([(chunks, on_segment) for chunks, on_segment, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), texts in zip(batch, results):
+                future.set_result(texts)
+
+    def _decode(self, uploads):
+        """
+        One batched pass over every chunk of every upload ([(chunks, on_segment)])
+        → per-upload lists of chunk texts.
+        """
+        if self._pipeline is None:
+            from faster_whisper import BatchedInferencePipeline
+            self._pipeline = BatchedInferencePipeline(model=get_whisper_model(self.tier[0]))
+        chunks = [chunk for upload, _ in uploads for chunk in upload]
+        owners = [(u, c) for u, (upload, _) in enumerate(uploads) for c in range(len(upload))]
+        texts = [[""] * len(upload) for upload, _ in uploads]
+        if not chunks:
+            return texts
+
+        clips, starts, offset = [], [], 0
+        for chunk in chunks:
+            clips.append({"start": offset, "end": offset + len(chunk)})
+            starts.append(offset / SAMPLE_RATE)
+            offset += len(chunk)
+
+        start = time.perf_counter()
+        model, beam_size = self.tier
+        segments, _ = self._pipeline.transcribe(
+            np.concatenate(chunks),
+            language="en" if model.endswith(".en") else None,
+            clip_timestamps=clips,
+            batch_size=STT_BATCH_SIZE,
+            beam_size=beam_size,
+            without_timestamps=True,
+        )
+        for seg in segments:
+            u, c = owners[max(0, bisect.bisect_right(starts, seg.start + 1e-3) - 1)]
+            text = seg.text.strip()
+            texts[u][c] = f"{texts[u][c]} {text}".strip()
+            on_segment = uploads[u][1]
+            if on_segment is not None and text:
+                try:
+                    on_segment(c, text)
+                except Exception:
+                    logger.warning("on_segment callback failed", exc_info=True)
+        elapsed = time.perf_counter() - start
+
+        observed = offset / SAMPLE_RATE / elapsed if elapsed else None
+        if observed:
+            _tier_speed[self.tier] += _SPEED_ALPHA * (observed - _tier_speed[self.tier])
+        STT_BATCH_UPLOADS.observe(len(uploads))
+        return texts
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def _batcher(tier):
+    with _batchers_lock:
+        if tier not in _batchers:
+            _batchers[tier] = _TierBatcher(tier)
+        return _batchers[tier]
+
+
+def _decode_pass(chunks, tier, stats, label, on_segment=None):
+    start = time.perf_counter()
+    callback = None if on_segment is None else (lambda index, text: on_segment(label, index, text))
+    texts = _batcher(tier).submit(chunks, callback).result()
+    stats[f"{label}_s"] = time.perf_counter() - start
+    stats[f"{label}_model"] = f"{tier[0]}/beam{tier[1]}"
+    STT_PASSES.labels(tier[0], str(tier[1]), label).inc()
+    return " ".join(t for t in texts if t)
+
+
+def transcribe_file(audio_path: str, stats: dict = None, budget_s: float = None, on_draft=None,
+                    on_segment=None) -> str:
     """
     Transcribe an audio file (not live mic) → returns transcript string.
     Used by the FastAPI /transcribe endpoint when audio is uploaded from Flutter.
 
-    Uses faster-whisper for efficient CPU inference.
+    Uses faster-whisper for efficient CPU inference, after the preprocessing
+    stage above, with the model tier chosen for the speech duration and
+    budget_s (default STT_LATENCY_BUDGET_S). With on_draft, the cheapest tier
+    runs first and on_draft(text) is called before the refinement pass.
+    on_segment(pass, chunk_index, text) reports segments as they decode
+    (pass is "draft" or "final"); after preprocessing stats["chunks"] is set.
+    Pass a dict as `stats` to get per-stage timings, the tiers used,
+    audio/speech seconds and "speed" (audio seconds per wall-clock second).
     Falls back to a simple message if model isn't available.
     """
+    stats = stats if stats is not None else {}
+    budget_s = STT_LATENCY_BUDGET_S if budget_s is None else budget_s
+    wall_start = time.perf_counter()
     try:
-        from faster_whisper import WhisperModel
-        model = WhisperModel("small", device="cpu", compute_type="int8")
-        segments, _ = model.transcribe(audio_path)
-        transcript = " ".join([seg.text.strip() for seg in segments])
-        return transcript if transcript else "Could not transcribe audio."
+        chunks = preprocess_audio(audio_path, stats)
+        transcript = ""
+        if chunks:
+            drafted = False
+            tier = choose_tier(stats["speech_s"], budget_s - (time.perf_counter() - wall_start))
+            if on_draft is not None and tier != STT_TIERS[0]:
+                transcript = _decode_pass(chunks, STT_TIERS[0], stats, "draft", on_segment)
+                drafted = True
+                on_draft(transcript)
+                # re-plan with what's left: the draft stands if no better tier fits any more
+                tier = choose_tier(stats["speech_s"], budget_s - (time.perf_counter() - wall_start))
+            if not drafted or tier != STT_TIERS[0]:
+                transcript = _decode_pass(chunks, tier, stats, "final", on_segment)
+        stats["transcribe_s"] = stats.get("draft_s", 0.0) + stats.get("final_s", 0.0)
     except ImportError:
         print("faster-whisper not installed. Install with: pip install faster-whisper")
         return "[Transcription unavailable — faster-whisper not installed]"
@@ -28,6 +302,20 @@ def transcribe_file(audio_path: str) -> str:
         print(f"Transcription error: {e}")
         return f"[Transcription failed: {e}]"
 
+    stats["wall_s"] = time.perf_counter() - wall_start
+    stats["speed"] = stats["audio_s"] / stats["wall_s"] if stats["wall_s"] else 0.0
+    for stage in ("decode", "vad", "transcribe"):
+        STT_STAGE.labels(stage).observe(stats[f"{stage}_s"])
+    STT_AUDIO_SECONDS.labels("audio").inc(stats["audio_s"])
+    STT_AUDIO_SECONDS.labels("speech").inc(stats["speech_s"])
+    STT_SPEED.observe(stats["speed"])
+    logger.info("Transcribed %.1fs audio (%.1fs speech, %d chunks) in %.2fs — %.1f audio-s/s "
+                "[decode %.2fs, vad %.2fs, whisper %.2fs, draft=%s, final=%s]",
+                stats["audio_s"], stats["speech_s"], stats["chunks"], stats["wall_s"], stats["speed"],
+                stats["decode_s"], stats["vad_s"], stats["transcribe_s"],
+                stats.get("draft_model", "-"), stats.get("final_model", "-"))
+    return transcript if transcript else "Could not transcribe audio."
+
 
 # ── Live mic transcription (original stt.py code below) ──────────────────────
 
@@ -0,0 +1,264 @@
+"""
+Seeded, vectorized synthetic helper/seeker populations for load and scale tests.
+
+generate_helper()/generate_seeker() in local_test_matcher.py build one profile
+at a time (Faker names, per-field random calls, one transformer encode each),
+which is fine for a 30-helper demo pool and far too slow for 100k+. Here every
+field is drawn for a whole batch at once with numpy.random.Generator, so the same
+seed always gives the same population, and profiles are kept columnar
+(Population) until they are exported to the dicts api.py uses.
+
+Embeddings mimic narrative similarity without a model: each theme has a fixed
+random direction (from the seed), and a profile's embedding is its theme
+weights mixed over those directions plus isotropic noise, L2-normalized. A
+helper whose narrative mentions the same themes as a seeker's vent therefore
+lands close to it, as with all-MiniLM-L6-v2 on the real templates.
+
+Availability is a (n, 7, 24) mask: each profile gets an overall availability
+rate and a preferred time of day (morning / afternoon / evening / night), and
+hours near it are more likely to be open.
+
+Ids are h0000000, h0000001, ... (s... for seekers), numbered on across every
+batch one generator draws, so pools built from several gen.helpers(n) calls
+never repeat an id; id_start moves the first one (e.g. past a store's helpers).
+
+Usage:
+    from synthetic import PopulationGenerator
+    gen = PopulationGenerator(seed=7)
+    helpers = gen.helpers(100_000)           # columnar Population
+    pool = helpers.to_dicts()                # list of api.py helper dicts
+    seekers = gen.seekers(1_000).to_dicts()
+
+    python synthetic.py --helpers 1000000 --seekers 100000   # throughput benchmark
+"""
+
+import os
+import time
+
+if __name__ == "__main__":
+    os.environ.setdefault("SKIP_SENTENCE_TRANSFORMERS", "1")  # nothing here embeds text
+
+import numpy as np
+
+from local_test_matcher import (
+    COPING_STYLES,
+    CONVERSATION_PREFERENCES,
+    ENERGY_LEVELS,
+    THEMES,
+    generate_helper_narrative,
+    generate_seeker_vent,
+)
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+EMBEDDING_NOISE = 0.35  # relative to the theme signal; lower = tighter clusters
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+DISTRESS_LEVELS = ["Low", "Medium", "High"]
+STRENGTHS = ["empathy", "lived_experience", "active_listening", "boundary_setting"]
+PEAK_HOURS = np.array([9, 14, 20, 23])  # morning / afternoon / evening / night
+NARRATIVE_THRESHOLD = 0.6  # generate_helper_narrative mentions themes above this
+
+
+class Population:
+    """Columnar batch of profiles: one NumPy array per field, row i = profile i."""
+
+    def __init__(self, role, columns, first_id=0):
+        self.role = role
+        self.columns = columns
+        self.first_id = first_id  # id number of row 0
+
+    def __len__(self):
+        return len(self.columns["embedding"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def nbytes(self):
+        return sum(col.nbytes for col in self.columns.values())
+
+    def to_dicts(self, start=0, stop=None):
+        """Rows [start, stop) as api.py profile dicts (helpers: same keys as generate_helper())."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        rows = slice(start, stop)
+        c = self.columns
+        ids = [f"{self.role[0]}{i:07d}" for i in range(self.first_id + start, self.first_id + stop)]
+        embeddings = list(c["embedding"][rows])
+        availability = [dict(zip(DAYS, week)) for week in c["availability"][rows].astype(np.int8).tolist()]
+        energy = [ENERGY_LEVELS[i] for i in c["energy_level"][rows].tolist()]
+        if self.role == "helper":
+            return self._helper_dicts(c, rows, ids, embeddings, availability, energy)
+        return self._seeker_dicts(c, rows, ids, embeddings, availability, energy)
+
+    @staticmethod
+    def _helper_dicts(c, rows, ids, embeddings, availability, energy):
+        narratives = {}
+        themes = c["themes_experience"][rows]
+        masks = np.packbits(themes > NARRATIVE_THRESHOLD, axis=1, bitorder="little")[:, 0].tolist()
+        profiles = []
+        for i, (user_id, exp, mask, coping, conv, rel, resp, comp, cons, strengths) in enumerate(zip(
+                ids, themes.tolist(), masks, c["coping"][rows].tolist(), c["conversation"][rows].tolist(),
+                c["reliability_score"][rows].tolist(), c["response_rate"][rows].tolist(),
+                c["completion_rate"][rows].tolist(), c["energy_consistency"][rows].tolist(),
+                c["support_strengths"][rows].tolist())):
+            themes_experience = dict(zip(THEMES, exp))
+            if mask not in narratives:  # narrative only depends on which themes clear the threshold
+                narratives[mask] = generate_helper_narrative(themes_experience)
+            profiles.append({
+                "user_id": user_id,
+                "role": "helper",
+                "themes_experience": themes_experience,
+                "emotion_embedding": embeddings[i],
+                "experience_narrative": narratives[mask],
+                "coping_style_expertise": dict(zip(COPING_STYLES, coping)),
+                "conversation_style": dict(zip(CONVERSATION_PREFERENCES, conv)),
+                "availability_windows": availability[i],
+                "energy_level": energy[i],
+                "energy_consistency": cons,
+                "reliability_score": rel,
+                "response_rate": resp,
+                "completion_rate": comp,
+                "support_strengths": dict(zip(STRENGTHS, strengths)),
+            })
+        return profiles
+
+    @staticmethod
+    def _seeker_dicts(c, rows, ids, embeddings, availability, energy):
+        vents = {}
+        profiles = []
+        for i, (user_id, intensities, coping, conv, distress, urgency) in enumerate(zip(
+                ids, c["themes"][rows].tolist(), c["coping"][rows].tolist(), c["conversation"][rows].tolist(),
+                c["distress_level"][rows].tolist(), c["urgency"][rows].tolist())):
+            themes = [{"name": THEMES[t], "intensity": round(v, 2)} for t, v in enumerate(intensities) if v > 0]
+            key = tuple(t["name"] for t in themes)
+            if key not in vents:
+                vents[key] = generate_seeker_vent(themes)
+            profiles.append({
+                "user_id": user_id,
+                "role": "seeker",
+                "themes": themes,
+                "emotion_embedding": embeddings[i],
+                "vent_text": vents[key],
+                "coping_style_preference": dict(zip(COPING_STYLES, coping)),
+                "conversation_preference": dict(zip(CONVERSATION_PREFERENCES, conv)),
+                "availability_windows": availability[i],
+                "energy_level": energy[i],
+                "distress_level": DISTRESS_LEVELS[distress],
+                "urgency": urgency,
+            })
+        return profiles
+
+
+class PopulationGenerator:
+    """Deterministic population source: same seed → same theme directions and profiles."""
+
+    def __init__(self, seed=0, dim=EMBEDDING_DIM, noise=EMBEDDING_NOISE, id_start=0):
+        self.seed = seed
+        self.dim = dim
+        self.noise = noise
+        # Theme directions come from their own stream so they don't depend on how many profiles were drawn
+        centroids = np.random.default_rng([seed, 0]).standard_normal((len(THEMES), dim)).astype(np.float32)
+        self.centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+        self._batches = 0
+        self._next_id = {"helper": id_start, "seeker": id_start}
+
+    def _rng(self):
+        self._batches += 1
+        return np.random.default_rng([self.seed, self._batches])
+
+    def _embed(self, rng, weights):
+        """Theme-weighted mix of centroids + noise, L2-normalized (float32)."""
+        signal = weights.astype(np.float32) @ self.centroids
+        signal /= np.maximum(np.linalg.norm(signal, axis=1, keepdims=True), 1e-6)
+        scale = np.float32(self.noise / np.sqrt(self.dim))  # a float64 scalar would promote the batch to float64
+        noise = rng.standard_normal((len(weights), self.dim), dtype=np.float32) * scale
+        emb = signal + noise
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+        return emb
+
+    def _population(self, role, columns):
+        population = Population(role, columns, first_id=self._next_id[role])
+        self._next_id[role] += len(population)
+        return population
+
+    @staticmethod
+    def _availability(rng, n):
+        rate = rng.uniform(0.2, 0.7, (n, 1, 1)).astype(np.float32)
+        peak = PEAK_HOURS[rng.integers(0, len(PEAK_HOURS), n)][:, None, None]
+        hours = np.arange(24)[None, None, :]
+        distance = np.minimum(np.abs(hours - peak), 24 - np.abs(hours - peak))  # circular
+        p = np.clip(rate * (1.6 - distance / 8.0), 0.0, 1.0)
+        return rng.random((n, 7, 24), dtype=np.float32) < p
+
+    def helpers(self, n):
+        rng = self._rng()
+        themes_experience = rng.uniform(0.3, 1.0, (n, len(THEMES))).astype(np.float32)
+        narrative_weights = np.where(themes_experience > NARRATIVE_THRESHOLD, themes_experience, 0.0)
+        return self._population("helper", {
+            "themes_experience": themes_experience,
+            "embedding": self._embed(rng, narrative_weights),
+            "coping": rng.uniform(0.5, 1.0, (n, len(COPING_STYLES))).astype(np.float32),
+            "conversation": rng.random((n, len(CONVERSATION_PREFERENCES)), dtype=np.float32),
+            "availability": self._availability(rng, n),
+            "energy_level": rng.integers(0, len(ENERGY_LEVELS), n, dtype=np.int8),
+            "energy_consistency": rng.uniform(0.6, 1.0, n).astype(np.float32),
+            "reliability_score": rng.uniform(0.7, 1.0, n).astype(np.float32),
+            "response_rate": rng.uniform(0.75, 1.0, n).astype(np.float32),
+            "completion_rate": rng.uniform(0.80, 1.0, n).astype(np.float32),
+            "support_strengths": rng.uniform([0.6, 0.5, 0.6, 0.5], 1.0, (n, len(STRENGTHS))).astype(np.float32),
+        })
+
+    def seekers(self, n):
+        rng = self._rng()
+        # 1–3 distinct themes each (generate_seeker can repeat a theme; distinct reads more like a real vent)
+        k = rng.integers(1, 4, n)
+        order = np.argsort(rng.random((n, len(THEMES))), axis=1)
+        chosen = np.zeros((n, len(THEMES)), dtype=bool)
+        np.put_along_axis(chosen, order[:, :3], (np.arange(3)[None, :] < k[:, None]), axis=1)
+        themes = np.where(chosen, rng.uniform(0.6, 1.0, (n, len(THEMES))), 0.0).astype(np.float32)
+        return self._population("seeker", {
+            "themes": themes,
+            "embedding": self._embed(rng, themes),
+            "coping": rng.random((n, len(COPING_STYLES)), dtype=np.float32),
+            "conversation": rng.random((n, len(CONVERSATION_PREFERENCES)), dtype=np.float32),
+            "availability": self._availability(rng, n),
+            "energy_level": rng.integers(0, len(ENERGY_LEVELS), n, dtype=np.int8),
+            "distress_level": rng.integers(0, len(DISTRESS_LEVELS), n, dtype=np.int8),
+            "urgency": rng.uniform(0.3, 1.0, n).astype(np.float32),
+        })
+
+
+def helper_pool(n, seed=0, dim=EMBEDDING_DIM):
+    """n helper dicts in api.py's format (deterministic for a given seed)."""
+    return PopulationGenerator(seed, dim=dim).helpers(n).to_dicts()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark synthetic population generation.")
+    parser.add_argument("--helpers", type=int, default=1_000_000)
+    parser.add_argument("--seekers", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch", type=int, default=100_000, help="profiles per generated batch")
+    parser.add_argument("--export", type=int, default=100_000, help="how many helpers to export to dicts")
+    args = parser.parse_args()
+
+    gen = PopulationGenerator(args.seed)
+    print(f"\n{'stage':<26} {'profiles':>10} {'seconds':>8} {'profiles/min':>14} {'MB':>8}")
+    for role, total in (("helpers", args.helpers), ("seekers", args.seekers)):
+        start, size, n = time.perf_counter(), 0, 0
+        while n < total:
+            batch = getattr(gen, role)(min(args.batch, total - n))
+            n += len(batch)
+            size += batch.nbytes()
+        elapsed = time.perf_counter() - start
+        print(f"{role + ' (columnar)':<26} {n:>10,} {elapsed:>8.2f} {n / elapsed * 60:>14,.0f} {size / 1e6:>8.0f}")
+
+    batch = gen.helpers(args.export)
+    start = time.perf_counter()
+    pool = batch.to_dicts()
+    elapsed = time.perf_counter() - start
+    print(f"{'helpers → dicts':<26} {len(pool):>10,} {elapsed:>8.2f} {len(pool) / elapsed * 60:>14,.0f}")
+
+    a, b = PopulationGenerator(args.seed).helpers(1000), PopulationGenerator(args.seed).helpers(1000)
+    same = all(np.array_equal(a[k], b[k]) for k in a.columns)
+    print(f"\n{'✓' if same else '❌'} Same seed → identical population")
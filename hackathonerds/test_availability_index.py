@@ -0,0 +1,65 @@
+"""AvailabilityIndex bitmaps and set() bit math (python -m pytest -q test_availability_index.py)."""
+
+from datetime import datetime
+
+import numpy as np
+
+from availability_index import HOURS_PER_WEEK, AvailabilityIndex, window_buckets
+from synthetic import DAYS
+
+MONDAY_9AM = datetime(2026, 10, 19, 9)
+SUNDAY_11PM = datetime(2026, 10, 25, 23)
+
+
+def _windows(hours):
+    """availability_windows open exactly at the given hour-of-week buckets."""
+    week = np.zeros(HOURS_PER_WEEK, dtype=int)
+    week[list(hours)] = 1
+    return {day: week[i * 24:(i + 1) * 24].tolist() for i, day in enumerate(DAYS)}
+
+
+def _expected(helpers, buckets):
+    return [p for p, h in enumerate(helpers)
+            if any(h["availability_windows"][DAYS[b // 24]][b % 24] for b in buckets)]
+
+
+def test_matches_brute_force_across_word_boundaries():
+    rng = np.random.default_rng(0)
+    helpers = [{"availability_windows": _windows(np.flatnonzero(rng.random(HOURS_PER_WEEK) < 0.1))}
+               for _ in range(200)]
+    index = AvailabilityIndex(helpers)
+    for hours, now in ((1, MONDAY_9AM), (3, MONDAY_9AM), (2, SUNDAY_11PM)):
+        expected = _expected(helpers, window_buckets(hours, now))
+        assert index.positions(hours, now).tolist() == expected
+        assert index.count(hours, now) == len(expected)
+
+
+def test_set_touches_only_its_own_bit():
+    monday_9 = 9
+    helpers = [{"availability_windows": _windows([monday_9])} for _ in range(128)]
+    index = AvailabilityIndex(helpers)
+    for moved, position in enumerate((0, 1, 62, 63, 64, 127), start=1):  # word edges, incl. a uint64's top bit
+        index.set(position, _windows([monday_9 + 1]))
+        assert position not in index.positions(1, MONDAY_9AM).tolist()
+        assert index.count(1, MONDAY_9AM) == 128 - moved
+    assert index.positions(1, MONDAY_9AM.replace(hour=10)).tolist() == [0, 1, 62, 63, 64, 127]
+    index.set(63, _windows([monday_9]))  # and back
+    assert 63 in index.positions(1, MONDAY_9AM).tolist()
+    assert 63 not in index.positions(1, MONDAY_9AM.replace(hour=10)).tolist()
+
+
+def test_set_appends_and_grows():
+    index = AvailabilityIndex([])
+    assert len(index) == 0 and index.count() == 0
+    index.set(0, _windows([9]))
+    index.set(1, None)  # missing windows: always available
+    index.set(200, _windows([10]))  # past the allocated words
+    assert len(index) == 201
+    assert index.positions(1, MONDAY_9AM).tolist() == [0, 1]
+    assert index.positions(1, MONDAY_9AM.replace(hour=10)).tolist() == [1, 200]
+    assert index.mask(1, MONDAY_9AM).shape == (201,)
+
+
+def test_window_wraps_into_monday():
+    assert window_buckets(3, SUNDAY_11PM).tolist() == [167, 0, 1]
+    assert len(window_buckets(500, MONDAY_9AM)) == HOURS_PER_WEEK
@@ -0,0 +1,145 @@
+"""MatchLedger claim / duplicate / release and the shared feedback log (python -m pytest -q test_feedback_buffer.py)."""
+
+import pickle
+import time
+
+import pytest
+
+from feedback_buffer import BufferFull, FeedbackBuffer, FeedbackLog, MatchLedger, read_feedback_log
+
+FEATURES = {"emotional_similarity": 0.7, "experience_overlap": 0.4}
+
+
+def _entry(i):
+    return {"match_id": f"m{i}", "seeker_id": "s", "helper_id": f"h{i}", "features": FEATURES, "outcome": {}}
+
+
+# ── MatchLedger ──
+
+def test_claim_then_duplicate(tmp_path):
+    ledger = MatchLedger(str(tmp_path / "ledger.db"))
+    ledger.record("m1", "s1", "h1", FEATURES)
+    record, problem = ledger.claim("m1")
+    assert problem is None
+    assert (record["seeker_id"], record["helper_id"], record["features"]) == ("s1", "h1", FEATURES)
+    assert ledger.claim("m1") == (None, "duplicate")
+
+
+def test_unknown_and_expired(tmp_path):
+    ledger = MatchLedger(str(tmp_path / "ledger.db"), ttl_s=-1)
+    assert ledger.claim("nope") == (None, "unknown")
+    ledger.record("m1", "s1", "h1", FEATURES)
+    assert ledger.claim("m1") == (None, "unknown")
+    assert len(ledger) == 0
+
+
+def test_release_allows_a_retry(tmp_path):
+    ledger = MatchLedger(str(tmp_path / "ledger.db"))
+    ledger.record("m1", "s1", "h1", FEATURES)
+    ledger.claim("m1")
+    ledger.release("m1")
+    record, problem = ledger.claim("m1")
+    assert problem is None and record["helper_id"] == "h1"
+
+
+def test_ledger_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    worker_a, worker_b = MatchLedger(path), MatchLedger(path)
+    worker_a.record_many([("m1", "s1", "h1", FEATURES), ("m2", "s1", "h2", FEATURES)])
+    assert worker_b.claim("m2")[1] is None  # /feedback on another worker than its /match
+    assert worker_a.claim("m2") == (None, "duplicate")
+    assert len(worker_b) == 2
+
+
+def test_ledger_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr("feedback_buffer.LEDGER_PRUNE_EVERY", 10)
+    ledger = MatchLedger(str(tmp_path / "ledger.db"), max_entries=5)
+    ledger.record_many([(f"m{i}", "s", f"h{i}", FEATURES) for i in range(20)])
+    assert len(ledger) == 5
+    assert ledger.claim("m0") == (None, "unknown")
+    assert ledger.claim("m19")[1] is None
+
+
+# ── FeedbackLog ──
+
+def test_log_appends_are_seen_by_other_workers(tmp_path):
+    path = str(tmp_path / "feedback.pkl")
+    worker_a, worker_b = FeedbackLog(path), FeedbackLog(path)
+    worker_a.append([_entry(0), _entry(1)])
+    worker_b.append([_entry(2)])
+    worker_a.append([_entry(3)])
+    expected = ["m0", "m1", "m2", "m3"]
+    assert [e["match_id"] for e in worker_a.refresh()] == expected
+    assert [e["match_id"] for e in worker_b.refresh()] == expected
+    assert [e["match_id"] for e in read_feedback_log(path)[0]] == expected
+
+
+def test_log_reads_legacy_single_pickle(tmp_path):
+    path = str(tmp_path / "feedback.pkl")
+    with open(path, "wb") as f:
+        pickle.dump([_entry(0), _entry(1)], f)  # the pre-log format: one pickled list
+    log = FeedbackLog(path)
+    log.append([_entry(2)])
+    assert [e["match_id"] for e in FeedbackLog(path).refresh()] == ["m0", "m1", "m2"]
+
+
+def test_log_recovers_from_a_torn_append(tmp_path):
+    path = str(tmp_path / "feedback.pkl")
+    FeedbackLog(path).append([_entry(0)])
+    blob = pickle.dumps([_entry(1)])
+    with open(path, "ab") as f:
+        f.write(blob[:len(blob) // 2])  # a writer crashed mid-append
+    log = FeedbackLog(path)
+    assert [e["match_id"] for e in log.refresh()] == ["m0"]
+    log.append([_entry(2)])
+    assert [e["match_id"] for e in FeedbackLog(path).refresh()] == ["m0", "m2"]
+
+
+# ── FeedbackBuffer ──
+
+class ListStore:
+    def __init__(self, fail=False):
+        self.data, self.fail = [], fail
+
+    def add_feedback_batch(self, batch):
+        if self.fail:
+            raise OSError("disk full")
+        self.data.extend(batch)
+
+
+def test_buffer_flushes_in_one_batch():
+    store = ListStore()
+    buffer = FeedbackBuffer(store, flush_size=100, flush_interval_s=60)
+    for i in range(3):
+        buffer.put(_entry(i))
+    assert buffer.flush() == 3
+    assert [e["match_id"] for e in store.data] == ["m0", "m1", "m2"]
+    assert len(buffer) == 0
+
+
+def test_buffer_keeps_records_when_the_store_fails():
+    buffer = FeedbackBuffer(ListStore(fail=True), flush_size=100, flush_interval_s=60)
+    buffer.put(_entry(0))
+    with pytest.raises(OSError):
+        buffer.flush()
+    assert len(buffer) == 1
+
+
+def test_buffer_full_rejects():
+    buffer = FeedbackBuffer(ListStore(), max_size=1)
+    buffer.put(_entry(0))
+    with pytest.raises(BufferFull):
+        buffer.put(_entry(1))
+
+
+def test_background_flush_by_time():
+    store = ListStore()
+    buffer = FeedbackBuffer(store, flush_size=100, flush_interval_s=0.05).start()
+    try:
+        buffer.put(_entry(0))
+        deadline = time.monotonic() + 5
+        while not store.data and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert [e["match_id"] for e in store.data] == ["m0"]
+    finally:
+        buffer.close()
@@ -0,0 +1,84 @@
+"""HelperStore compaction, snapshot + delta replay and cross-worker polling (python -m pytest -q test_helper_store.py)."""
+
+import numpy as np
+
+from helper_store import HelperStore, HelperWatcher
+from synthetic import helper_pool
+
+DIM = 8
+
+
+def _helpers(n, seed=0):
+    return helper_pool(n, seed=seed, dim=DIM)
+
+
+def _updated(helper, reliability):
+    return {**helper, "reliability_score": reliability, "emotion_embedding": -helper["emotion_embedding"]}
+
+
+def _by_id(pool):
+    return {h["user_id"]: h for h in pool}
+
+
+def test_compact_reclaims_dead_rows_and_keeps_embeddings(tmp_path):
+    store = HelperStore(str(tmp_path))
+    helpers = _helpers(10)
+    store.upsert_many(helpers)
+    updates = [_updated(h, 0.5) for h in helpers[:3]]
+    store.upsert_many(updates)
+    assert store.embedding_rows() == (10, 13)
+
+    assert store.compact() == 3
+    assert store.embedding_rows() == (10, 10)
+    assert store.compact() == 0
+    expected = _by_id(updates + helpers[3:])
+    for user_id, helper in expected.items():
+        np.testing.assert_array_equal(store.get(user_id)["emotion_embedding"], helper["emotion_embedding"])
+    store.upsert(_updated(helpers[5], 0.4))  # writes after a compaction land in the new file
+    np.testing.assert_array_equal(store.get(helpers[5]["user_id"])["emotion_embedding"],
+                                  -helpers[5]["emotion_embedding"])
+
+
+def test_load_pool_replays_writes_newer_than_the_snapshot(tmp_path):
+    store = HelperStore(str(tmp_path))
+    helpers = _helpers(20)
+    store.upsert_many(helpers)
+    store.write_snapshot()
+    newcomer = {**_helpers(1, seed=1)[0], "user_id": "h_new"}
+    store.upsert_many([_updated(helpers[4], 0.1), newcomer])
+
+    for lazy_min in (0, 10_000):  # HelperViews and plain dicts
+        pool = store.load_pool(lazy_min=lazy_min)
+        assert [h["user_id"] for h in pool] == [h["user_id"] for h in helpers] + ["h_new"]
+        assert pool[4]["reliability_score"] == 0.1
+        np.testing.assert_array_equal(pool[4]["emotion_embedding"], -helpers[4]["emotion_embedding"])
+        assert pool[5]["reliability_score"] == helpers[5]["reliability_score"]
+
+
+def test_load_pool_after_compaction(tmp_path):
+    store = HelperStore(str(tmp_path))
+    helpers = _helpers(10)
+    store.upsert_many(helpers)
+    store.write_snapshot()
+    store.upsert(_updated(helpers[2], 0.2))
+    store.compact()
+    pool = _by_id(store.load_pool(lazy_min=0))
+    np.testing.assert_array_equal(pool[helpers[2]["user_id"]]["emotion_embedding"], -helpers[2]["emotion_embedding"])
+    np.testing.assert_array_equal(pool[helpers[7]["user_id"]]["emotion_embedding"], helpers[7]["emotion_embedding"])
+
+
+def test_watcher_applies_writes_from_another_worker(tmp_path):
+    writer, reader = HelperStore(str(tmp_path)), HelperStore(str(tmp_path))
+    helpers = _helpers(5)
+    writer.upsert_many(helpers)
+    applied = []
+    watcher = HelperWatcher(reader, lambda batch, seq: applied.append((batch, seq)), reader.seq)
+
+    assert watcher.poll() == 0
+    seq = writer.upsert(_updated(helpers[1], 0.3))
+    assert watcher.poll() == 1
+    (batch, batch_seq), = applied
+    assert batch_seq == seq == watcher.seq
+    assert batch[0]["user_id"] == helpers[1]["user_id"] and batch[0]["reliability_score"] == 0.3
+    np.testing.assert_array_equal(batch[0]["emotion_embedding"], -helpers[1]["emotion_embedding"])
+    assert watcher.poll() == 0
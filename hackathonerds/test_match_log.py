@@ -0,0 +1,57 @@
+"""MatchLog pool versioning and filtered-request positions (python -m pytest -q test_match_log.py)."""
+
+import os
+import time
+
+import numpy as np
+
+from match_log import MatchLog, decode_positions, encode_positions, load_pool, read_log, request_pool
+
+SEEKER = {"user_id": "s1", "emotion_embedding": np.ones(4, dtype=np.float32)}
+
+
+def _pool(n=50, rating=0.8):
+    return [{"user_id": f"h{i}", "reliability_score": rating} for i in range(n)]
+
+
+def _wait_for_lines(directory, n):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        records = list(read_log(directory))
+        if len(records) >= n:
+            return records
+        time.sleep(0.01)
+    raise AssertionError(f"expected {n} logged requests")
+
+
+def test_positions_round_trip():
+    positions = [0, 3, 4, 999]
+    assert decode_positions(encode_positions(positions, 1000)).tolist() == positions
+    assert decode_positions(encode_positions([], 10)).tolist() == []
+
+
+def test_updated_profile_gets_a_new_snapshot(tmp_path):
+    directory = str(tmp_path)
+    log = MatchLog(directory)
+    pool = _pool()
+    log.log(SEEKER, pool, [("m1", "h1", 0.9)], pool_version=1)
+    pool[1] = {"user_id": "h1", "reliability_score": 0.1}  # POST /helpers: same ids, same length
+    log.log(SEEKER, pool, [("m2", "h1", 0.5)], pool_version=2)
+    first, second = _wait_for_lines(directory, 2)
+    assert first["pool_id"] == second["pool_id"]
+    assert load_pool(directory, first["pool_id"], first["pool_version"])[1]["reliability_score"] == 0.8
+    assert load_pool(directory, second["pool_id"], second["pool_version"])[1]["reliability_score"] == 0.1
+
+
+def test_filtered_requests_share_one_snapshot(tmp_path):
+    directory = str(tmp_path)
+    log = MatchLog(directory)
+    pool = _pool()
+    for i, positions in enumerate([[1, 2, 3], [10, 20], None]):
+        log.log(SEEKER, pool, [(f"m{i}", "h1", 0.5)], pool_version=7, positions=positions)
+    records = _wait_for_lines(directory, 3)
+    assert len([name for name in os.listdir(directory) if name.startswith("pool-")]) == 1
+    full = load_pool(directory, records[0]["pool_id"], 7)
+    assert [h["user_id"] for h in request_pool(records[0], full)] == ["h1", "h2", "h3"]
+    assert [h["user_id"] for h in request_pool(records[1], full)] == ["h10", "h20"]
+    assert len(request_pool(records[2], full)) == len(pool)
@@ -0,0 +1,95 @@
+"""HelperPrefilter filters and relax semantics (python -m pytest -q test_prefilter.py)."""
+
+from datetime import datetime
+
+import pytest
+
+from local_test_matcher import THEMES
+from prefilter import HelperPrefilter, PrefilterStats, merge_reports, parse_filters
+
+MONDAY_9AM = datetime(2026, 10, 19, 9)
+THEME = THEMES[0]
+SEEKER = {"distress_level": "High", "energy_level": "depleted", "themes": [{"name": THEME, "intensity": 0.9}]}
+
+
+def _helper(reliability=0.9, energy="moderate", theme=0.8, available=True):
+    return {
+        "energy_level": energy,
+        "themes_experience": {THEME: theme},
+        "reliability_score": reliability, "response_rate": reliability, "completion_rate": reliability,
+        "availability_windows": None if available else {"Mon": [0] * 24},
+    }
+
+
+def _steps(report):
+    return {step["filter"]: (step["in"], step["kept"], step["relaxed"]) for step in report["filters"]}
+
+
+def test_parse_filters_defaults_and_unknown():
+    assert parse_filters("available:3, energy") == [("available", 3.0), ("energy", 2.0)]
+    with pytest.raises(ValueError):
+        parse_filters("nope")
+
+
+def test_filters_narrow_in_order():
+    helpers = [_helper() for _ in range(6)] + [_helper(reliability=0.3) for _ in range(3)] + [_helper(theme=0.1)]
+    prefilter = HelperPrefilter(helpers, spec="reliability:0.75,themes:0.5", min_candidates=2)
+    positions, report = prefilter.select(SEEKER)
+    assert positions.tolist() == [0, 1, 2, 3, 4, 5]
+    assert _steps(report) == {"reliability:0.75": (10, 7, False), "themes:0.5": (7, 6, False)}
+    assert (report["candidates"], report["kept"]) == (10, 6)
+
+
+def test_filter_below_min_candidates_is_relaxed_and_later_filters_still_apply():
+    helpers = [_helper(reliability=0.3, theme=0.1 if i < 4 else 0.8) for i in range(10)] + [_helper()]
+    prefilter = HelperPrefilter(helpers, spec="reliability:0.75,themes:0.5", min_candidates=5)
+    positions, report = prefilter.select(SEEKER)
+    # reliability would keep 1 < 5: skipped; themes then runs on all 11 and keeps 7
+    assert _steps(report) == {"reliability:0.75": (11, 1, True), "themes:0.5": (11, 7, False)}
+    assert positions.tolist() == [4, 5, 6, 7, 8, 9, 10]
+
+
+def test_small_input_only_relaxes_a_filter_that_would_drop_someone():
+    helpers = [_helper() for _ in range(3)]
+    prefilter = HelperPrefilter(helpers, spec="reliability:0.75", min_candidates=20)
+    positions, report = prefilter.select(SEEKER)
+    assert positions.tolist() == [0, 1, 2]
+    assert _steps(report) == {"reliability:0.75": (3, 3, False)}
+
+    prefilter.upsert(1, _helper(reliability=0.1))
+    positions, report = prefilter.select(SEEKER)
+    assert positions.tolist() == [0, 1, 2]  # 2 < min(20, 3): relaxed rather than shrinking a tiny pool
+    assert _steps(report) == {"reliability:0.75": (3, 2, True)}
+
+
+def test_filters_that_do_not_apply_are_not_reported():
+    helpers = [_helper(energy="high") for _ in range(3)] + [_helper(energy="low")]
+    prefilter = HelperPrefilter(helpers, spec="energy:1", min_candidates=1)
+    positions, report = prefilter.select({**SEEKER, "distress_level": "Low"})
+    assert len(positions) == 4 and report["filters"] == []
+    positions, report = prefilter.select(SEEKER)  # High distress, depleted: nobody over 1 level above
+    assert positions.tolist() == [3]
+
+
+def test_upsert_appends_and_updates_owned_index():
+    helpers = [_helper(available=False) for _ in range(3)]
+    prefilter = HelperPrefilter(helpers, spec="available:1", min_candidates=1)
+    assert prefilter.select(SEEKER, now=MONDAY_9AM)[0].tolist() == [0, 1, 2]  # all offline: relaxed
+    prefilter.upsert(3, _helper())
+    prefilter.upsert(1, _helper())
+    positions, report = prefilter.select(SEEKER, now=MONDAY_9AM)
+    assert positions.tolist() == [1, 3]
+    assert report["candidates"] == 4
+
+
+def test_merge_reports_and_stats():
+    a = {"candidates": 10, "kept": 4, "filters": [{"filter": "themes:0.5", "in": 10, "kept": 4, "relaxed": False}]}
+    b = {"candidates": 10, "kept": 10, "filters": [{"filter": "themes:0.5", "in": 10, "kept": 1, "relaxed": True}]}
+    merged = merge_reports([a, None, b])
+    assert merged == {"candidates": 20, "kept": 14,
+                      "filters": [{"filter": "themes:0.5", "in": 20, "kept": 5, "relaxed": 1}]}
+    stats = PrefilterStats()
+    stats.record(merged)
+    status = stats.status()
+    assert status["selectivity"] == 0.7
+    assert status["filters"]["themes:0.5"]["relaxed"] == 1
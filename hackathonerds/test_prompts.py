@@ -0,0 +1,25 @@
+"""Token budgeting helpers in prompts.py (python -m pytest -q test_prompts.py)."""
+
+from prompts import clip_text, count_tokens, split_text
+
+
+def test_short_text_is_one_chunk():
+    assert split_text("I feel fine today.", 100) == ["I feel fine today."]
+
+
+def test_chunks_cover_the_whole_text():
+    text = " ".join(f"word{i}" for i in range(3000))
+    chunks = split_text(text, 200, overlap=20)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks)
+    assert chunks[0].startswith("word0 ") and chunks[-1].endswith("word2999")
+    covered = set(" ".join(chunks).split())
+    assert {f"word{i}" for i in range(1, 2999)} <= covered  # nothing in the middle is lost
+
+
+def test_clip_text_drops_the_middle():
+    text = "start " + "filler " * 5000 + "MIDDLE " + "filler " * 5000 + "end"
+    clipped = clip_text(text, 200)
+    assert clipped.startswith("start") and clipped.endswith("end")
+    assert "MIDDLE" not in clipped
+    assert any("MIDDLE" in chunk for chunk in split_text(text, 200))
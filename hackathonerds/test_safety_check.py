@@ -0,0 +1,68 @@
+"""/safety-check on long transcripts: every part is classified, truncation never yields "low"."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import api
+
+RISKY = "Last night I took all of my pills and wrote goodbye letters."
+
+
+def _transcript(middle=RISKY, words=4000):
+    filler = "Work has been a lot lately and I keep replaying the same conversations. "
+    half = filler * (words // 24)
+    return half + middle + " " + half
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Fake GPT-4o: "high" for the chunk that contains the risky sentence, "low" otherwise."""
+    calls = []
+
+    def chat_completion(endpoint, messages, **kwargs):
+        text = messages[-1]["content"]
+        calls.append(text)
+        level = "high" if "pills" in text else "low"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=level))])
+
+    monkeypatch.setattr(api, "openai_client", object())
+    monkeypatch.setattr(api, "_chat_completion", chat_completion)
+    return calls
+
+
+def _check(text):
+    return asyncio.run(api.safety_check(api.SafetyRequest(transcript=text)))
+
+
+def test_risk_in_the_middle_of_a_long_vent_is_found(llm):
+    result = _check(_transcript())
+    assert len(llm) > 1  # split, not clipped
+    assert result.risk_level == "high"
+    assert result.tier == "llm"
+
+
+def test_short_text_is_one_call(llm):
+    result = _check("Exams are stressing me out a bit.")
+    assert len(llm) == 1
+    assert result.risk_level == "low"
+
+
+def test_truncated_text_is_never_low(llm, monkeypatch):
+    monkeypatch.setattr(api, "SAFETY_MAX_CHUNKS", 2)
+    result = _check(_transcript(middle="Nothing much else happened."))
+    assert len(llm) == 2
+    assert result.risk_level == "medium"
+
+
+def test_fallback_after_truncation_is_never_low(llm, monkeypatch):
+    monkeypatch.setattr(api, "SAFETY_MAX_CHUNKS", 2)
+
+    def broken(endpoint, messages, **kwargs):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(api, "_chat_completion", broken)
+    result = _check(_transcript(middle="A calmer week overall."))
+    assert result.tier == "fallback"
+    assert result.risk_level == "medium"
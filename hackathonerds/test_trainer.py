@@ -0,0 +1,116 @@
+"""BackgroundTrainer publish / reject gating (python -m pytest -q test_trainer.py)."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import lightgbm as lgb
+import numpy as np
+import pytest
+
+import trainer
+from trainer import BackgroundTrainer
+
+
+class FakeStore:
+    def __init__(self, X, y):
+        self.X, self.y = X, y
+        self.data = list(range(len(X)))
+
+    def get_training_data(self, window=None):
+        return self.X[-window:], self.y[-window:]
+
+
+class FakeMatcher:
+    def __init__(self, model=None):
+        self.model = model
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, model, metrics=None, activate=True):
+        self.published.append(metrics)
+        return f"v{len(self.published)}"
+
+
+def _data(n=600, features=4, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n, features))
+    return X, (X[:, 0] > 0.5).astype(float) * 0.8 + 0.1 * X[:, 1]
+
+
+def _booster(X, y, rounds):
+    params = {"objective": "regression", "learning_rate": 0.2, "num_leaves": 15, "verbose": -1}
+    return lgb.train(params, lgb.Dataset(X, label=y), num_boost_round=rounds)
+
+
+@pytest.fixture
+def make_trainer():
+    trainers = []
+
+    def make(model=None, data=None):
+        X, y = data if data is not None else _data()
+        t = BackgroundTrainer(FakeStore(X, y), FakeMatcher(model), FakeRegistry(), window=len(X))
+        t._executor = ThreadPoolExecutor(max_workers=1)  # no spawned child in tests
+        trainers.append(t)
+        return t
+
+    yield make
+    for t in trainers:
+        t.stop()
+
+
+def test_publishes_first_model(make_trainer):
+    t = make_trainer()
+    report = t.run_once()
+    assert report["result"] == "published"
+    assert report["baseline_rmse"] is None
+    assert len(t.registry.published) == 1
+
+
+def test_cold_run_is_still_checked_against_active_model(make_trainer):
+    X, y = _data()
+    active = _booster(X, y, rounds=300)  # far better than 50 cold rounds at the trainer's learning rate
+    t = make_trainer(active, (X, y))
+    report = t.run_once(cold=True)
+    assert report["warm_start"] is False
+    assert report["baseline_rmse"] is not None
+    assert report["result"] == "rejected"
+    assert t.registry.published == []
+
+
+def test_tree_cap_run_is_still_checked_against_active_model(make_trainer, monkeypatch):
+    X, y = _data()
+    monkeypatch.setattr(trainer, "TRAIN_MAX_TREES", 1)
+    t = make_trainer(_booster(X, y, rounds=300), (X, y))
+    report = t.run_once()
+    assert report["warm_start"] is False
+    assert report["result"] == "rejected"
+    assert t.registry.published == []
+
+
+def test_warm_start_that_improves_is_published(make_trainer):
+    X, y = _data()
+    t = make_trainer(_booster(X, y, rounds=2), (X, y))
+    report = t.run_once()
+    assert report["warm_start"] is True
+    assert report["rmse"] <= report["baseline_rmse"]
+    assert report["result"] == "published"
+
+
+def test_rejects_when_active_model_cannot_score_holdout(make_trainer):
+    X, y = _data()
+    other = _booster(*_data(features=7), rounds=5)  # different feature set: no baseline possible
+    t = make_trainer(other, (X, y))
+    report = t.run_once(cold=True)
+    assert report["baseline_rmse"] is None
+    assert report["result"] == "rejected"
+    assert "holdout" in report["reason"]
+    assert t.registry.published == []
+
+
+def test_skips_tiny_window(make_trainer):
+    X, y = _data(n=5)
+    t = make_trainer(data=(X, y))
+    assert t.run_once()["result"] == "skipped"
+    assert t.registry.published == []
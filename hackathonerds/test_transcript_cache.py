@@ -0,0 +1,99 @@
+"""TranscriptCache coalescing, TTL and LRU bounds (python -m pytest -q test_transcript_cache.py)."""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from transcript_cache import TranscriptCache, content_key
+
+ENTRY = {"text": "hello there", "segments": []}
+
+
+def _blocking_compute(result, calls, release):
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+    return compute
+
+
+def _wait_for_inflight(cache, key):
+    deadline = time.monotonic() + 5
+    while key not in cache._inflight and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_concurrent_requests_share_one_compute(tmp_path):
+    cache = TranscriptCache(str(tmp_path))
+    calls, release = [], threading.Event()
+    compute = _blocking_compute((ENTRY, True), calls, release)
+    with ThreadPoolExecutor(4) as pool:
+        first = pool.submit(cache.get_or_compute, "k", compute)
+        _wait_for_inflight(cache, "k")
+        others = [pool.submit(cache.get_or_compute, "k", compute) for _ in range(3)]
+        time.sleep(0.1)  # let the waiters reach the in-flight future
+        release.set()
+        results = [first.result()] + [f.result() for f in others]
+    assert len(calls) == 1
+    assert results[0] == (ENTRY, "miss")
+    assert all(result == (ENTRY, "coalesced") for result in results[1:])
+    assert cache.get_or_compute("k", compute) == (ENTRY, "hit")
+    assert len(calls) == 1 and cache._inflight == {}
+
+
+def test_failure_reaches_waiters_and_is_not_cached(tmp_path):
+    cache = TranscriptCache(str(tmp_path))
+    calls, release = [], threading.Event()
+    compute = _blocking_compute(RuntimeError("decode failed"), calls, release)
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(cache.get_or_compute, "k", compute)
+        _wait_for_inflight(cache, "k")
+        waiter = pool.submit(cache.get_or_compute, "k", compute)
+        time.sleep(0.1)  # let the waiters reach the in-flight future
+        release.set()
+        for future in (first, waiter):
+            with pytest.raises(RuntimeError):
+                future.result()
+    assert len(calls) == 1 and len(cache) == 0 and cache._inflight == {}
+    assert cache.get_or_compute("k", lambda: (ENTRY, True)) == (ENTRY, "miss")  # next request retries
+
+
+def test_uncacheable_result_is_shared_but_not_stored(tmp_path):
+    cache = TranscriptCache(str(tmp_path))
+    assert cache.get_or_compute("k", lambda: (ENTRY, False)) == (ENTRY, "miss")
+    assert len(cache) == 0 and cache.get("k") is None
+    assert cache.get_or_compute(None, lambda: (ENTRY, True)) == (ENTRY, "bypass")
+    assert len(cache) == 0
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = TranscriptCache(str(tmp_path), ttl_s=60)
+    cache.put("k", ENTRY)
+    past = time.time() - 120
+    os.utime(cache._path("k"), (past, past))
+    assert cache.get("k") is None
+    assert len(cache) == 0 and not os.path.exists(cache._path("k"))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    entry_bytes = len('{"text": "xxxxxxxxxx"}')
+    cache = TranscriptCache(str(tmp_path), max_bytes=2 * entry_bytes)
+    for age, key in ((20, "a"), (10, "b")):
+        cache.put(key, {"text": "x" * 10})
+        os.utime(cache._path(key), (time.time() - age, time.time() - age))
+    cache.get("a")  # a hit makes "a" the most recent
+    cache.put("c", {"text": "x" * 10})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert len(TranscriptCache(str(tmp_path))) == 2  # sizes rebuilt from disk
+
+
+def test_content_key_depends_on_stt_config():
+    assert content_key(b"audio", "tiny") == content_key(b"audio", "tiny")
+    assert content_key(b"audio", "tiny") != content_key(b"audio", "base")
+    assert content_key(b"audio", "tiny") != content_key(b"audio2", "tiny")
@@ -0,0 +1,335 @@
+"""
+Lightweight request tracing with nested spans (no OpenTelemetry SDK needed).
+
+A trace is started per request by the API middleware; code anywhere below it
+opens spans with a context manager:
+
+    with span("generate_emotion_embedding", mode=EMBEDDING_MODE):
+        ...
+    for helper in helpers:
+        with span("compute_dha_match_score", aggregate=True):   # one child, count + total
+            ...
+
+When the current request isn't sampled, span() returns a shared no-op context,
+so instrumented hot loops cost one ContextVar lookup per call.
+
+Sampling:   TRACE_SAMPLE_RATE (0.0–1.0, default 0.01). An incoming W3C
+            `traceparent` header with the sampled flag, or ?debug_trace=1, forces it.
+Export:     TRACE_EXPORT=file  → TRACE_FILE (JSONL, default traces.jsonl)
+            TRACE_EXPORT=otlp  → OTLP/HTTP JSON to TRACE_OTLP_ENDPOINT
+            (default http://localhost:4318/v1/traces). Export runs on a
+            background thread and never blocks a request.
+
+Local collector stub + viewer:
+    python tracing.py collect --port 4318 --out traces.jsonl
+    python tracing.py show traces.jsonl [--trace-id <id>]
+"""
+
+import os
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+logger = logging.getLogger("bridge.tracing")
+
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+EXPORT = os.getenv("TRACE_EXPORT", "")  # "" | file | otlp
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "bridge-api")
+
+TRACE_HEADER = "X-Trace-Id"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_trace = ContextVar("bridge_trace", default=None)
+_current_span = ContextVar("bridge_span", default=None)
+_NOOP = nullcontext()
+
+
+def _new_id(nbytes):
+    return "%0*x" % (nbytes * 2, random.getrandbits(nbytes * 8))
+
+
+class Trace:
+    """All spans recorded for one request (flat list; tree built on demand)."""
+
+    def __init__(self, trace_id=None, parent_span_id=None):
+        self.trace_id = trace_id or _new_id(16)
+        self.parent_span_id = parent_span_id  # remote parent from `traceparent`
+        self.spans = []
+        self.aggregates = {}  # (parent_id, name) → aggregated span record
+
+    def tree(self):
+        """Nested span dicts (children under "children"); open spans report elapsed so far."""
+        nodes = {s["span_id"]: {**_public(s), "children": []} for s in self.spans}
+        roots = []
+        for s in self.spans:
+            parent = nodes.get(s["parent_id"])
+            (parent["children"] if parent else roots).append(nodes[s["span_id"]])
+        return {"trace_id": self.trace_id, "spans": roots}
+
+
+def _public(s):
+    duration = s["duration_s"] if s["duration_s"] is not None else time.perf_counter() - s["_t0"]
+    out = {"name": s["name"], "duration_ms": round(duration * 1000, 3)}
+    if s["count"] > 1 or s["aggregate"]:
+        out["count"] = s["count"]
+    if s["attrs"]:
+        out["attrs"] = s["attrs"]
+    return out
+
+
+def current_trace():
+    """The sampled trace for this request, or None."""
+    return _current_trace.get()
+
+
+def should_sample(traceparent=None, force=False):
+    """(sampled, trace_id, parent_span_id) for an incoming request."""
+    match = _TRACEPARENT.match((traceparent or "").strip().lower())
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        return force or bool(int(flags, 16) & 1), trace_id, parent_id
+    return force or random.random() < SAMPLE_RATE, None, None
+
+
+@contextmanager
+def start_trace(name, sampled, trace_id=None, parent_span_id=None, **attrs):
+    """Root span for one request. Yields the Trace (None when not sampled)."""
+    if not sampled:
+        yield None
+        return
+    trace = Trace(trace_id, parent_span_id)
+    trace_token = _current_trace.set(trace)
+    try:
+        with span(name, **attrs):
+            yield trace
+    finally:
+        _current_trace.reset(trace_token)
+        export(trace)
+
+
+def span(name, aggregate=False, **attrs):
+    """
+    Child span of the current span. With aggregate=True, repeated calls under
+    the same parent fold into a single span carrying a count and total duration.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP
+    return _span(trace, name, aggregate, attrs)
+
+
+@contextmanager
+def _span(trace, name, aggregate, attrs):
+    parent = _current_span.get()
+    parent_id = parent["span_id"] if parent else None
+    record = trace.aggregates.get((parent_id, name)) if aggregate else None
+    if record is None:
+        record = {
+            "name": name,
+            "span_id": _new_id(8),
+            "parent_id": parent_id,
+            "start_ns": time.time_ns(),
+            "duration_s": 0.0 if aggregate else None,
+            "_t0": time.perf_counter(),
+            "count": 0,
+            "aggregate": aggregate,
+            "attrs": dict(attrs),
+        }
+        trace.spans.append(record)
+        if aggregate:
+            trace.aggregates[(parent_id, name)] = record
+    token = _current_span.set(record)
+    t0 = time.perf_counter()
+    try:
+        yield record
+    finally:
+        _current_span.reset(token)
+        elapsed = time.perf_counter() - t0
+        record["count"] += 1
+        record["duration_s"] = (record["duration_s"] or 0.0) + elapsed if aggregate else elapsed
+
+
+def set_attribute(key, value):
+    """Attach an attribute to the current span (no-op when not sampled)."""
+    current = _current_span.get()
+    if current is not None and _current_trace.get() is not None:
+        current["attrs"][key] = value
+
+
+# ── Export (background thread) ───────────────────────────────────────────────
+
+_export_queue = queue.Queue(maxsize=1000)
+_export_thread = None
+_export_lock = threading.Lock()
+
+
+def export(trace):
+    """Queue a finished trace for the configured exporter (drops when the queue is full)."""
+    global _export_thread
+    if not EXPORT:
+        return
+    if _export_thread is None:
+        with _export_lock:
+            if _export_thread is None:
+                _export_thread = threading.Thread(target=_export_loop, name="trace-export", daemon=True)
+                _export_thread.start()
+    try:
+        _export_queue.put_nowait(trace)
+    except queue.Full:
+        logger.warning("Trace export queue full; dropping trace %s", trace.trace_id)
+
+
+def _export_loop():
+    while True:
+        trace = _export_queue.get()
+        try:
+            if EXPORT == "otlp":
+                _post_otlp(to_otlp(trace))
+            else:
+                with open(TRACE_FILE, "a") as f:
+                    f.write(json.dumps(trace.tree()) + "\n")
+        except Exception:
+            logger.error("Trace export failed (%s)", EXPORT, exc_info=True)
+
+
+def to_otlp(trace):
+    """OTLP/HTTP JSON payload (resourceSpans) for one trace."""
+    spans = []
+    for s in trace.spans:
+        end_ns = s["start_ns"] + int((s["duration_s"] or 0.0) * 1e9)
+        attrs = [{"key": k, "value": {"stringValue": str(v)}} for k, v in s["attrs"].items()]
+        if s["aggregate"]:
+            attrs.append({"key": "bridge.span.count", "value": {"intValue": str(s["count"])}})
+        parent_id = s["parent_id"] or trace.parent_span_id or ""
+        spans.append({
+            "traceId": trace.trace_id,
+            "spanId": s["span_id"],
+            "parentSpanId": parent_id,
+            "name": s["name"],
+            "kind": 2 if not s["parent_id"] else 1,  # SERVER for the root, INTERNAL below
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": attrs,
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "bridge.tracing"}, "spans": spans}],
+    }]}
+
+
+def _post_otlp(payload):
+    req = urllib.request.Request(
+        OTLP_ENDPOINT, data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        resp.read()
+
+
+# ── Collector stub + viewer ──────────────────────────────────────────────────
+
+def _otlp_to_tree(payload):
+    """Rebuild span trees (one per trace ID) from an OTLP JSON payload."""
+    traces = {}
+    for rs in payload.get("resourceSpans", []):
+        for ss in rs.get("scopeSpans", []):
+            for s in ss.get("spans", []):
+                traces.setdefault(s["traceId"], []).append(s)
+    out = []
+    for trace_id, spans in traces.items():
+        ids = {s["spanId"] for s in spans}
+        nodes = {}
+        for s in spans:
+            attrs = {a["key"]: next(iter(a["value"].values())) for a in s.get("attributes", [])}
+            node = {
+                "name": s["name"],
+                "duration_ms": round((int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6, 3),
+                "children": [],
+            }
+            if "bridge.span.count" in attrs:
+                node["count"] = int(attrs.pop("bridge.span.count"))
+            if attrs:
+                node["attrs"] = attrs
+            nodes[s["spanId"]] = node
+        roots = []
+        for s in spans:
+            parent = s.get("parentSpanId")
+            (nodes[parent]["children"] if parent in ids else roots).append(nodes[s["spanId"]])
+        out.append({"trace_id": trace_id, "spans": roots})
+    return out
+
+
+def _print_tree(tree):
+    print(f"trace {tree['trace_id']}")
+
+    def walk(node, depth):
+        count = f" ×{node['count']}" if "count" in node else ""
+        print(f"  {'  ' * depth}{node['name']:<{40 - 2 * depth}} {node['duration_ms']:>10.3f} ms{count}")
+        for child in node["children"]:
+            walk(child, depth + 1)
+
+    for root in tree["spans"]:
+        walk(root, 0)
+
+
+def _collect(port, out_path):
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                trees = _otlp_to_tree(json.loads(body))
+            except Exception:
+                self.send_response(400)
+                self.end_headers()
+                return
+            with open(out_path, "a") as f:
+                for tree in trees:
+                    f.write(json.dumps(tree) + "\n")
+                    _print_tree(tree)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    print(f"✓ OTLP collector stub listening on :{port}/v1/traces → {out_path}")
+    HTTPServer(("0.0.0.0", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trace collector stub / viewer.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    c = sub.add_parser("collect", help="Accept OTLP/HTTP JSON and append span trees to a file")
+    c.add_argument("--port", type=int, default=4318)
+    c.add_argument("--out", default=TRACE_FILE)
+    s = sub.add_parser("show", help="Print span trees from a JSONL trace file")
+    s.add_argument("path")
+    s.add_argument("--trace-id")
+    args = parser.parse_args()
+
+    if args.command == "collect":
+        _collect(args.port, args.out)
+    else:
+        with open(args.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                tree = json.loads(line)
+                if args.trace_id and tree["trace_id"] != args.trace_id:
+                    continue
+                _print_tree(tree)
@@ -0,0 +1,264 @@
+"""
+Background incremental retraining of the LearnedMatcher from live feedback.
+
+BackgroundTrainer watches FeedbackStore.data and starts a run when either
+  - TRAIN_MIN_NEW_FEEDBACK new outcomes arrived since the last run, or
+  - TRAIN_MAX_INTERVAL_S passed and there is at least one new outcome.
+
+Each run:
+  1. snapshots the newest TRAIN_WINDOW outcomes (oldest 80% fit, newest 20% holdout,
+     so the holdout is "what the model will see next"),
+  2. trains in a separate spawned process (ProcessPoolExecutor) — serving threads
+     are never blocked on LightGBM, and the child never imports torch /
+     sentence-transformers, sidestepping their OpenMP conflict with LightGBM,
+  3. continues boosting from the active booster via LightGBM `init_model`
+     (cold start when there is none, or once it exceeds TRAIN_MAX_TREES),
+  4. publishes to the model registry only if holdout RMSE is no worse than the
+     current model's on the same holdout (+ TRAIN_RMSE_TOLERANCE); workers then
+     hot-swap via ModelWatcher. The active model is scored on the holdout even
+     when it is not the warm start (--cold, tree cap), and a run whose baseline
+     can't be computed while a model is active is rejected rather than published
+     unchecked.
+
+Every run is logged with its wall-clock time and window size, kept in
+trainer.history (see /admin/trainer) and exported on /metrics.
+
+Offline (one run against feedback_data.pkl):
+    python trainer.py [--cold] [--window N]
+"""
+
+import os
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from metrics import TRAINER_DURATION, TRAINER_RUNS, TRAINER_WINDOW
+
+logger = logging.getLogger("bridge.trainer")
+
+TRAIN_MIN_NEW_FEEDBACK = int(os.getenv("TRAIN_MIN_NEW_FEEDBACK", "200"))
+TRAIN_MAX_INTERVAL_S = float(os.getenv("TRAIN_MAX_INTERVAL_S", "3600"))
+TRAIN_CHECK_INTERVAL_S = float(os.getenv("TRAIN_CHECK_INTERVAL_S", "30"))
+TRAIN_WINDOW = int(os.getenv("TRAIN_WINDOW", "20000"))
+TRAIN_ROUNDS = int(os.getenv("TRAIN_ROUNDS", "50"))
+TRAIN_MAX_TREES = int(os.getenv("TRAIN_MAX_TREES", "1000"))
+TRAIN_RMSE_TOLERANCE = float(os.getenv("TRAIN_RMSE_TOLERANCE", "0.0"))
+TRAIN_MIN_SAMPLES = 10
+HOLDOUT_FRACTION = 0.2
+
+# Same objective as LearnedMatcher.train(); a smaller learning rate suits continued boosting
+TRAIN_PARAMS = {
+    "objective": "regression",
+    "metric": "rmse",
+    "boosting_type": "gbdt",
+    "num_leaves": 31,
+    "learning_rate": 0.03,
+    "feature_fraction": 0.9,
+    "num_threads": int(os.getenv("TRAIN_THREADS", "2")),
+    "verbose": -1,
+}
+
+
+def _rmse(pred, y):
+    return float(np.sqrt(np.mean((np.asarray(pred) - y) ** 2)))
+
+
+def train_job(X_fit, y_fit, X_hold, y_hold, init_model=None, rounds=TRAIN_ROUNDS, params=None, baseline_model=None):
+    """
+    One training run (executed in the child process; only numpy + lightgbm imported).
+    Returns model text plus holdout RMSE of the new and the previous model
+    (baseline_model, the active model, defaults to the warm start init_model).
+    """
+    import lightgbm as lgb
+
+    start = time.perf_counter()
+    params = dict(params or TRAIN_PARAMS)
+    init_booster = lgb.Booster(model_str=init_model) if init_model else None
+    baseline_model = baseline_model or init_model
+    baseline_rmse = baseline_error = None
+    if baseline_model:
+        try:
+            baseline_booster = init_booster if baseline_model is init_model else lgb.Booster(model_str=baseline_model)
+            baseline_rmse = _rmse(baseline_booster.predict(X_hold), y_hold)
+        except lgb.basic.LightGBMError as e:  # e.g. trained on a different feature set
+            baseline_error = str(e)
+
+    train_set = lgb.Dataset(X_fit, label=y_fit, free_raw_data=False)
+    hold_set = lgb.Dataset(X_hold, label=y_hold, reference=train_set)
+    booster = lgb.train(
+        params,
+        train_set,
+        num_boost_round=rounds,
+        init_model=init_booster,
+        valid_sets=[hold_set],
+        callbacks=[lgb.early_stopping(stopping_rounds=10, verbose=False)],
+    )
+    return {
+        "model": booster.model_to_string(),
+        "rmse": _rmse(booster.predict(X_hold, num_iteration=booster.best_iteration or None), y_hold),
+        "baseline_rmse": baseline_rmse,
+        "baseline_error": baseline_error,
+        "num_trees": booster.num_trees(),
+        "warm_start": init_booster is not None,
+        "fit_s": time.perf_counter() - start,
+    }
+
+
+class BackgroundTrainer:
+    """Polls a FeedbackStore and retrains/publishes the matcher model in a child process."""
+
+    def __init__(self, store, matcher, registry, min_new=TRAIN_MIN_NEW_FEEDBACK,
+                 max_interval_s=TRAIN_MAX_INTERVAL_S, window=TRAIN_WINDOW,
+                 check_interval_s=TRAIN_CHECK_INTERVAL_S):
+        self.store = store
+        self.matcher = matcher
+        self.registry = registry
+        self.min_new = min_new
+        self.max_interval_s = max_interval_s
+        self.window = window
+        self.check_interval_s = check_interval_s
+        self.trained_upto = len(store.data)  # feedback already reflected in the current model
+        self.last_run_at = time.monotonic()
+        self.history = []  # last 20 run reports
+        self.running = False
+        self._executor = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="background-trainer", daemon=True)
+            self._thread.start()
+            logger.info("Background trainer started (min_new=%d, max_interval=%.0fs, window=%d)",
+                        self.min_new, self.max_interval_s, self.window)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def status(self):
+        return {
+            "running": self.running,
+            "pending_feedback": len(self.store.data) - self.trained_upto,
+            "min_new": self.min_new,
+            "max_interval_s": self.max_interval_s,
+            "seconds_since_last_run": round(time.monotonic() - self.last_run_at, 1),
+            "history": self.history,
+        }
+
+    def due(self):
+        new = len(self.store.data) - self.trained_upto
+        if new >= self.min_new:
+            return True
+        return new > 0 and time.monotonic() - self.last_run_at >= self.max_interval_s
+
+    def _loop(self):
+        while not self._stop.wait(self.check_interval_s):
+            if self.due():
+                try:
+                    self.run_once()
+                except Exception:
+                    logger.error("Background training run failed", exc_info=True)
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: the child starts clean instead of forking a process that holds torch/OpenMP state
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def run_once(self, cold=False):
+        """Train on the current window and publish if holdout RMSE doesn't regress. Returns the report."""
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        self.running = True
+        start = time.perf_counter()
+        upto = len(self.store.data)
+        report = {"ts": time.time(), "feedback_total": upto}
+        try:
+            X, y = self.store.get_training_data(window=self.window)
+            n = 0 if X is None else len(X)
+            report["window"] = n
+            TRAINER_WINDOW.set(n)
+            if n < TRAIN_MIN_SAMPLES:
+                report["result"] = "skipped"
+                logger.info("Training skipped: %d samples in window (need %d)", n, TRAIN_MIN_SAMPLES)
+                return report
+
+            split = max(1, int(n * (1 - HOLDOUT_FRACTION)))
+            model = self.matcher.model
+            active = model.model_to_string() if model is not None else None
+            # The active model is always the baseline; it is the warm start only below the tree cap
+            init_model = active if active is not None and not cold and model.num_trees() < TRAIN_MAX_TREES else None
+            result = self._pool().submit(
+                train_job, X[:split], y[:split], X[split:], y[split:], init_model, baseline_model=active,
+            ).result()
+
+            report.update({
+                "fit_samples": split,
+                "holdout_samples": n - split,
+                "warm_start": result["warm_start"],
+                "num_trees": result["num_trees"],
+                "rmse": round(result["rmse"], 4),
+                "baseline_rmse": None if result["baseline_rmse"] is None else round(result["baseline_rmse"], 4),
+                "child_fit_s": round(result["fit_s"], 3),
+            })
+            baseline = result["baseline_rmse"]
+            if active is not None and baseline is None:
+                report["result"] = "rejected"
+                report["reason"] = f"active model can't score the holdout: {result['baseline_error']}"
+            elif baseline is not None and result["rmse"] > baseline * (1 + TRAIN_RMSE_TOLERANCE):
+                report["result"] = "rejected"
+                report["reason"] = "holdout RMSE regressed"
+            else:
+                report["version"] = self.registry.publish(result["model"], metrics={
+                    "rmse": report["rmse"],
+                    "baseline_rmse": report["baseline_rmse"],
+                    "n_samples": n,
+                    "warm_start": result["warm_start"],
+                })
+                report["result"] = "published"
+            self.trained_upto = upto
+            return report
+        except Exception:
+            report["result"] = "failed"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            report["wall_s"] = round(elapsed, 3)
+            self.last_run_at = time.monotonic()
+            self.running = False
+            self._run_lock.release()
+            TRAINER_RUNS.labels(report.get("result", "failed")).inc()
+            TRAINER_DURATION.observe(elapsed)
+            self.history = (self.history + [report])[-20:]
+            logger.info("Training run %s (window=%s, rmse=%s vs baseline=%s, warm=%s, wall=%.2fs, version=%s)",
+                        report.get("result"), report.get("window"), report.get("rmse"),
+                        report.get("baseline_rmse"), report.get("warm_start"), elapsed, report.get("version"))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run one incremental training cycle on stored feedback.")
+    parser.add_argument("--cold", action="store_true", help="Ignore the active model (no init_model)")
+    parser.add_argument("--window", type=int, default=TRAIN_WINDOW)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    from local_test_matcher import feedback_store, learned_matcher
+
+    trainer = BackgroundTrainer(feedback_store, learned_matcher, learned_matcher.registry, window=args.window)
+    trainer.trained_upto = 0
+    report = trainer.run_once(cold=args.cold)
+    print(f"\n{'result':<10} {'window':>7} {'rmse':>8} {'baseline':>9} {'warm':>5} {'wall_s':>7}  version")
+    print(f"{report['result']:<10} {report.get('window', 0):>7} {str(report.get('rmse', '-')):>8} "
+          f"{str(report.get('baseline_rmse', '-')):>9} {str(report.get('warm_start', '-')):>5} "
+          f"{report['wall_s']:>7.2f}  {report.get('version', '-')}")
+    trainer.stop()
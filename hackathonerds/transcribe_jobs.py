@@ -0,0 +1,304 @@
+"""
+Asynchronous transcription jobs (POST /transcribe/jobs).
+
+A long voice vent shouldn't hold an HTTP request open for the whole decode.
+Submitting a job stores the audio next to a job record and returns a job_id
+right away; TRANSCRIBE_JOB_WORKERS threads feed queued jobs to the STT pipeline
+(stt.transcribe_file, through the transcript cache). Clients then poll
+GET /transcribe/jobs/{id} or long-poll GET /transcribe/jobs/{id}/wait.
+
+Job record (one JSON file per job under TRANSCRIBE_JOBS_DIR):
+
+    {"job_id": "job_…", "status": "queued" | "running" | "done" | "failed",
+     "version": 7,                      # bumps on every change (long-poll cursor)
+     "created_at": ..., "started_at": ..., "finished_at": ...,
+     "progress": {"pass": "final", "chunks_done": 3, "chunks_total": 5},
+     "segments": ["…", "…"],            # text decoded so far in the current pass
+     "draft": "…",                      # fast first pass, when a refinement follows
+     "transcript": "…", "error": null, "cache": "miss", "stats": {...}}
+
+Progress is persisted at most every JOB_PERSIST_INTERVAL_S; status changes
+immediately. Jobs that were queued or running when the process stopped are
+re-queued on startup if their audio is still on disk, otherwise marked failed.
+Finished jobs (and their audio) are pruned after TRANSCRIBE_JOB_TTL_S.
+
+Several uvicorn workers share TRANSCRIBE_JOBS_DIR. A job is owned by the worker
+holding its `<job_id>.lock` (created with O_EXCL by the worker that took the
+POST, or that claims it on resume; a lock whose pid is gone is broken), so an
+interrupted job is resumed once, not once per worker. Polls that land on
+another worker read the record from disk — progress there lags by up to
+JOB_PERSIST_INTERVAL_S.
+"""
+
+import os
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import TRANSCRIBE_JOB_DURATION, TRANSCRIBE_JOB_WAIT, TRANSCRIBE_JOBS, TRANSCRIBE_QUEUE_DEPTH
+
+logger = logging.getLogger("bridge.jobs")
+
+TRANSCRIBE_JOBS_DIR = os.getenv("TRANSCRIBE_JOBS_DIR", "transcribe_jobs")
+TRANSCRIBE_JOB_WORKERS = int(os.getenv("TRANSCRIBE_JOB_WORKERS", "2"))
+TRANSCRIBE_JOB_TTL_S = float(os.getenv("TRANSCRIBE_JOB_TTL_S", str(24 * 3600)))
+JOB_PERSIST_INTERVAL_S = 1.0
+PRUNE_INTERVAL_S = 60.0  # prune() scans every record on disk; at most once a minute per worker
+FINISHED = ("done", "failed")
+JOB_ID = re.compile(r"^job_[0-9a-f]{16}$")
+
+
+class JobStore:
+    """Job records mirrored to one JSON file per job; in memory only for the jobs this worker owns."""
+
+    def __init__(self, directory=TRANSCRIBE_JOBS_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._jobs = {}  # owned by this worker (created here or claimed)
+        self._persisted_at = {}
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def _record_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _lock_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.lock")
+
+    def _read(self, job_id):
+        if not JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._record_path(job_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning("Unreadable job record %s", job_id)
+            return None
+
+    def _take_lock(self, job_id):
+        """Create the job's lock file (O_EXCL); breaks a lock left by a dead process. True if taken."""
+        path = self._lock_path(job_id)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    with open(path) as f:
+                        pid = int(f.read() or 0)
+                    os.kill(pid, 0)
+                    return False  # owner is alive
+                except ProcessLookupError:
+                    pass
+                except (OSError, ValueError):
+                    return False  # being written / not ours to judge
+                try:  # rename first: only one worker breaking the stale lock wins
+                    os.rename(path, f"{path}.stale.{os.getpid()}")
+                    os.remove(f"{path}.stale.{os.getpid()}")
+                except OSError:
+                    return False
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def claim(self, job_id):
+        """Take ownership of an unowned job (e.g. interrupted by a restart). True if this worker now owns it."""
+        if not self._take_lock(job_id):
+            return False
+        job = self._read(job_id)
+        if job is None:
+            os.remove(self._lock_path(job_id))
+            return False
+        with self._lock:
+            self._jobs[job_id] = job
+        return True
+
+    def audio_path(self, job_id, suffix=""):
+        return os.path.join(self.directory, f"{job_id}.audio{suffix}")
+
+    def _persist(self, job):
+        path = os.path.join(self.directory, f"{job['job_id']}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+        self._persisted_at[job["job_id"]] = time.monotonic()
+
+    def create(self, **fields):
+        job_id = f"job_{uuid.uuid4().hex[:16]}"
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "version": 0,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {"pass": None, "chunks_done": 0, "chunks_total": None},
+            "segments": [],
+            "draft": None,
+            "transcript": None,
+            "error": None,
+            "cache": None,
+            "stats": None,
+            **fields,
+        }
+        self._take_lock(job_id)  # fresh id: always free
+        with self._lock:
+            self._jobs[job_id] = job
+            self._persist(job)
+        return job
+
+    def get(self, job_id):
+        """
+        Snapshot of a job (safe to serialize while workers keep updating it); jobs
+        owned by another worker are read from their record on disk.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return {**job, "progress": dict(job["progress"]), "segments": list(job["segments"])}
+        return self._read(job_id)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job["version"] += 1
+            self._persist(job)
+        if job["status"] in FINISHED:
+            try:
+                os.remove(self._lock_path(job_id))  # finished records are read-only from here on
+            except OSError:
+                pass
+
+    def add_segment(self, job_id, label, index, text, chunks_total=None):
+        with self._lock:
+            job = self._jobs[job_id]
+            progress = job["progress"]
+            if progress["pass"] != label:  # refinement started: segments restart from chunk 0
+                job["segments"] = []
+                progress.update({"pass": label, "chunks_done": 0})
+            job["segments"].append(text)
+            progress["chunks_done"] = max(progress["chunks_done"], index + 1)
+            progress["chunks_total"] = chunks_total or progress["chunks_total"]
+            job["version"] += 1
+            if time.monotonic() - self._persisted_at.get(job_id, 0) >= JOB_PERSIST_INTERVAL_S:
+                self._persist(job)
+
+    def _records(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                job = self._read(name[:-5])
+                if job is not None:
+                    yield job
+
+    def unfinished(self):
+        """Unfinished jobs on disk (any worker's; claim() before running one)."""
+        return [job["job_id"] for job in self._records() if job["status"] not in FINISHED]
+
+    def prune(self, ttl_s=TRANSCRIBE_JOB_TTL_S):
+        """Drop finished jobs older than ttl_s (record + audio). Returns how many were removed."""
+        if time.monotonic() - self._pruned_at < PRUNE_INTERVAL_S:
+            return 0
+        self._pruned_at = time.monotonic()
+        cutoff = time.time() - ttl_s
+        expired = [job["job_id"] for job in self._records()
+                   if job["status"] in FINISHED and (job["finished_at"] or 0) < cutoff]
+        with self._lock:
+            for job_id in expired:
+                self._jobs.pop(job_id, None)
+                self._persisted_at.pop(job_id, None)
+        for job_id in expired:
+            for name in os.listdir(self.directory):
+                if name.startswith(job_id):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+        return len(expired)
+
+
+class JobRunner:
+    """
+    Runs queued jobs on a small thread pool.
+    transcribe(job, stats, on_segment, on_draft) → (cache entry, cache result).
+    """
+
+    def __init__(self, store, transcribe, workers=TRANSCRIBE_JOB_WORKERS):
+        self.store = store
+        self.transcribe = transcribe
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe-job")
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def queue_depth(self):
+        return self._queued
+
+    def _set_depth(self, delta):
+        with self._lock:
+            self._queued += delta
+            TRANSCRIBE_QUEUE_DEPTH.set(self._queued)
+
+    def submit(self, job_id):
+        TRANSCRIBE_JOBS.labels("submitted").inc()
+        self._set_depth(+1)
+        self._executor.submit(self._run, job_id)
+
+    def resume(self):
+        """Re-queue jobs interrupted by a restart (fail them if their audio is gone); owned jobs are skipped."""
+        for job_id in self.store.unfinished():
+            if not self.store.claim(job_id):
+                continue  # another worker is running or resuming it
+            job = self.store.get(job_id)
+            if job.get("audio_url") or os.path.exists(job.get("audio_path") or ""):
+                self.store.update(job_id, status="queued", segments=[],
+                                  progress={"pass": None, "chunks_done": 0, "chunks_total": None})
+                self.submit(job_id)
+            else:
+                self.store.update(job_id, status="failed", error="Interrupted and audio no longer available",
+                                  finished_at=time.time())
+        return self
+
+    def _run(self, job_id):
+        self._set_depth(-1)
+        job = self.store.get(job_id)
+        started = time.time()
+        TRANSCRIBE_JOB_WAIT.observe(started - job["created_at"])
+        self.store.update(job_id, status="running", started_at=started)
+        stats = {}
+
+        def on_segment(label, index, text):
+            self.store.add_segment(job_id, label, index, text, stats.get("chunks"))
+
+        def on_draft(text):
+            self.store.update(job_id, draft=text)
+
+        try:
+            entry, cache = self.transcribe(job, stats, on_segment, on_draft)
+            ok = "wall_s" in entry["stats"]  # transcribe_file only sets it on success
+            self.store.update(job_id, status="done" if ok else "failed", transcript=entry["transcript"] if ok else None,
+                              error=None if ok else entry["transcript"], stats=entry["stats"], cache=cache,
+                              finished_at=time.time())
+            TRANSCRIBE_JOBS.labels("done" if ok else "failed").inc()
+        except Exception as e:
+            logger.error("Transcription job %s failed", job_id, exc_info=True)
+            self.store.update(job_id, status="failed", error=str(e), finished_at=time.time())
+            TRANSCRIBE_JOBS.labels("failed").inc()
+        finally:
+            TRANSCRIBE_JOB_DURATION.observe(time.time() - started)
+            audio_path = job.get("audio_path")
+            if audio_path and os.path.exists(audio_path):
+                os.remove(audio_path)  # the transcript is kept; the audio isn't needed any more
+        final = self.store.get(job_id)
+        logger.info("Job %s %s (cache=%s, waited %.2fs, ran %.2fs)", job_id, final["status"], final["cache"],
+                    started - job["created_at"], time.time() - started)
@@ -0,0 +1,180 @@
+"""
+Disk-backed transcript cache for /transcribe, with in-flight coalescing.
+
+Keys
+  - uploads:    sha256(audio bytes) + STT config fingerprint
+  - audio_url:  sha256(url + validator) + STT config fingerprint, where the
+                validator is size+mtime for local paths and ETag (else
+                Last-Modified) for http(s) URLs. A URL with no validator is
+                not cached — there is no way to tell when it changes.
+
+The fingerprint (stt.config_fingerprint) covers the model tiers, latency
+budget, VAD/chunking settings and compute type, so changing any of them
+naturally misses instead of serving a transcript made differently.
+
+Entries are small JSON files under TRANSCRIPT_CACHE_DIR. The store is bounded
+by TRANSCRIPT_CACHE_MAX_MB (least-recently-used files go first; a hit touches
+the file's mtime) and entries older than TRANSCRIPT_CACHE_TTL_S are ignored and
+removed. Only successful transcriptions are stored.
+
+Concurrent requests for the same key (a client retrying an upload over a flaky
+connection) wait on the first one's decode instead of starting their own.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+
+from metrics import TRANSCRIPT_CACHE, TRANSCRIPT_CACHE_BYTES
+
+logger = logging.getLogger("bridge.transcripts")
+
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", "transcript_cache")
+TRANSCRIPT_CACHE_MAX_MB = float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "50"))
+TRANSCRIPT_CACHE_TTL_S = float(os.getenv("TRANSCRIPT_CACHE_TTL_S", str(7 * 24 * 3600)))
+URL_VALIDATOR_TIMEOUT_S = 5
+
+
+def content_key(data: bytes, fingerprint: str):
+    return hashlib.sha256(hashlib.sha256(data).digest() + fingerprint.encode("utf-8")).hexdigest()
+
+
+def url_key(url: str, fingerprint: str):
+    """Key for a path/URL from its change validator, or None if it has none."""
+    if url.startswith(("http://", "https://")):
+        try:
+            req = urllib.request.Request(url, method="HEAD")
+            with urllib.request.urlopen(req, timeout=URL_VALIDATOR_TIMEOUT_S) as resp:
+                validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+        except Exception as e:
+            logger.warning("HEAD %s failed (%s); not caching", url, e)
+            return None
+        if not validator:
+            return None
+    else:
+        try:
+            st = os.stat(url)
+        except OSError:
+            return None
+        validator = f"{st.st_size}:{st.st_mtime_ns}"
+    return hashlib.sha256(f"{url}\n{validator}\n{fingerprint}".encode("utf-8")).hexdigest()
+
+
+class TranscriptCache:
+    """Bounded on-disk key → transcript store with a TTL and in-flight request coalescing."""
+
+    def __init__(self, directory=TRANSCRIPT_CACHE_DIR, max_bytes=int(TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024),
+                 ttl_s=TRANSCRIPT_CACHE_TTL_S):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._inflight = {}  # key → Future
+        self._sizes = {}  # key → bytes on disk
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                self._sizes[name[:-5]] = os.path.getsize(os.path.join(directory, name))
+        TRANSCRIPT_CACHE_BYTES.set(sum(self._sizes.values()))
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_s:
+                self._remove(key)
+                return None
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # LRU: a hit counts as a use
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, entry):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._sizes[key] = os.path.getsize(path)
+        self._evict()
+
+    def _remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+        with self._lock:
+            self._sizes.pop(key, None)
+
+    def _evict(self):
+        with self._lock:
+            total = sum(self._sizes.values())
+            if total <= self.max_bytes:
+                TRANSCRIPT_CACHE_BYTES.set(total)
+                return
+            by_age = []
+            for key in self._sizes:
+                try:
+                    by_age.append((os.path.getmtime(self._path(key)), key))
+                except OSError:
+                    by_age.append((0.0, key))
+            by_age.sort()
+        for _, key in by_age:
+            if total <= self.max_bytes:
+                break
+            total -= self._sizes.get(key, 0)
+            self._remove(key)
+        TRANSCRIPT_CACHE_BYTES.set(total)
+
+    def get_or_compute(self, key, compute):
+        """
+        Cached entry for key, else the result of compute() → (entry, cacheable).
+        Concurrent callers with the same key share one compute(). Returns (entry, source)
+        with source "hit" | "miss" | "coalesced" (or "bypass" when key is None).
+        """
+        if key is None:
+            TRANSCRIPT_CACHE.labels("bypass").inc()
+            return compute()[0], "bypass"
+        entry = self.get(key)
+        if entry is not None:
+            TRANSCRIPT_CACHE.labels("hit").inc()
+            return entry, "hit"
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            TRANSCRIPT_CACHE.labels("coalesced").inc()
+            return future.result(), "coalesced"
+
+        TRANSCRIPT_CACHE.labels("miss").inc()
+        try:
+            entry, cacheable = compute()
+            if cacheable:
+                try:
+                    self.put(key, entry)
+                except OSError:
+                    logger.warning("Could not write transcript cache entry", exc_info=True)
+            future.set_result(entry)
+            return entry, "miss"
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)